@@ -1,7 +1,7 @@
 import sys
 from PyQt5 import QtWidgets
 
-from gui import MainWindow
+from gui import MainWindow, start_importing_imaging_modules
 
 """ The main function """
 if __name__ == "__main__":
@@ -11,4 +11,6 @@ if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     mainWindow = MainWindow()  # main window of the graphical user interface
     mainWindow.show()
+    # numpy, cv2 and pydicom are imported while the user chooses the files
+    start_importing_imaging_modules()
     sys.exit(app.exec())
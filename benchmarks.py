@@ -0,0 +1,844 @@
+"""
+Benchmarks of the image processing functions
+
+This script generates synthetic CT series and RTStruct files in a temporary directory and measures how long the
+functions from the utils module take to process them. The synthetic data does not require any patient data, so the
+benchmarks can be run anywhere, run them by using (python benchmarks.py)
+
+The benchmark suite (python benchmarks.py --suite) times the loading, parsing, windowing and drawing functions and the
+rendering of a slice by the main window on series of the given size, and writes the results to a JSON file, so the
+timings of different versions can be compared.
+"""
+
+import argparse, json, os, platform, subprocess, sys, tempfile, time
+import numpy as np
+import pydicom as dicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.sequence import Sequence
+from pydicom.uid import ExplicitVRLittleEndian, RLELossless, generate_uid
+
+from utils import *
+
+CT_IMAGE_STORAGE = "1.2.840.10008.5.1.4.1.1.2"
+
+# Display colors of the synthetic ROIs, repeated when there are more ROIs
+ROI_COLORS = ((255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255))
+
+# Patient ID of the synthetic studies
+SYNTHETIC_PATIENT_ID = "SYNTHETIC"
+
+# File the results of the benchmark suite are written to
+BENCHMARK_RESULTS_FILE = "benchmark_results.json"
+
+# Modules which must not be imported before the main window is shown
+STARTUP_DEFERRED_MODULES = ("numpy", "cv2", "pydicom", "utils", "scanner")
+
+# Script which measures the time until the main window is shown, run in a new interpreter
+SHOW_WINDOW_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from PyQt5 import QtWidgets
+from gui import MainWindow
+app = QtWidgets.QApplication(sys.argv)
+window = MainWindow()
+window.show()
+app.processEvents()
+print(time.perf_counter() - start)
+print(" ".join(name for name in %r if name in sys.modules))
+"""
+
+
+def create_dataset(file_path: str, sop_class_uid: str, modality: str) -> Dataset:
+    """
+    Function which creates an empty dicom dataset with the file meta information
+
+    Args:
+        file_path (str): path of the file the dataset will be saved to
+        sop_class_uid (str): SOP class UID of the dataset
+        modality (str): modality of the dataset
+
+    Returns:
+        Dataset: dicom dataset ready to be filled with data
+    """
+    file_meta = FileMetaDataset()
+    file_meta.MediaStorageSOPClassUID = sop_class_uid
+    file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    dataset = dicom.FileDataset(file_path, {}, file_meta=file_meta, preamble=b"\0" * 128)
+    dataset.is_little_endian = True
+    dataset.is_implicit_VR = False
+    dataset.SOPClassUID = sop_class_uid
+    dataset.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+    dataset.Modality = modality
+    return dataset
+
+
+def generate_ct_series(
+    directory: str,
+    number_of_slices: int = 100,
+    matrix_size: int = 512,
+    slice_thickness: float = 2.5,
+    pixel_spacing: float = 0.8,
+    transfer_syntax_uid: str = ExplicitVRLittleEndian,
+) -> list:
+    """
+    Function which writes a synthetic ct series to the given directory
+
+    Args:
+        directory (str): directory the ct files are written to
+        number_of_slices (int, optional): number of slices in the series. Defaults to 100.
+        matrix_size (int, optional): number of rows and columns of every slice. Defaults to 512.
+        slice_thickness (float, optional): distance between the slices in mm. Defaults to 2.5.
+        pixel_spacing (float, optional): size of the pixel in mm. Defaults to 0.8.
+        transfer_syntax_uid (str, optional): transfer syntax of the pixel data, only the compression
+        supported by pydicom itself (RLE Lossless) can be used. Defaults to ExplicitVRLittleEndian.
+
+    Returns:
+        list: Z positions of the written slices
+    """
+    os.makedirs(directory, exist_ok=True)
+    study_instance_uid = generate_uid()
+    series_instance_uid = generate_uid()
+    frame_of_reference_uid = generate_uid()
+    origin = -matrix_size * pixel_spacing / 2
+    # a bright disc on a dark background, stored values like in a real ct scan
+    y, x = np.ogrid[:matrix_size, :matrix_size]
+    disc = (x - matrix_size / 2) ** 2 + (y - matrix_size / 2) ** 2 < (matrix_size / 3) ** 2
+    pixels = np.where(disc, 1064, 24).astype(np.uint16)
+
+    positions = list()
+    for number in range(number_of_slices):
+        file_path = os.path.join(directory, "1-%04d.dcm" % (number + 1))
+        dataset = create_dataset(file_path, CT_IMAGE_STORAGE, "CT")
+        z = round(number * slice_thickness, 2)
+        dataset.PatientID = SYNTHETIC_PATIENT_ID
+        dataset.StudyInstanceUID = study_instance_uid
+        dataset.SeriesInstanceUID = series_instance_uid
+        dataset.FrameOfReferenceUID = frame_of_reference_uid
+        dataset.InstanceNumber = number + 1
+        dataset.ImagePositionPatient = [origin, origin, z]
+        dataset.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        dataset.PixelSpacing = [pixel_spacing, pixel_spacing]
+        dataset.SliceThickness = slice_thickness
+        dataset.Rows = matrix_size
+        dataset.Columns = matrix_size
+        dataset.SamplesPerPixel = 1
+        dataset.PhotometricInterpretation = "MONOCHROME2"
+        dataset.BitsAllocated = 16
+        dataset.BitsStored = 12
+        dataset.HighBit = 11
+        dataset.PixelRepresentation = 0
+        dataset.RescaleIntercept = -1024
+        dataset.RescaleSlope = 1
+        dataset.PixelData = pixels.tobytes()
+        if transfer_syntax_uid != ExplicitVRLittleEndian:
+            dataset.compress(transfer_syntax_uid, pixels)
+        dataset.save_as(file_path, write_like_original=False)
+        positions.append(z)
+
+    return positions
+
+
+def generate_rtstruct(
+    file_path: str,
+    z_positions: list,
+    matrix_size: int = 512,
+    pixel_spacing: float = 0.8,
+    points_per_contour: int = 64,
+    number_of_rois: int = 1,
+    ct_directory: str = None,
+) -> None:
+    """
+    Function which writes a synthetic rt struct file with circular contours on the given slices
+
+    Every ROI has one contour on every slice, the contours of the ROIs are concentric circles. When
+    the directory of the ct series is given, the file references its frame of reference, series and
+    the images of the contours, like a real rt struct file, so the scanner can pair them.
+
+    Args:
+        file_path (str): path of the rt struct file
+        z_positions (list): Z positions of the slices with a contour
+        matrix_size (int, optional): number of rows and columns of the ct slices. Defaults to 512.
+        pixel_spacing (float, optional): size of the pixel in mm. Defaults to 0.8.
+        points_per_contour (int, optional): number of points of every contour. Defaults to 64.
+        number_of_rois (int, optional): number of ROIs. Defaults to 1.
+        ct_directory (str, optional): directory of the ct series written by generate_ct_series.
+        Defaults to None (a new frame of reference without any referenced images).
+    """
+    dataset = create_dataset(file_path, RT_STRUCTURE_SET_STORAGE, "RTSTRUCT")
+    angles = np.linspace(0, 2 * np.pi, points_per_contour, endpoint=False)
+
+    ct_headers = list()
+    if ct_directory is not None:
+        for ct_path in sorted(glob.glob(os.path.join(ct_directory, "*.dcm"))):
+            header = dicom.dcmread(ct_path, force=True, stop_before_pixels=True)
+            if header.get("Modality") == "CT":
+                ct_headers.append(header)
+    ct_images = {round(float(header.ImagePositionPatient[2]), 2): header for header in ct_headers}
+    dataset.PatientID = ct_headers[0].PatientID if ct_headers else SYNTHETIC_PATIENT_ID
+    dataset.StudyInstanceUID = ct_headers[0].StudyInstanceUID if ct_headers else generate_uid()
+    dataset.SeriesInstanceUID = generate_uid()
+    dataset.FrameOfReferenceUID = (
+        ct_headers[0].FrameOfReferenceUID if ct_headers else generate_uid()
+    )
+
+    def image_references(headers: list) -> Sequence:
+        references = list()
+        for header in headers:
+            reference = Dataset()
+            reference.ReferencedSOPClassUID = header.SOPClassUID
+            reference.ReferencedSOPInstanceUID = header.SOPInstanceUID
+            references.append(reference)
+        return Sequence(references)
+
+    frame_of_reference = Dataset()
+    frame_of_reference.FrameOfReferenceUID = dataset.FrameOfReferenceUID
+    if ct_headers:
+        referenced_series = Dataset()
+        referenced_series.SeriesInstanceUID = ct_headers[0].SeriesInstanceUID
+        referenced_series.ContourImageSequence = image_references(ct_headers)
+        referenced_study = Dataset()
+        referenced_study.ReferencedSOPClassUID = "1.2.840.10008.3.1.2.3.1"  # study component
+        referenced_study.ReferencedSOPInstanceUID = dataset.StudyInstanceUID
+        referenced_study.RTReferencedSeriesSequence = Sequence([referenced_series])
+        frame_of_reference.RTReferencedStudySequence = Sequence([referenced_study])
+    dataset.ReferencedFrameOfReferenceSequence = Sequence([frame_of_reference])
+
+    structure_set_rois = list()
+    roi_contours = list()
+    for roi in range(number_of_rois):
+        radius = matrix_size * pixel_spacing / 4 * (1 - 0.5 * roi / number_of_rois)
+        contours = list()
+        for z in z_positions:
+            points = np.stack(
+                [radius * np.cos(angles), radius * np.sin(angles), np.full_like(angles, z)],
+                axis=1,
+            )
+            contour = Dataset()
+            contour.ContourGeometricType = "CLOSED_PLANAR"
+            contour.NumberOfContourPoints = points_per_contour
+            contour.ContourData = [round(float(value), 2) for value in points.ravel()]
+            if round(z, 2) in ct_images:
+                contour.ContourImageSequence = image_references([ct_images[round(z, 2)]])
+            contours.append(contour)
+
+        structure_set_roi = Dataset()
+        structure_set_roi.ROINumber = roi + 1
+        structure_set_roi.ROIName = "ROI %d" % (roi + 1)
+        structure_set_roi.ReferencedFrameOfReferenceUID = dataset.FrameOfReferenceUID
+        structure_set_rois.append(structure_set_roi)
+        roi_contour = Dataset()
+        roi_contour.ReferencedROINumber = roi + 1
+        roi_contour.ROIDisplayColor = list(ROI_COLORS[roi % len(ROI_COLORS)])
+        roi_contour.ContourSequence = Sequence(contours)
+        roi_contours.append(roi_contour)
+    dataset.StructureSetROISequence = Sequence(structure_set_rois)
+    dataset.ROIContourSequence = Sequence(roi_contours)
+    dataset.save_as(file_path, write_like_original=False)
+
+
+def measure(function, *args, repeat: int = 3, **kwargs) -> float:
+    """
+    Function which measures the best execution time of the given function
+
+    Args:
+        function (callable): measured function
+        repeat (int, optional): number of measurements. Defaults to 3.
+
+    Returns:
+        float: the shortest measured time in seconds
+    """
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark_parallel_loading(
+    directory: str, number_of_slices: int, matrix_size: int, workers: int
+) -> None:
+    """
+    Function which compares serial and parallel loading of a synthetic ct series
+
+    Args:
+        directory (str): directory the synthetic data is written to
+        number_of_slices (int): number of slices in the series
+        matrix_size (int): number of rows and columns of every slice
+        workers (int): number of workers used by the parallel loading
+    """
+    ct_directory = os.path.join(directory, "ct")
+    rtstruct_path = os.path.join(directory, "rtstruct.dcm")
+    positions = generate_ct_series(ct_directory, number_of_slices, matrix_size)
+    generate_rtstruct(rtstruct_path, positions, matrix_size, ct_directory=ct_directory)
+    ct_files = os.path.join(ct_directory, "*.dcm")
+
+    serial = measure(
+        load_ct_and_rtstruct_images, ct_files, rtstruct_path, WINDOW_WIDTH, WINDOW_CENTER
+    )
+    print("serial loading: %.3f s" % serial)
+    for use_processes in (False, True):
+        parallel = measure(
+            load_ct_and_rtstruct_images,
+            ct_files,
+            rtstruct_path,
+            WINDOW_WIDTH,
+            WINDOW_CENTER,
+            workers=workers,
+            use_processes=use_processes,
+        )
+        print(
+            "parallel loading (%d %s): %.3f s, speedup %.2fx"
+            % (
+                workers,
+                "processes" if use_processes else "threads",
+                parallel,
+                serial / parallel,
+            )
+        )
+
+
+def benchmark_pixel_decoding(
+    directory: str, number_of_slices: int, matrix_size: int, workers: int
+) -> None:
+    """
+    Function which compares serial and parallel decoding of uncompressed and compressed ct series
+    and reports the pixel data handlers selected for them
+
+    Args:
+        directory (str): directory the synthetic data is written to
+        number_of_slices (int): number of slices in the series
+        matrix_size (int): number of rows and columns of every slice
+        workers (int): number of workers used by the parallel decoding
+    """
+    print("pixel decoders available: " + ", ".join(get_available_pixel_decoders()))
+    for transfer_syntax_uid in (ExplicitVRLittleEndian, RLELossless):
+        ct_directory = os.path.join(directory, "decoding", transfer_syntax_uid)
+        generate_ct_series(
+            ct_directory,
+            number_of_slices,
+            matrix_size,
+            transfer_syntax_uid=transfer_syntax_uid,
+        )
+        ct_files = os.path.join(ct_directory, "*.dcm")
+        times = dict()
+        for label, worker_count, use_processes in (
+            ("serial", 1, False),
+            ("%d threads" % workers, workers, False),
+            ("%d processes" % workers, workers, True),
+        ):
+            times[label] = measure(
+                load_ct_volume, ct_files, worker_count, use_processes, use_cache=False
+            )
+        print(
+            "pixel decoding (%s, %s): %s"
+            % (
+                transfer_syntax_uid.name,
+                get_pixel_decoder(transfer_syntax_uid),
+                ", ".join("%s %.3f s" % (label, time) for label, time in times.items()),
+            )
+        )
+
+
+def benchmark_slice_matching(contour_counts: tuple = (500, 1000, 2000, 4000, 8000)) -> None:
+    """
+    Function which measures matching of ct slices with rt struct structures for a growing number of contours
+
+    Every ct slice is matched against rt struct structures with one contour per slice, so a
+    linear matching keeps the time per slice constant while the number of contours grows. The
+    slices are matched by StructureSet.find_slice and their contours are taken, like in
+    load_images_and_rtstruct_structures, without reading and decoding dicom files.
+
+    Args:
+        contour_counts (tuple, optional): numbers of contoured slices to measure.
+    """
+    for contour_count in contour_counts:
+        z_positions = [round(number * 0.5 + 0.001, 3) for number in range(contour_count)]
+        structure_set = StructureSet(
+            [1],
+            ["ROI 1"],
+            [(255, 0, 0)],
+            np.array([[0.0, 0.0, round(z, 2)] for z in z_positions]),
+            np.arange(contour_count + 1, dtype=np.int64),
+            np.zeros(contour_count, dtype=np.int32),
+            np.array([round(z, 2) for z in z_positions]),
+            np.arange(contour_count + 1, dtype=np.int64),
+        )
+
+        def match_all_slices():
+            for z in z_positions:
+                slice_index = structure_set.find_slice(z)
+                if slice_index is not None:
+                    structure_set.contours(slice_index)
+
+        elapsed = measure(match_all_slices)
+        print(
+            "slice matching (%d contours): %.3f s, %.2f us per slice"
+            % (contour_count, elapsed, elapsed / contour_count * 1e6)
+        )
+
+
+def benchmark_contour_transform(point_counts: tuple = (1000, 10000, 100000)) -> None:
+    """
+    Function which compares the vectorized contour transform with the conversion of single points
+
+    Args:
+        point_counts (tuple, optional): numbers of contour points to measure.
+    """
+    position = (-204.8, -204.8, 0.0)
+    for point_count in point_counts:
+        points = np.random.default_rng(0).uniform(-200, 200, (point_count, 3))
+
+        def convert_single_points():
+            return [
+                (int((x - position[0]) / 0.8), int((y - position[1]) / 0.8))
+                for x, y, _ in points.tolist()
+            ]
+
+        single = measure(convert_single_points)
+        vectorized = measure(patient_to_pixel, points, position, 0.8, 0.8)
+        print(
+            "contour transform (%d points): single points %.2f ms, vectorized %.2f ms, speedup %.1fx"
+            % (point_count, single * 1e3, vectorized * 1e3, single / vectorized)
+        )
+
+
+def benchmark_windowing(matrix_sizes: tuple = (512, 1024)) -> None:
+    """
+    Function which compares arithmetic windowing with windowing through the lookup table
+
+    The slices of the volume are in Hounsfield units (int16), window_image windows them in
+    float32. Stored values with a slope other than 1 are rescaled and windowed by the lookup table.
+
+    Args:
+        matrix_sizes (tuple, optional): sizes of the measured slices.
+    """
+    for matrix_size in matrix_sizes:
+        image = np.random.default_rng(0).integers(0, 4096, (matrix_size, matrix_size))
+        image = image.astype(np.uint16)
+        hounsfield = (image.astype(np.int32) - 1024).astype(np.int16)
+        windowed = np.empty(image.shape, dtype=np.uint8)
+
+        def lookup_table_windowing(values, slope=1.0, intercept=0.0):
+            lut = get_window_lut(
+                WINDOW_CENTER, WINDOW_WIDTH, values.dtype == np.int16, slope, intercept
+            )
+            return np.take(lut, values.view(np.uint16), out=windowed)
+
+        def rescaled_windowing():
+            values = rescale_to_hounsfield(image, 0.5, -1024.0, np.dtype(np.float32))
+            return apply_window(values, WINDOW_CENTER, WINDOW_WIDTH, windowed)
+
+        arithmetic = measure(
+            window_image, hounsfield, WINDOW_CENTER, WINDOW_WIDTH, out=windowed
+        )
+        lookup_table = measure(lookup_table_windowing, hounsfield)
+        print(
+            "windowing of int16 Hounsfield units (%dx%d): float32 %.2f ms, lookup table %.2f ms"
+            % (matrix_size, matrix_size, arithmetic * 1e3, lookup_table * 1e3)
+        )
+        rescaled = measure(rescaled_windowing)
+        fused = measure(lookup_table_windowing, image, 0.5, -1024.0)
+        print(
+            "rescale (slope 0.5) and windowing (%dx%d): float32 %.2f ms, lookup table %.2f ms"
+            % (matrix_size, matrix_size, rescaled * 1e3, fused * 1e3)
+        )
+
+
+def benchmark_reslicing(
+    shape: tuple = (800, 512, 512), number_of_rois: int = 5, number_of_points: int = 200
+) -> None:
+    """
+    Function which measures reslicing of the coronal and sagittal planes with their structures
+
+    Args:
+        shape (tuple, optional): (Z,H,W) shape of the synthetic volume.
+        number_of_rois (int, optional): number of ROIs contoured on every slice.
+        number_of_points (int, optional): number of points of every contour.
+    """
+    depth, height, width = shape
+    array = np.random.default_rng(0).integers(-1024, 2000, shape, dtype=np.int16)
+    positions = np.zeros((depth, 3))
+    positions[:, 2] = np.arange(depth) * 1.25
+    volume = CtVolume(array, positions, (0.8, 0.8), (1, 0, 0, 0, 1, 0), [])
+    angles = np.linspace(0, 2 * np.pi, number_of_points, endpoint=False)
+    structures = {
+        index: [
+            (
+                roi,
+                np.stack(
+                    [
+                        width / 2 + width / 4 * (1 + roi / number_of_rois) * np.cos(angles) / 2,
+                        height / 2 + height / 4 * np.sin(angles),
+                    ],
+                    axis=1,
+                ).astype(np.int32),
+            )
+            for roi in range(number_of_rois)
+        ]
+        for index in range(depth // 8, depth - depth // 8)
+    }
+    colors = [(255, 0, 0)] * number_of_rois
+    overlay = PlaneStructureOverlay(structures, depth, colors)
+
+    for plane in (PLANE_CORONAL, PLANE_SAGITTAL):
+        copied = measure(lambda: np.ascontiguousarray(get_plane_image(array, plane, height // 2)))
+        rendered = measure(render_plane, volume, plane, height // 2)
+        drawn = list()
+        for index in range(height // 4, height // 4 + 20):
+            start = time.perf_counter()
+            overlay.draw(render_plane(volume, plane, index), plane, index)
+            drawn.append(time.perf_counter() - start)
+        print(
+            "reslicing %s plane (%dx%dx%d): copy %.2f ms, windowed %.2f ms, with %d structures"
+            " %.2f ms"
+            % (
+                plane,
+                depth,
+                height,
+                width,
+                copied * 1e3,
+                rendered * 1e3,
+                number_of_rois,
+                np.median(drawn) * 1e3,
+            )
+        )
+
+
+def benchmark_rtstruct_detection(directory: str, number_of_files: int, matrix: int) -> None:
+    """
+    Function which compares detection of rt struct files by reading whole files and only headers
+
+    Args:
+        directory (str): directory the synthetic data is written to
+        number_of_files (int): number of ct files in the scanned directory
+        matrix (int): number of rows and columns of the ct slices
+    """
+    scan_directory = os.path.join(directory, "scan")
+    positions = generate_ct_series(scan_directory, number_of_files, matrix)
+    generate_rtstruct(
+        os.path.join(scan_directory, "rtstruct.dcm"),
+        positions,
+        matrix,
+        points_per_contour=256,
+        ct_directory=scan_directory,
+    )
+    file_paths = glob.glob(os.path.join(scan_directory, "*.dcm"))
+
+    def read_whole_files():
+        return [
+            "ROIContourSequence" in dicom.dcmread(file_path, force=True)
+            for file_path in file_paths
+        ]
+
+    def read_headers():
+        return [check_if_file_is_rt_struct_file(file_path) for file_path in file_paths]
+
+    whole_files = measure(read_whole_files)
+    headers = measure(read_headers)
+    print(
+        "rt struct detection (%d files): whole files %.3f s, headers %.3f s, speedup %.1fx"
+        % (len(file_paths), whole_files, headers, whole_files / headers)
+    )
+
+
+def parse_import_times(report: str) -> list:
+    """
+    Function which parses the report of python -X importtime
+
+    Args:
+        report (str): the report written to the standard error
+
+    Returns:
+        list: (module name, self time, cumulative time) of every imported module, times in seconds
+    """
+    import_times = list()
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative_time, name = line[len("import time:") :].split("|")
+        import_times.append(
+            (name.strip(), int(self_time) / 1e6, int(cumulative_time) / 1e6)
+        )
+    return import_times
+
+
+def benchmark_startup(number_of_modules: int = 10) -> None:
+    """
+    Function which measures the startup of the application, the import time of the gui module with
+    its slowest imports (python -X importtime) and the time until the main window is shown
+
+    Args:
+        number_of_modules (int, optional): number of reported slowest modules. Defaults to 10.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    environment = dict(os.environ)
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import gui"],
+        cwd=directory,
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print("startup: the gui module could not be imported")
+        return
+    import_times = parse_import_times(result.stderr)
+    cumulative_times = {name: cumulative_time for name, _, cumulative_time in import_times}
+    print("startup: import gui %.3f s" % cumulative_times["gui"])
+    for name, self_time, cumulative_time in sorted(
+        import_times, key=lambda import_time: -import_time[1]
+    )[:number_of_modules]:
+        print("    %-40s self %.3f s, cumulative %.3f s" % (name, self_time, cumulative_time))
+    eager_modules = [name for name in STARTUP_DEFERRED_MODULES if name in cumulative_times]
+    if eager_modules:
+        print("startup: imported before the window is shown: " + ", ".join(eager_modules))
+
+    result = subprocess.run(
+        [sys.executable, "-c", SHOW_WINDOW_SCRIPT % (STARTUP_DEFERRED_MODULES,)],
+        cwd=directory,
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+    lines = result.stdout.splitlines()
+    if result.returncode == 0 and lines:
+        print("startup: main window shown after %.3f s" % float(lines[0]))
+        if len(lines) > 1 and lines[1]:
+            print("startup: imported before the window is shown: " + lines[1])
+
+
+def measure_load_image(
+    ct_files: str, rtstruct_path: str, matrix_size: int, repeat: int = 3
+) -> dict:
+    """
+    Function which measures rendering of the slices by the main window on an offscreen display
+
+    Before every slice which is not cached the rendered tiles, the resliced planes and the labels
+    of the structures are removed from their caches, so its time includes the rasterization of the
+    contours. A cached slice is shown again right after it was rendered, because the render cache
+    does not hold all slices of a large series.
+
+    Args:
+        ct_files (str): glob pattern of the ct files
+        rtstruct_path (str): path to the rt struct file
+        matrix_size (int): number of rows and columns of the ct slices, used as the view size
+        repeat (int, optional): number of measurements of every slice. Defaults to 3.
+
+    Returns:
+        dict: the shortest time of load_image of a slice which is not cached and which is cached,
+        None if PyQt5 is not installed
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5 import QtWidgets
+        from gui import MainWindow
+    except ImportError:
+        return None
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    window = MainWindow()
+    window.resize(matrix_size + 400, matrix_size + 100)
+    window.show()
+    window.path_to_ct_dir = ct_files
+    window.path_to_rt_file = rtstruct_path
+    window.load_images_with_structures()
+    while window.loading_worker is not None:
+        app.processEvents()
+        time.sleep(0.001)
+
+    def clear_caches():
+        window.render_cache.clear()
+        window.plane_cache.clear()
+        for overlay in (window.structure_overlay, window.plane_overlay):
+            if overlay is not None:
+                overlay.cache.clear()
+
+    def render_slices():
+        for number in range(len(window.merged_images)):
+            clear_caches()
+            window.load_image(number)
+
+    def show_cached_slices():
+        elapsed = 0.0
+        for number in range(len(window.merged_images)):
+            window.load_image(number)
+            start = time.perf_counter()
+            window.load_image(number)
+            elapsed += time.perf_counter() - start
+        return elapsed
+
+    number_of_images = len(window.merged_images)
+    timings = {
+        "load_image": measure(render_slices, repeat=repeat) / number_of_images,
+        "load_image (cached)": min(show_cached_slices() for _ in range(repeat)) / number_of_images,
+    }
+    window.close()
+    return timings
+
+
+def benchmark_suite(
+    directory: str,
+    number_of_slices: int,
+    matrix_size: int,
+    number_of_rois: int,
+    points_per_contour: int,
+    workers: int,
+) -> dict:
+    """
+    Function which times the main image processing functions on a synthetic series
+
+    The times of the functions processing one slice are measured on the first slice with contours.
+    The loading is measured without and with the cached structure set of the rt struct file.
+    The rendering by the main window is measured only when PyQt5 is installed.
+
+    Args:
+        directory (str): directory the synthetic data is written to
+        number_of_slices (int): number of slices in the series
+        matrix_size (int): number of rows and columns of every slice
+        number_of_rois (int): number of ROIs contoured on every slice
+        points_per_contour (int): number of points of every contour
+        workers (int): number of workers used by the loading
+
+    Returns:
+        dict: parameters of the series and the shortest times of the functions in seconds
+    """
+    ct_directory = os.path.join(directory, "suite")
+    rtstruct_path = os.path.join(directory, "suite_rtstruct.dcm")
+    positions = generate_ct_series(ct_directory, number_of_slices, matrix_size)
+    generate_rtstruct(
+        rtstruct_path,
+        positions,
+        matrix_size,
+        points_per_contour=points_per_contour,
+        number_of_rois=number_of_rois,
+        ct_directory=ct_directory,
+    )
+    ct_files = os.path.join(ct_directory, "*.dcm")
+
+    structure_set_cache_path = get_structure_set_cache_path(rtstruct_path)
+
+    def load_uncached():
+        # the cached structure set is created again, like on the first opening of the file
+        if os.path.exists(structure_set_cache_path):
+            os.remove(structure_set_cache_path)
+        return load_ct_and_rtstruct_images(
+            ct_files, rtstruct_path, WINDOW_WIDTH, WINDOW_CENTER, workers=workers
+        )
+
+    timings = {"load_ct_and_rtstruct_images": measure(load_uncached)}
+    images, structure_set = load_ct_and_rtstruct_images(
+        ct_files, rtstruct_path, WINDOW_WIDTH, WINDOW_CENTER, workers=workers
+    )
+    image, structures = images[0]
+    windowed = contrast_enhancement(image, WINDOW_CENTER, WINDOW_WIDTH)
+    rtstruct = dicom.dcmread(rtstruct_path)
+    timings.update(
+        {
+            "load_ct_and_rtstruct_images (cached)": measure(
+                load_ct_and_rtstruct_images,
+                ct_files,
+                rtstruct_path,
+                WINDOW_WIDTH,
+                WINDOW_CENTER,
+                workers=workers,
+            ),
+            "parse_rtstruct": measure(parse_rtstruct, rtstruct),
+            "parse_structure_set": measure(parse_structure_set, rtstruct),
+            "contrast_enhancement": measure(
+                contrast_enhancement, image, WINDOW_CENTER, WINDOW_WIDTH
+            ),
+            "add_rt_struct_to_image": measure(
+                lambda: add_rt_struct_to_image(
+                    windowed.copy(), structures, structure_set.roi_colors
+                )
+            ),
+        }
+    )
+    timings.update(measure_load_image(ct_files, rtstruct_path, matrix_size) or {})
+    for name, seconds in timings.items():
+        print("%s: %.2f ms" % (name, seconds * 1e3))
+
+    return {
+        "parameters": {
+            "slices": number_of_slices,
+            "matrix": matrix_size,
+            "rois": number_of_rois,
+            "points": points_per_contour,
+            "workers": workers,
+        },
+        "timings": timings,
+    }
+
+
+def write_results(results: dict, file_path: str) -> None:
+    """
+    Function which writes the results of the benchmark suite with the versions of the environment
+
+    Args:
+        results (dict): results returned by benchmark_suite
+        file_path (str): path of the written JSON file
+    """
+    results = dict(
+        results,
+        date=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        environment={
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pydicom": dicom.__version__,
+            "opencv": cv2.__version__,
+        },
+    )
+    with open(file_path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--slices", type=int, default=200, help="number of ct slices")
+    parser.add_argument("--matrix", type=int, default=512, help="size of the ct slices")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rois", type=int, default=5, help="number of ROIs of the suite")
+    parser.add_argument(
+        "--points", type=int, default=200, help="number of points of every contour of the suite"
+    )
+    parser.add_argument(
+        "--suite", action="store_true", help="run only the benchmark suite"
+    )
+    parser.add_argument(
+        "--output",
+        default=BENCHMARK_RESULTS_FILE,
+        help="JSON file the results of the benchmark suite are written to",
+    )
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = benchmark_suite(
+            directory,
+            arguments.slices,
+            arguments.matrix,
+            arguments.rois,
+            arguments.points,
+            arguments.workers,
+        )
+    write_results(results, arguments.output)
+    print("results written to %s" % arguments.output)
+    if arguments.suite:
+        sys.exit()
+
+    benchmark_startup()
+    benchmark_slice_matching()
+    benchmark_contour_transform()
+    benchmark_windowing()
+    benchmark_reslicing()
+    with tempfile.TemporaryDirectory() as directory:
+        benchmark_parallel_loading(
+            directory, arguments.slices, arguments.matrix, arguments.workers
+        )
+        benchmark_rtstruct_detection(directory, arguments.slices, arguments.matrix)
+        benchmark_pixel_decoding(
+            directory, arguments.slices, arguments.matrix, arguments.workers
+        )
@@ -0,0 +1,201 @@
+"""
+
+Batch export of CT images with RTStruct structures to image files
+
+This script renders every CT slice which has RTStruct contours, draws the structures with the colors of their ROIs
+and writes the slices as PNG or TIFF files. It does not use the graphical user interface and does not import PyQt5,
+so it can be run on servers without a display, for example to create snapshots of whole cohorts for quality
+assurance. The slices are read, rendered and written on a pool of processes.
+
+The window is given in Hounsfield units, either as one of the presets or as a window center and width. The stored
+pixel values of every file are converted to Hounsfield units with its RescaleSlope and RescaleIntercept in the same
+pass as the windowing.
+
+Run the export by using (python export.py <ct directory> <rt struct file> <output directory> --preset soft-tissue)
+
+This script requires following libraries to be installed:
+ • numpy - library for scientific computing with Python programming language, including support for multi-dimensional
+    arrays and matrices and functions to operate on them,
+ • cv2 - opencv-python library, an open-source library that includes several hundreds of computer vision algorithms
+ • pydicom - pure Python package for working with DICOM files, which allows user to read complex files into pythonic
+    structures for manipulation, save the modified datasets as DICOM format files
+
+"""
+
+import argparse, cv2, os
+import pydicom as dicom
+from utils import (
+    PROGRESS_SLICES_DECODED,
+    Z_TOLERANCE,
+    add_rt_struct_to_image,
+    build_series_index,
+    contrast_enhancement,
+    decode_pixel_data,
+    get_rescale,
+    iterate_with_workers,
+    load_structure_set,
+    patient_to_pixel,
+)
+
+# Windows (center, width) in Hounsfield units
+WINDOW_PRESETS = {
+    "soft-tissue": (40, 400),
+    "mediastinum": (50, 350),
+    "lung": (-600, 1500),
+    "bone": (400, 1800),
+    "brain": (40, 80),
+    "liver": (60, 160),
+}
+DEFAULT_WINDOW_PRESET = "soft-tissue"
+
+# Formats of the written images
+EXPORT_FORMATS = ("png", "tif", "tiff")
+
+
+def export_slice(task: tuple) -> str:
+    """
+    Function which renders one ct slice with its rt struct structures and writes it to a file
+
+    Args:
+        task (tuple): path to the ct file, rt struct structures as (ROI index, (N,2) points) pairs,
+        colors of the ROIs, window center and width in Hounsfield units and path of the written image
+
+    Returns:
+        str: path of the written image
+    """
+    image_path, structures, roi_colors, window_center, window_width, output_path = task
+    data_dicom = dicom.dcmread(image_path, force=True)
+    pixels, _ = decode_pixel_data(data_dicom)
+    # the stored values are windowed with the rescale of the file by window_image, integer
+    # Hounsfield units (slope 1) arithmetically with the window shifted by the intercept, 8-bit
+    # images and stored values with another rescale through the windowing lookup table
+    image = contrast_enhancement(
+        pixels, window_center, window_width, *get_rescale(data_dicom)
+    )
+    image = add_rt_struct_to_image(image, structures, roi_colors)
+    # the colors of the ROIs are given as (R,G,B) and OpenCV writes BGR images
+    if not cv2.imwrite(output_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR)):
+        raise OSError("the image could not be written to " + output_path)
+    return output_path
+
+
+def export_structures(
+    folder_path_ct,
+    rtstruct_path: str,
+    output_directory: str,
+    window_center: float,
+    window_width: float,
+    image_format: str = "png",
+    workers: int = 1,
+    use_processes: bool = True,
+    z_tolerance: float = Z_TOLERANCE,
+    progress=None,
+) -> list:
+    """
+    Function which writes every ct slice with rt struct structures to an image file
+
+    The headers of the ct files are read to match the slices with the contours, then the slices
+    with contours are rendered by the workers. The images are named by the number of the slice in
+    the series sorted by Z axis.
+
+    Args:
+        folder_path_ct (str or list): ct images directory, glob pattern of the ct images or the list
+        of their paths
+        rtstruct_path (str): path to the rt struct file
+        output_directory (str): directory of the written images, it is created if needed
+        window_center (float): window center in Hounsfield units
+        window_width (float): window width in Hounsfield units
+        image_format (str, optional): format of the written images, one of EXPORT_FORMATS.
+        Defaults to "png".
+        workers (int, optional): number of workers, 1 means serial execution. Defaults to 1.
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to True.
+        z_tolerance (float, optional): maximal distance between the slice and the structures.
+        Defaults to Z_TOLERANCE.
+        progress (callable, optional): function called with the stage name, number of written images
+        and number of all images. Defaults to None.
+
+    Returns:
+        list: paths of the written images
+    """
+    if image_format not in EXPORT_FORMATS:
+        raise ValueError("unsupported image format: " + image_format)
+    if isinstance(folder_path_ct, str) and os.path.isdir(folder_path_ct):
+        folder_path_ct = os.path.join(folder_path_ct, "*.dcm")
+
+    structure_set = load_structure_set(rtstruct_path)
+    series_index = build_series_index(folder_path_ct, workers)
+    tasks = list()
+    for number, header in enumerate(series_index):
+        slice_index = structure_set.find_slice(header.z, z_tolerance)
+        if slice_index is None:
+            continue
+        y_spacing, x_spacing = header.spacing
+        structures = [
+            (
+                roi,
+                patient_to_pixel(
+                    points, header.position, x_spacing, y_spacing, header.orientation
+                ),
+            )
+            for roi, points in structure_set.contours(slice_index)
+        ]
+        output_path = os.path.join(
+            output_directory, "slice_%04d.%s" % (number, image_format)
+        )
+        tasks.append(
+            (
+                header.path,
+                structures,
+                structure_set.roi_colors,
+                window_center,
+                window_width,
+                output_path,
+            )
+        )
+
+    os.makedirs(output_directory, exist_ok=True)
+    output_paths = list()
+    for output_path in iterate_with_workers(export_slice, tasks, workers, use_processes):
+        output_paths.append(output_path)
+        if progress is not None:
+            progress(PROGRESS_SLICES_DECODED, len(output_paths), len(tasks))
+    return output_paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("ct", help="directory or glob pattern of the ct images")
+    parser.add_argument("rtstruct", help="path to the rt struct file")
+    parser.add_argument("output", help="directory of the written images")
+    parser.add_argument(
+        "--preset",
+        choices=sorted(WINDOW_PRESETS),
+        default=DEFAULT_WINDOW_PRESET,
+        help="window preset in Hounsfield units",
+    )
+    parser.add_argument(
+        "--window",
+        type=float,
+        nargs=2,
+        metavar=("CENTER", "WIDTH"),
+        help="window center and width in Hounsfield units, used instead of the preset",
+    )
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="png")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--threads", action="store_true", help="use threads instead of processes"
+    )
+    arguments = parser.parse_args()
+
+    window_center, window_width = arguments.window or WINDOW_PRESETS[arguments.preset]
+    output_paths = export_structures(
+        arguments.ct,
+        arguments.rtstruct,
+        arguments.output,
+        window_center,
+        window_width,
+        arguments.format,
+        arguments.workers,
+        not arguments.threads,
+    )
+    print("%d images written to %s" % (len(output_paths), arguments.output))
@@ -8,8 +8,10 @@ of which the entire interface containing the appropriate buttons and functions w
 
 The operation of the program is based on the visualization of CT structures that can be changed using the mouse
 buttons. Accordingly, the scroll function changes the imaging cross-sections, while after pressing the left button
-and moving the mouse, we are able to change the window width and window center of ct scan. The intuitive GUI allows
-you to easily display linked images.
+and moving the mouse, we are able to change the window width and window center of ct scan. The wheel with the Ctrl key
+zooms the image and moving the mouse with the middle or the right button pans it. The intuitive GUI allows
+you to easily display linked images. Besides the axial ct slices, the View menu displays the coronal and sagittal
+planes, which are resliced from the volume of the series with the rt struct structures projected into them.
 
 The operation of gui is based on the creation of methods that respond appropriately to the user's commands.
 The two main buttons are responsible for uploading the necessary dicom files to the programs. The program is able
@@ -18,8 +20,6 @@ to check if a given file has the appropriate extension, so selecting the wrong f
 This script requires following libraries to be installed:
  • PyQt5 - PyQt5 is a comprehensive set of Python bindings for Qt v5, implemented as more than 35 extension modules,
     enables Python to be used as an alternative application development language to C++ on all supported platforms
- • matplotlib - comprehensive plotting library for creating static, animated and interactive visualizations in Python
-    programming language and its numerical mathematics extension NumPy,
  • dicom_csv - collection of utils for gathering, aggregation and handling metadata from DICOM files, includes
     functions for gathering metadata from individual DICOM files or entire directories and tools for grouping DICOM
     metadata into images,
@@ -34,11 +34,304 @@ This script requires following libraries to be installed:
  • os - a Python module which provides a portable way of using operating system dependent functionality, it comes under
      Python's standard utility modules
 
+The modules which read and render the dicom files (numpy, cv2 and pydicom, used through the utils module) are
+imported after the main window is shown, so the window does not wait for them.
+
+The View menu turns on the instrumentation, which shows the durations of the stages of displaying a slice over the
+image, saves them as a JSON trace and profiles the program with cProfile.
+
 """
 
+from __future__ import annotations
 from PyQt5 import QtCore, QtGui, QtWidgets
-from utils import *
-import os
+import os, threading
+import instrumentation
+
+# Modules which read and render the dicom files, imported by import_imaging_modules
+np = None
+cv2 = None
+utils = None
+scanner = None
+
+# Limits of the cache of rendered tiles of the slices (number of tiles and memory in bytes)
+RENDER_CACHE_SIZE = 4096
+RENDER_CACHE_BYTES = 256 * 1024 * 1024
+
+# Number of resliced coronal and sagittal slices kept for rendering their tiles
+PLANE_CACHE_SIZE = 8
+
+# Largest zoom relative to the slice fitted to the view and the change of the zoom by one wheel step
+MAX_ZOOM = 16.0
+ZOOM_STEP = 1.25
+
+# Number of slices rendered in the background ahead of the scrolling direction
+PREFETCH_DEPTH = 4
+PREFETCH_THREADS = 2
+
+
+# Interval (in ms) of re-rendering the current slice while the window is changed with the mouse
+PREVIEW_INTERVAL = 16
+
+# Window (in Hounsfield units) shown after the start, the soft tissue window
+WINDOW_CENTER = 40
+WINDOW_WIDTH = 400
+
+# Number of threads reading and decoding the ct files in the background
+LOADING_WORKERS = min(8, os.cpu_count() or 1)
+
+# Planes of the volume which can be displayed with their shortcuts, the coronal and sagittal
+# planes are resliced from the volume on demand
+VIEW_PLANES = (("axial", "Ctrl+1"), ("coronal", "Ctrl+2"), ("sagittal", "Ctrl+3"))
+
+# Functions and methods of the utils module measured while the instrumentation is turned on
+INSTRUMENTED_FUNCTIONS = (
+    "decode_pixel_data",
+    "contrast_enhancement",
+    "window_image",
+    "resample_plane_image",
+    "colorize_rt_structures",
+    "StructureOverlay.labels",
+    "PlaneStructureOverlay.labels",
+)
+
+
+def import_imaging_modules() -> None:
+    """
+    Function that imports the modules which read and render the dicom files
+
+    It is called in a background thread after the main window is shown and again before the first
+    use of the modules, which waits for the background import if it has not finished yet.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Nothing
+    """
+    global np, cv2, utils, scanner
+    import numpy as np
+    import cv2
+    import utils
+    import scanner
+
+
+def start_importing_imaging_modules() -> threading.Thread:
+    """
+    Function that starts importing the modules which read and render the dicom files in the background
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    threading.Thread
+        The thread importing the modules
+    """
+    thread = threading.Thread(target=import_imaging_modules, daemon=True)
+    thread.start()
+    return thread
+
+
+class LoadingWorker(QtCore.QObject):
+    """
+    A class which loads ct images and rt struct structures on a background QThread. The structure set
+    is sent as soon as the rt struct file is parsed and every ct slice with structures is sent as soon
+    as it is decoded, so the first slice can be displayed while the rest of the series is still
+    loading. The whole series is decoded into a volume, which is cached next to the series.
+    """
+
+    progress = QtCore.pyqtSignal(str, int, int)
+    structures_loaded = QtCore.pyqtSignal(object)
+    volume_opened = QtCore.pyqtSignal(object, object)
+    slice_loaded = QtCore.pyqtSignal(object, object)
+    finished = QtCore.pyqtSignal(bool)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(
+        self, path_to_ct_dir: str, path_to_rt_file: str, rt_struct_header=None
+    ):
+        super(LoadingWorker, self).__init__()
+        self.path_to_ct_dir = path_to_ct_dir
+        self.path_to_rt_file = path_to_rt_file
+        self.rt_struct_header = rt_struct_header
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """
+        Function that stops the loading, the slices which are being decoded are finished first
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        self.cancelled = True
+
+    def run(self) -> None:
+        """
+        Function that loads the rt struct file and the ct images, it runs on the background thread
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        try:
+            structure_set = utils.load_structure_set(
+                self.path_to_rt_file, header=self.rt_struct_header
+            )
+            number_of_contours = len(structure_set.contour_rois)
+            self.progress.emit(
+                utils.PROGRESS_CONTOURS_PARSED, number_of_contours, number_of_contours
+            )
+            self.structures_loaded.emit(structure_set)
+
+            volume = utils.open_ct_volume(
+                self.path_to_ct_dir,
+                workers=LOADING_WORKERS,
+                progress=self.progress.emit,
+                should_cancel=lambda: self.cancelled,
+            )
+            if volume is None:
+                self.finished.emit(True)
+                return
+            structures = utils.match_volume_structures(volume, structure_set)
+            self.volume_opened.emit(volume, structures)
+
+            # slices with rt struct structures are decoded first and sent in Z axis order
+            def send_slice(index: int) -> None:
+                if index in structures:
+                    self.slice_loaded.emit(volume.array[index], structures[index])
+
+            for index in sorted(structures):
+                if volume.decoded[index]:
+                    send_slice(index)  # slices read from the cache
+            utils.decode_ct_volume(
+                volume,
+                workers=LOADING_WORKERS,
+                priority=sorted(structures),
+                on_slice=send_slice,
+                progress=self.progress.emit,
+                should_cancel=lambda: self.cancelled,
+            )
+        except Exception as e:
+            self.failed.emit(str(e))
+        self.finished.emit(self.cancelled)
+
+
+class ScanWorker(QtCore.QObject):
+    """
+    A class which scans a directory tree with dicom studies on a background QThread. Only the headers
+    of the files are read and every rt struct file is paired with the ct series it references. The
+    index of the directory is sent when the scanning is finished (None if it was cancelled).
+    """
+
+    progress = QtCore.pyqtSignal(str, int, int)
+    finished = QtCore.pyqtSignal(object)
+
+    def __init__(self, directory: str):
+        super(ScanWorker, self).__init__()
+        self.directory = directory
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """
+        Function that stops the scanning, the headers which are being read are finished first
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        self.cancelled = True
+
+    def run(self) -> None:
+        """
+        Function that scans the directory, it runs on the background thread
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        try:
+            import_imaging_modules()
+            index = scanner.scan_directory(
+                self.directory,
+                LOADING_WORKERS,
+                progress=self.progress.emit,
+                should_cancel=lambda: self.cancelled,
+            )
+        except Exception as e:
+            print(
+                "An error was encountered while scanning a directory with DICOM files: "
+                + str(e)
+            )
+            index = None
+        self.finished.emit(index)
+
+
+class SliceRenderSignals(QtCore.QObject):
+    """
+    A class with signals of the background slice rendering. It is needed because QRunnable is not
+    a QObject and cannot emit signals by itself.
+    """
+
+    rendered = QtCore.pyqtSignal(object, object, int)
+
+
+class SliceRenderTask(QtCore.QRunnable):
+    """
+    A class of a task which renders a slice on a worker thread of QThreadPool. A copy of the rendered
+    QImage is handed back to the UI thread by the rendered signal, where it is converted to QPixmap. The task
+    is skipped when the prefetch generation changed before it was started. The study generation is sent with the
+    image, so the tiles of a study which is not displayed anymore are dropped.
+    """
+
+    def __init__(self, window, number: int, key: tuple, generation: int, study_generation: int):
+        super(SliceRenderTask, self).__init__()
+        self.window = window
+        self.number = number
+        self.key = key
+        self.generation = generation
+        self.study_generation = study_generation
+        self.signals = SliceRenderSignals()
+
+    def run(self) -> None:
+        """
+        Function that renders the slice unless the request is stale
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        image = None
+        try:
+            if self.generation == self.window.prefetch_generation:
+                # the tile buffers of the thread are reused by its next task, so the image is copied
+                image = self.window.render_layer(self.key).copy()
+        except Exception as e:
+            print(f"An error was encountered while prefetching {self.number} image: " + str(e))
+        self.signals.rendered.emit(self.key, image, self.study_generation)
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -81,6 +374,14 @@ class MainWindow(QtWidgets.QMainWindow):
         self.graphics_view = QtWidgets.QGraphicsView(self.drop_frame)
         self.graphics_view.setObjectName("graphics_view")
         self.grid_layout.addWidget(self.graphics_view, 0, 0, 1, 3)
+        self.label_timings = QtWidgets.QLabel(self.graphics_view)
+        self.label_timings.setObjectName("label_timings")
+        self.label_timings.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 160); color: white; padding: 4px;"
+        )
+        self.label_timings.setFont(QtGui.QFont("Monospace", 9))
+        self.label_timings.move(8, 8)
+        self.label_timings.hide()  # shown while the instrumentation is turned on
         self.push_button_dicom = QtWidgets.QPushButton(self.drop_frame)
         size_policy = QtWidgets.QSizePolicy(
             QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Fixed
@@ -137,11 +438,11 @@ class MainWindow(QtWidgets.QMainWindow):
             self.push_button_rtstruct_file
         )  # setting the push button (Open RTStruct file) handler
         self.label_window_width.setText(
-            _translate("SplashScreen", "Window width: 1000")
+            _translate("SplashScreen", "Window width: " + str(WINDOW_WIDTH))
         )
         self.label_window_width.setFont(QtGui.QFont("Arial", 20))
         self.label_window_center.setText(
-            _translate("SplashScreen", "Window center: 1000")
+            _translate("SplashScreen", "Window center: " + str(WINDOW_CENTER))
         )
         self.label_window_center.setFont(QtGui.QFont("Arial", 20))
         self.label_slice_number.setText(
@@ -186,8 +487,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.last_rolled_position = (
             0  # variable responsible for storing the last value of the scroll button
         )
-        self.window_center = 1000  # variable responsible for calculating the window center based on the mouse movement
-        self.window_width = 1000  # variable responsible for calculating the window width based on the mouse movement
+        self.window_center = WINDOW_CENTER  # variable responsible for calculating the window center based on the mouse movement
+        self.window_width = WINDOW_WIDTH  # variable responsible for calculating the window width based on the mouse movement
         self.current_window_width = (
             self.window_width
         )  # the variable responsible for the currently set window width value
@@ -198,14 +499,57 @@ class MainWindow(QtWidgets.QMainWindow):
             0  # the variable responsible for the currently set slice of CT scans
         )
         self.current_slice = 0  # variable responsible for the section number
-        self.merged_images = None
+        self.volume = None  # the whole ct series as one (Z,H,W) array
+        self.merged_images = None  # views of the volume slices with rt struct structures
         self.rt_structures = None
-        self.rt_struct_color = (255, 0, 0)
+        self.structure_set = None
+        self.structure_overlay = None
+        self.plane = "axial"  # displayed plane of the volume
+        self.plane_overlay = None  # rt struct structures of the coronal and sagittal planes
+        self.visible_rois = None  # indexes of displayed ROIs, None means all ROIs
+        self.render_cache = None  # cache of rendered slices, created when the images are loaded
+        self.prefetch_pool = QtCore.QThreadPool()  # threads rendering the following slices
+        self.prefetch_pool.setMaxThreadCount(PREFETCH_THREADS)
+        self.prefetch_generation = 0  # increased to cancel the requests of the previous scroll
+        self.prefetch_pending = set()  # keys of the slices being rendered in the background
+        self.study_generation = 0  # increased when a study is loaded, the older tiles are dropped
+        self.loading_thread = None  # background thread loading ct images and rt structures
+        self.loading_worker = None
+        self.cancelled_loadings = list()  # cancelled workers with their threads
+        self.scan_thread = None  # background thread scanning a directory with studies
+        self.scan_worker = None
+        self.live_preview = True  # re-rendering the slice while the window is changed
+        self.preview_timer = QtCore.QTimer(self)  # coalesces mouse moves into one render
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_INTERVAL)
+        self.preview_timer.timeout.connect(self.render_preview)
         self.path_to_ct_dir = None
         self.path_to_rt_file = (
             None  # variable responsible for the path to the RTStruct file
         )
+        self.rt_struct_header = None  # header read while checking the RTStruct file
+        self.timer = instrumentation.StageTimer()  # durations of the stages of displaying slices
+
+        # one scene is kept for the whole session, only the pixmaps of its items are replaced
+        self.pixmap = QtGui.QPixmap()
         self.scene = QtWidgets.QGraphicsScene()
+        self.pixmap_item = self.scene.addPixmap(self.pixmap)  # the loading screen
+        self.pixmap_item.setTransformationMode(QtCore.Qt.SmoothTransformation)
+        self.image_layer = TiledLayer(self.scene, 0)  # tiles of the ct slice
+        self.structures_layer = TiledLayer(self.scene, 1)  # tiles of rt struct structures
+        self.displayed_shape = None  # shape of the displayed slice, None for the loading screen
+        self.zoom = 1.0  # zoom of the view, 1 means the slice fitted to the view
+        self.plane_cache = None  # resliced planes, created when the images are loaded
+        self.tile_buffers = threading.local()  # buffers of the tiles reused by every rendering thread
+        self.pan_position = None  # last mouse position while the view is moved
+        self.graphics_view.setScene(self.scene)
+        self.graphics_view.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        self.graphics_view.resizeEvent = (
+            self.view_resize_event
+        )  # setting the resize event handler, the slice is fitted to the view
+        self.graphics_view.wheelEvent = (
+            self.wheelEvent
+        )  # the wheel changes the slices (or the zoom) instead of scrolling the zoomed view
 
     def set_loading_screen(self) -> None:
         """
@@ -236,17 +580,7 @@ class MainWindow(QtWidgets.QMainWindow):
         painter.drawText(text_x, text_y, text)
         painter.end()
 
-        self.pixmap = QtGui.QPixmap.fromImage(image)
-        self.scene = QtWidgets.QGraphicsScene()
-        self.scene.addPixmap(
-            self.pixmap.scaled(
-                self.graphics_view.width(),
-                self.graphics_view.height(),
-                aspectRatioMode=QtCore.Qt.KeepAspectRatio,
-            )
-        )
-        self.graphics_view.setScene(self.scene)
-        self.graphics_view.show()
+        self.show_pixmap(QtGui.QPixmap.fromImage(image))
 
     def create_menu_bar(self) -> None:
         """
@@ -262,14 +596,226 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         menuBar = self.menuBar()
         self.menuFile = menuBar.addMenu("&File")
+        self.menuFileOpenStudy = QtWidgets.QAction("Open study")
         self.menuFileSave = QtWidgets.QAction("Save as")
         self.menuFileExit = QtWidgets.QAction("Exit")
+        self.menuFileCancel = QtWidgets.QAction("Cancel loading")
+        self.menuFile.addAction(self.menuFileOpenStudy)
         self.menuFile.addAction(self.menuFileSave)
+        self.menuFile.addAction(self.menuFileCancel)
         self.menuFile.addAction(self.menuFileExit)
+        self.menuFileOpenStudy.setShortcut("Ctrl+O")
         self.menuFileSave.setShortcut("Ctrl+S")
+        self.menuFileCancel.setShortcut("Esc")
+        self.menuFileCancel.setEnabled(False)
         self.menuFileExit.setShortcut("Ctrl+Q")
+        self.menuFileOpenStudy.triggered.connect(self.open_study)
         self.menuFileSave.triggered.connect(self.saveImage)
+        self.menuFileCancel.triggered.connect(self.cancel_loading)
         self.menuFileExit.triggered.connect(QtWidgets.qApp.quit)
+        self.menuView = menuBar.addMenu("&View")
+        self.menuViewLivePreview = QtWidgets.QAction("Live window preview")
+        self.menuViewLivePreview.setCheckable(True)
+        self.menuViewLivePreview.setChecked(True)
+        self.menuViewLivePreview.toggled.connect(self.set_live_preview)
+        self.menuView.addAction(self.menuViewLivePreview)
+        self.menuView.addSeparator()
+        self.menuViewPlanes = dict()
+        plane_group = QtWidgets.QActionGroup(self)
+        for plane, shortcut in VIEW_PLANES:
+            action = QtWidgets.QAction(plane.capitalize(), plane_group)
+            action.setCheckable(True)
+            action.setChecked(plane == VIEW_PLANES[0][0])
+            action.setShortcut(shortcut)
+            action.triggered.connect(lambda checked, plane=plane: self.set_plane(plane))
+            self.menuView.addAction(action)
+            self.menuViewPlanes[plane] = action
+        self.menuViewFit = QtWidgets.QAction("Fit to window")
+        self.menuViewFit.setShortcut("Ctrl+0")
+        self.menuViewFit.triggered.connect(self.fit_to_window)
+        self.menuView.addAction(self.menuViewFit)
+        self.menuView.addSeparator()
+        self.menuViewTimings = QtWidgets.QAction("Show timings")
+        self.menuViewTimings.setCheckable(True)
+        self.menuViewTimings.setShortcut("Ctrl+T")
+        self.menuViewTimings.toggled.connect(self.set_instrumentation)
+        self.menuView.addAction(self.menuViewTimings)
+        self.menuViewSaveTrace = QtWidgets.QAction("Save timing trace")
+        self.menuViewSaveTrace.triggered.connect(self.save_timing_trace)
+        self.menuView.addAction(self.menuViewSaveTrace)
+        self.menuViewProfile = QtWidgets.QAction("Profile")
+        self.menuViewProfile.setCheckable(True)
+        self.menuViewProfile.toggled.connect(self.set_profiling)
+        self.menuView.addAction(self.menuViewProfile)
+        self.menuStructures = menuBar.addMenu("&Structures")
+        self.menuStructures.setEnabled(False)
+
+    def create_structures_menu(self) -> None:
+        """
+        Function which fills the structures menu with a checkable action for every ROI
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        self.menuStructures.clear()
+        self.visible_rois = None
+        for roi, name in enumerate(self.structure_set.roi_names):
+            action = self.menuStructures.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(True)
+            action.toggled.connect(
+                lambda checked, roi=roi: self.set_roi_visibility(roi, checked)
+            )
+        self.menuStructures.setEnabled(len(self.structure_set) > 0)
+
+    def set_roi_visibility(self, roi: int, visible: bool) -> None:
+        """
+        Function that shows or hides the given ROI and reloads the current slice
+
+        Parameters
+        ----------
+        roi : int
+            Index of the ROI in the structure set
+        visible : bool
+            Whether the ROI is displayed
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.visible_rois is None:
+            self.visible_rois = set(range(len(self.structure_set)))
+        if visible:
+            self.visible_rois.add(roi)
+        else:
+            self.visible_rois.discard(roi)
+        self.load_image(self.current_slice)
+
+    def set_instrumentation(self, enabled: bool) -> None:
+        """
+        Function that turns on or off measuring of the stages of displaying slices and the overlay
+        with their durations
+
+        Parameters
+        ----------
+        enabled : bool
+            Whether the stages are measured
+
+        Returns
+        -------
+        Nothing
+        """
+        if enabled and not self.timer.wrapped:
+            import_imaging_modules()
+            for name in INSTRUMENTED_FUNCTIONS:
+                owner, _, function = name.rpartition(".")
+                self.timer.wrap(getattr(utils, owner) if owner else utils, function)
+        elif not enabled:
+            self.timer.unwrap()
+        self.timer.clear()
+        self.timer.enabled = enabled
+        self.label_timings.setText(instrumentation.format_summary(self.timer))
+        self.label_timings.adjustSize()
+        self.label_timings.setVisible(enabled)
+
+    def save_timing_trace(self) -> None:
+        """
+        Function that saves the measured stages as a JSON trace in the path given by the user
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        try:
+            file = QtWidgets.QFileDialog.getSaveFileName(
+                self, "Save timing trace", "trace.json", "JSON (*.json)"
+            )
+            if file[0]:
+                self.timer.save_trace(str(file[0]))
+        except Exception as e:
+            print("An error was encountered while saving the timing trace: " + str(e))
+
+    def set_profiling(self, enabled: bool) -> None:
+        """
+        Function that starts profiling of the program, or stops it and saves the statistics in the
+        path given by the user
+
+        Parameters
+        ----------
+        enabled : bool
+            Whether the program is profiled
+
+        Returns
+        -------
+        Nothing
+        """
+        try:
+            if enabled:
+                self.timer.start_profile()
+            else:
+                profile = self.timer.stop_profile()
+                file = QtWidgets.QFileDialog.getSaveFileName(
+                    self, "Save profile", "profile.prof", "Profile (*.prof)"
+                )
+                if profile is not None and file[0]:
+                    profile.dump_stats(str(file[0]))
+        except Exception as e:
+            print("An error was encountered while profiling: " + str(e))
+
+    def set_plane(self, plane: str) -> None:
+        """
+        Function that displays the given plane of the volume, the coronal and sagittal planes start
+        in the middle of the volume
+
+        Parameters
+        ----------
+        plane : str
+            The name of the plane (axial, coronal or sagittal)
+
+        Returns
+        -------
+        Nothing
+        """
+        if plane == self.plane:
+            return
+        self.plane = plane
+        self.menuViewPlanes[plane].setChecked(True)
+        self.zoom = 1.0
+        self.prefetch_generation += 1
+        self.prefetch_pool.clear()
+        self.prefetch_pending.clear()
+        number = 0 if plane == "axial" else self.number_of_slices() // 2
+        self.last_rolled_position = self.current_rolled_position = number
+        self.load_image(number)
+
+    def number_of_slices(self) -> int:
+        """
+        Function that returns the number of slices of the displayed plane
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        int
+            The number of ct slices with structures for the axial plane and the number of rows or
+            columns of the volume for the coronal and sagittal planes, 0 if nothing is loaded
+        """
+        if self.plane == "axial":
+            return len(self.merged_images) if self.merged_images else 0
+        if self.volume is None:
+            return 0
+        return utils.get_number_of_plane_slices(self.volume.array.shape, self.plane)
 
     def saveImage(self) -> None:
         """
@@ -284,7 +830,7 @@ class MainWindow(QtWidgets.QMainWindow):
         Nothing
         """
         try:
-            if self.merged_images:
+            if self.number_of_slices():
                 path = QtWidgets.QFileDialog(
                     caption="Save As", directory=os.path.expanduser("~/Desktop")
                 )
@@ -294,11 +840,20 @@ class MainWindow(QtWidgets.QMainWindow):
                     "image.png",
                     "PNG (*.png);;TIF (*.tif);;TIFF (*.tiff);;BMP (*.bmp);;JPEG (*.jpeg);;JPG (*.jpg)",
                 )
-                image = contrast_enhancement(
-                    self.merged_images[self.last_rolled_position],
-                    self.current_window_center,
-                    self.current_window_width,
-                )
+                if self.plane == "axial":
+                    image = utils.contrast_enhancement(
+                        self.merged_images[self.last_rolled_position],
+                        self.current_window_center,
+                        self.current_window_width,
+                    )
+                else:
+                    image = utils.render_plane(
+                        self.volume,
+                        self.plane,
+                        self.current_slice,
+                        self.current_window_center,
+                        self.current_window_width,
+                    )
                 cv2.imwrite(str(file[0]), image)
         except Exception as e:
             print("An error was encountered while saving an image" + str(e))
@@ -317,9 +872,13 @@ class MainWindow(QtWidgets.QMainWindow):
         Nothing
 
         """
-        if self.merged_images:
-            if len(self.merged_images) > 0:  # checking that the collection is not empty
-                max_size = len(self.merged_images)
+        if event.modifiers() & QtCore.Qt.ControlModifier:
+            # zooming the view around the mouse cursor
+            if event.angleDelta().y() != 0:
+                self.zoom_view(ZOOM_STEP if event.angleDelta().y() > 0 else 1 / ZOOM_STEP)
+        elif self.number_of_slices():
+            if self.number_of_slices() > 0:  # checking that the collection is not empty
+                max_size = self.number_of_slices()
                 # proper handling of the scroll button
                 if event.angleDelta().y() > 0:
                     if self.last_rolled_position < max_size:
@@ -341,6 +900,69 @@ class MainWindow(QtWidgets.QMainWindow):
                 ):  # change the current position if it is different
                     self.current_rolled_position = self.last_rolled_position
                     self.load_image(self.last_rolled_position)  # reloading the image
+                    self.prefetch_slices(1 if event.angleDelta().y() > 0 else -1)
+
+    def prefetch_slices(self, direction: int, depth: int = PREFETCH_DEPTH) -> None:
+        """
+        Function that renders the following slices in the scrolling direction on worker threads
+
+        Parameters
+        ----------
+        direction : int
+            The scrolling direction, 1 for the next slices and -1 for the previous slices
+        depth : int
+            The number of slices rendered ahead of the current slice
+
+        Returns
+        -------
+        Nothing
+        """
+        # cancelling the requests which have not been started yet
+        self.prefetch_generation += 1
+        self.prefetch_pool.clear()
+        self.prefetch_pending.clear()
+
+        # the slices have the same shape, so the tiles visible now are rendered
+        tiles = self.visible_tiles() if self.displayed_shape is not None else list()
+        for step in range(1, depth + 1):
+            number = (self.current_slice + direction * step) % self.number_of_slices()
+            for key in [
+                layer_key + tile
+                for layer_key in (self.render_key(number), self.structures_key(number))
+                for tile in tiles
+            ]:
+                if key in self.render_cache or key in self.prefetch_pending:
+                    continue
+                task = SliceRenderTask(
+                    self, number, key, self.prefetch_generation, self.study_generation
+                )
+                task.signals.rendered.connect(self.slice_prefetched)
+                self.prefetch_pending.add(key)
+                self.prefetch_pool.start(task)
+
+    def slice_prefetched(self, key: tuple, image: QtGui.QImage, study_generation: int) -> None:
+        """
+        Function that stores the slice rendered in the background in the render cache, unless it
+        was rendered for a study which is not displayed anymore
+
+        Parameters
+        ----------
+        key : tuple
+            The key of the rendered slice in the render cache
+        image : QtGui.QImage
+            The rendered slice, None if the request was cancelled
+        study_generation : int
+            The study generation of the request
+
+        Returns
+        -------
+        Nothing
+        """
+        if study_generation != self.study_generation:
+            return  # the pending keys were cleared when the study was loaded
+        self.prefetch_pending.discard(key)
+        if image is not None and key not in self.render_cache:
+            self.render_cache.put(key, QtGui.QPixmap.fromImage(image))
 
     def mouse_move_event(self, event: QtGui.QMouseEvent) -> None:
         """
@@ -383,6 +1005,52 @@ class MainWindow(QtWidgets.QMainWindow):
             self.label_window_center.setText(
                 "Window center: " + str(self.window_center)
             )
+            if self.live_preview and not self.preview_timer.isActive():
+                self.preview_timer.start()  # the moves until the timeout are rendered once
+        elif event.buttons() & (QtCore.Qt.MiddleButton | QtCore.Qt.RightButton):
+            # moving the zoomed slice with the middle or the right mouse button
+            if self.pan_position is not None:
+                self.pan_view(
+                    event.x() - self.pan_position[0], event.y() - self.pan_position[1]
+                )
+            self.pan_position = (event.x(), event.y())
+
+    def set_live_preview(self, enabled: bool) -> None:
+        """
+        Function that turns on or off re-rendering of the slice while the window is changed
+
+        Parameters
+        ----------
+        enabled : bool
+            Whether the live preview is turned on
+
+        Returns
+        -------
+        Nothing
+        """
+        self.live_preview = enabled
+        if not enabled:
+            self.preview_timer.stop()
+
+    def render_preview(self) -> None:
+        """
+        Function that re-renders the current slice with the window which is being changed. Only the
+        windowing is computed again, the cached layer of rt struct structures is reused and the
+        preview is not stored in the render cache.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        try:
+            if self.current_slice < self.number_of_slices():
+                self.show_slice(self.current_slice, self.window_center, self.window_width)
+        except Exception as e:
+            print("An error was encountered while rendering the preview: " + str(e))
 
     def mouse_press_event(self, event: QtGui.QMouseEvent) -> None:
         """
@@ -400,6 +1068,7 @@ class MainWindow(QtWidgets.QMainWindow):
         """
         self.last_x_position = event.x()
         self.last_y_position = event.y()
+        self.pan_position = (event.x(), event.y())
 
     def mouse_release_event(self, event: QtGui.QMouseEvent) -> None:
         """
@@ -415,11 +1084,12 @@ class MainWindow(QtWidgets.QMainWindow):
         Nothing
 
         """
+        self.preview_timer.stop()
         self.last_x_position = (
             None  # set the variables to None when you release the mouse
         )
         self.last_y_position = None
-        if self.merged_images:
+        if self.number_of_slices():
             if (
                 self.current_window_width != self.window_width
                 or self.current_window_center != self.window_center
@@ -451,8 +1121,7 @@ class MainWindow(QtWidgets.QMainWindow):
             )  # selecting the folder containing the ct files
 
             self.path_to_ct_dir = path + "/*.dcm"
-            self.scene = QtWidgets.QGraphicsScene()
-            if os.path.isdir(self.path_to_ct_dir):
+            if os.path.isdir(path):
                 # find all files in the selected folder
                 self.load_images_with_structures()
             if self.merged_images:
@@ -490,7 +1159,11 @@ class MainWindow(QtWidgets.QMainWindow):
             )  # select the file (must be in a dicom format .dcm)
             self.path_to_rt_file = self.path_to_rt_file[0]
 
-            if check_if_file_is_rt_struct_file(self.path_to_rt_file):
+            self.rt_struct_header = None
+            import_imaging_modules()
+            if ".dcm" in self.path_to_rt_file:  # checking if the file has the 'dcm' extension
+                self.rt_struct_header = utils.read_rtstruct_header(self.path_to_rt_file)
+            if self.rt_struct_header is not None:
                 self.load_images_with_structures()  # load image
 
             if self.merged_images:
@@ -507,9 +1180,10 @@ class MainWindow(QtWidgets.QMainWindow):
                 + str(e)
             )
 
-    def load_images_with_structures(self) -> None:
+    def open_study(self) -> None:
         """
-        Function that loads all images from paths given by the user
+        Function that handles menu action which scans a directory with studies for rt struct files
+        paired with ct series
 
         Parameters
         ----------
@@ -518,28 +1192,372 @@ class MainWindow(QtWidgets.QMainWindow):
         Returns
         -------
         Nothing
-
         """
-        if self.path_to_rt_file and self.path_to_ct_dir:
-            self.setWindowTitle("Loading rt structures and ct images...")
-            self.merged_images = list()
-            self.rt_structures = list()
-            (
-                self.images_with_rt_structures,
-                self.rt_struct_color,
-            ) = load_ct_and_rtstruct_images(
-                self.path_to_ct_dir,
-                self.path_to_rt_file,
-                self.window_width,
-                self.window_center,
-            )
-            for pair in self.images_with_rt_structures:
-                self.merged_images.append(pair[0])
-                self.rt_structures.append(pair[1])
+        try:
+            path = (
+                QtWidgets.QFileDialog.getExistingDirectory()
+            )  # selecting the folder containing the studies
+            if not os.path.isdir(path):
+                return
+            self.cancel_scan()
+            self.setWindowTitle("Scanning dicom files...")
+            self.scan_thread = QtCore.QThread()
+            self.scan_worker = ScanWorker(path)
+            self.scan_worker.moveToThread(self.scan_thread)
+            self.scan_worker.progress.connect(self.scan_progress)
+            self.scan_worker.finished.connect(self.study_scanned)
+            self.scan_worker.finished.connect(self.scan_thread.quit)
+            self.scan_thread.started.connect(self.scan_worker.run)
+            self.scan_thread.start()
+        except Exception as e:
+            print(
+                "An error was encountered while scanning a directory with DICOM files: "
+                + str(e)
+            )
+
+    def cancel_scan(self) -> None:
+        """
+        Function that cancels scanning of the studies and waits for the background thread
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+            self.scan_thread.quit()
+            self.scan_thread.wait()
+            self.scan_worker = None
+            self.scan_thread = None
+            self.setWindowTitle(
+                "Software for visualization of RTStruct structures on CT images"
+            )
+
+    def scan_progress(self, stage: str, done: int, total: int) -> None:
+        """
+        Function that displays progress of the scanning
+
+        Parameters
+        ----------
+        stage : str
+            The name of the scanning stage
+        done : int
+            The number of read files
+        total : int
+            The number of all files
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.scan_worker is not None and self.sender() is self.scan_worker:
+            self.label_blank_space.setText(f"Scanning, {stage}: {done}/{total}")
+
+    def study_scanned(self, index: dict) -> None:
+        """
+        Function that lets the user choose one of the found rt struct files and loads it with its
+        ct series
+
+        Parameters
+        ----------
+        index : dict
+            The index of the scanned directory, None if the scanning was cancelled
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.scan_worker is None or self.sender() is not self.scan_worker:
+            return  # the signal of a cancelled scanning is ignored
+        self.scan_thread.quit()
+        self.scan_thread.wait()
+        self.scan_worker = None
+        self.scan_thread = None
+        self.label_blank_space.setText("")
+        self.setWindowTitle(
+            "Software for visualization of RTStruct structures on CT images"
+        )
+        if index is None:
+            return
+        pairs = scanner.get_structure_pairs(index)
+        if not pairs:
+            self.label_blank_space.setText("No rt struct files with ct series found")
+            return
+        labels = [
+            f"{pair.patient_id}: {os.path.relpath(pair.rtstruct_path, index['directory'])}"
+            f" ({len(pair.ct_paths)} ct images{', ambiguous ct series' if pair.ambiguous else ''})"
+            for pair in pairs
+        ]
+        label, accepted = QtWidgets.QInputDialog.getItem(
+            self, "Open study", "RTStruct file:", labels, 0, False
+        )
+        if not accepted:
+            return
+        pair = pairs[labels.index(label)]
+        self.path_to_ct_dir = pair.ct_paths
+        self.path_to_rt_file = pair.rtstruct_path
+        self.rt_struct_header = utils.read_rtstruct_header(pair.rtstruct_path)
+        if self.rt_struct_header is not None:
+            self.set_loading_screen()
+            self.load_images_with_structures()
+
+    def load_images_with_structures(self) -> None:
+        """
+        Function that starts loading all images from paths given by the user on a background thread
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+
+        """
+        if self.path_to_rt_file and self.path_to_ct_dir:
+            self.cancel_loading()
+            # the running prefetch tasks read the study, so they are finished before it is replaced
+            self.prefetch_generation += 1
+            self.prefetch_pool.clear()
+            self.prefetch_pool.waitForDone()
+            self.prefetch_pending.clear()
+            self.study_generation += 1
+            self.setWindowTitle("Loading rt structures and ct images...")
+            self.merged_images = list()
+            self.rt_structures = list()
+            self.structure_set = None
+            self.structure_overlay = None
+            self.plane_overlay = None
+            self.volume = None
+            self.current_slice = 0
+            self.plane = "axial"
+            self.menuViewPlanes[self.plane].setChecked(True)
+            self.zoom = 1.0
+            import_imaging_modules()
+            self.render_cache = utils.LRUCache(
+                RENDER_CACHE_SIZE,
+                RENDER_CACHE_BYTES,
+                lambda pixmap: pixmap.width() * pixmap.height() * pixmap.depth() // 8,
+            )  # cache of rendered tiles, scrolling back to a slice does not render it again
+            self.plane_cache = utils.LRUCache(PLANE_CACHE_SIZE)
+
+            self.loading_thread = QtCore.QThread()
+            self.loading_worker = LoadingWorker(
+                self.path_to_ct_dir, self.path_to_rt_file, self.rt_struct_header
+            )
+            self.loading_worker.moveToThread(self.loading_thread)
+            self.loading_worker.progress.connect(self.loading_progress)
+            self.loading_worker.structures_loaded.connect(self.structures_loaded)
+            self.loading_worker.volume_opened.connect(self.volume_opened)
+            self.loading_worker.slice_loaded.connect(self.slice_loaded)
+            self.loading_worker.failed.connect(self.loading_failed)
+            self.loading_worker.finished.connect(self.loading_finished)
+            self.loading_worker.finished.connect(self.loading_thread.quit)
+            self.loading_thread.started.connect(self.loading_worker.run)
+            self.menuFileCancel.setEnabled(True)
+            self.loading_thread.start()
+
+    def cancel_loading(self) -> None:
+        """
+        Function that cancels loading of the images and waits for the background thread
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.loading_worker is not None:
+            self.loading_worker.cancel()
+            self.loading_thread.quit()
+            self.loading_thread.wait()  # the worker stops after the slices being decoded
+            # the cancelled worker is kept until its last signal is handled, so the signals
+            # which are already queued can be recognized and ignored
+            self.cancelled_loadings.append((self.loading_worker, self.loading_thread))
+            self.loading_worker = None
+            self.loading_thread = None
+            self.menuFileCancel.setEnabled(False)
+            self.label_blank_space.setText("Loading cancelled")
             self.setWindowTitle(
                 "Software for visualization of RTStruct structures on CT images"
             )
 
+    def loading_progress(self, stage: str, done: int, total: int) -> None:
+        """
+        Function that displays progress of the loading
+
+        Parameters
+        ----------
+        stage : str
+            The name of the loading stage
+        done : int
+            The number of processed items
+        total : int
+            The number of all items of the stage
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.sender() is self.loading_worker:
+            self.label_blank_space.setText(f"{stage.capitalize()}: {done}/{total}")
+
+    def structures_loaded(self, structure_set: utils.StructureSet) -> None:
+        """
+        Function that handles parsed rt struct structures
+
+        Parameters
+        ----------
+        structure_set : StructureSet
+            The ROIs of the rt struct file with their contours
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.sender() is not self.loading_worker:
+            return  # signals of a cancelled loading are ignored
+        self.structure_set = structure_set
+        self.structure_overlay = utils.StructureOverlay(
+            self.rt_structures, self.structure_set.roi_colors
+        )
+        self.create_structures_menu()
+
+    def volume_opened(self, volume: utils.CtVolume, structures: dict) -> None:
+        """
+        Function that handles the volume of the ct series, its slices are decoded in the background
+
+        Parameters
+        ----------
+        volume : CtVolume
+            The volume of the ct series
+        structures : dict
+            The rt struct structures in pixel coordinates of every slice of the volume
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.sender() is self.loading_worker:
+            self.volume = volume
+            self.plane_overlay = utils.PlaneStructureOverlay(
+                structures, len(volume.array), self.structure_set.roi_colors
+            )
+
+    def slice_loaded(self, image: np.ndarray, structure: list) -> None:
+        """
+        Function that adds a decoded slice and displays it if it is the first one
+
+        Parameters
+        ----------
+        image : np.ndarray
+            The decoded ct image slice, a view of the volume
+        structure : list
+            The rt struct structures of the slice
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.sender() is not self.loading_worker:
+            return  # signals of a cancelled loading are ignored
+        self.merged_images.append(image)
+        self.rt_structures.append(structure)
+        if self.plane != "axial":
+            return  # the label shows the number of slices of the resliced plane
+        if len(self.merged_images) == 1:
+            self.load_image(0)
+        else:
+            self.label_slice_number.setText(
+                "Number of slice: "
+                + str(self.current_slice)
+                + "/"
+                + str(len(self.merged_images) - 1)
+            )
+
+    def loading_failed(self, message: str) -> None:
+        """
+        Function that handles an error of the loading
+
+        Parameters
+        ----------
+        message : str
+            The description of the error
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.sender() is self.loading_worker:
+            print("An error was encountered while loading ct images: " + message)
+
+    def loading_finished(self, cancelled: bool) -> None:
+        """
+        Function that handles the end of the loading
+
+        Parameters
+        ----------
+        cancelled : bool
+            Whether the loading was cancelled
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.sender() is not self.loading_worker:
+            # the last signal of a cancelled loading
+            self.cancelled_loadings = [
+                loading
+                for loading in self.cancelled_loadings
+                if loading[0] is not self.sender()
+            ]
+            return
+        self.loading_thread.quit()
+        self.loading_thread.wait()
+        self.loading_worker = None
+        self.loading_thread = None
+        self.menuFileCancel.setEnabled(False)
+        if cancelled:
+            self.label_blank_space.setText("Loading cancelled")
+        elif self.volume is not None and self.volume.decoders:
+            # reporting which pixel data handlers decoded the series
+            self.label_blank_space.setText(
+                "Decoded by: "
+                + ", ".join(
+                    f"{decoder} ({count})" for decoder, count in self.volume.decoders.items()
+                )
+            )
+        else:
+            self.label_blank_space.setText("")
+        self.setWindowTitle(
+            "Software for visualization of RTStruct structures on CT images"
+        )
+
+    def closeEvent(self, event: QtGui.QCloseEvent) -> None:
+        """
+        Function that cancels the loading before the window is closed
+
+        Parameters
+        ----------
+        event : QtGui.QCloseEvent
+            The QCloseEvent class contains parameters that describes a close event.
+
+        Returns
+        -------
+        Nothing
+        """
+        self.cancel_scan()
+        self.cancel_loading()
+        self.prefetch_pool.clear()
+        self.prefetch_pool.waitForDone()
+        super(MainWindow, self).closeEvent(event)
+
     def load_image(self, number: int) -> None:
         """
         Function that loads current slice of ct scan with rt struct structures
@@ -555,50 +1573,590 @@ class MainWindow(QtWidgets.QMainWindow):
 
         """
         try:
-            if self.merged_images:
-                if number >= 0 and number < len(self.merged_images):
+            if self.number_of_slices():
+                if number >= 0 and number < self.number_of_slices():
                     self.current_slice = number  # setting the slice number
                     self.label_slice_number.setText(
                         "Number of slice: "
                         + str(self.current_slice)
                         + "/"
-                        + str(len(self.merged_images) - 1)
-                    )
-                    image = self.merged_images[self.current_slice]
-
-                    image = contrast_enhancement(
-                        image, self.current_window_center, self.current_window_width
-                    )
-
-                    loaded_image = add_rt_struct_to_image(
-                        image,
-                        self.rt_structures[self.current_slice],
-                        self.rt_struct_color,
+                        + str(self.number_of_slices() - 1)
                     )
-
-                    # creating an image from data (using the Format_RGB888 format)
-                    image = QtGui.QImage(
-                        loaded_image.data,
-                        loaded_image.shape[1],
-                        loaded_image.shape[0],
-                        loaded_image.strides[0],
-                        QtGui.QImage.Format_RGB888,
-                    )
-                    self.pixmap = QtGui.QPixmap.fromImage(
-                        image
-                    )  # create a pixmap from a modified image
-                    self.scene = QtWidgets.QGraphicsScene()
-                    self.scene.addPixmap(
-                        self.pixmap.scaled(
-                            self.graphics_view.width() - 2,
-                            self.graphics_view.height() - 2,
-                            aspectRatioMode=QtCore.Qt.KeepAspectRatio,
+                    with self.timer.frame():
+                        self.show_slice(self.current_slice)
+                    if self.timer.enabled:
+                        self.label_timings.setText(
+                            instrumentation.format_summary(self.timer)
                         )
-                    )  # scaling the view to the size of the widget
-                    self.graphics_view.setScene(self.scene)  # setting scene
-                    self.graphics_view.show()
+                        self.label_timings.adjustSize()
         except Exception as e:
             print(
                 f"An error was encountered while loading {self.current_slice} image: "
                 + str(e)
             )
+
+    def show_slice(self, number: int, window_center: int = None, window_width: int = None) -> None:
+        """
+        Function that displays the tiles of the slice and of its rt struct structures which are in
+        the viewport, at the level of detail of the current zoom. The tiles are taken from the
+        render cache or rendered, a different window is used only for the preview and its tiles are
+        not cached.
+
+        Parameters
+        ----------
+        number : int
+            The slice number of the ct scan
+        window_center : int
+            The window center of the preview, None means the current window center
+        window_width : int
+            The window width of the preview, None means the current window width
+
+        Returns
+        -------
+        Nothing
+        """
+        shape = self.layer_shape(number)
+        if self.pixmap_item.isVisible() or shape != self.displayed_shape:
+            # the first slice of the series or of the plane, the view is fitted to it
+            self.pixmap_item.hide()
+            self.displayed_shape = shape
+            self.scene.setSceneRect(0, 0, shape[1], shape[0])
+            self.fit_view()
+        tiles = self.visible_tiles()
+        preview = window_center is not None or window_width is not None
+        image_key = self.render_key(number, window_center, window_width)
+        structures_key = self.structures_key(number)
+        image_tiles = dict()
+        structures_tiles = dict()
+        for tile in tiles:
+            if preview:
+                image = self.render_layer(image_key + tile)
+                image_tiles[tile] = QtGui.QPixmap.fromImage(image)
+            else:
+                image_tiles[tile] = self.layer_pixmap(image_key + tile)
+                structures_tiles[tile] = self.layer_pixmap(structures_key + tile)
+        with self.timer.stage("scene"):
+            self.image_layer.show_tiles(image_tiles)
+            if not preview:
+                self.structures_layer.show_tiles(structures_tiles)
+
+    def show_pixmap(self, pixmap: QtGui.QPixmap) -> None:
+        """
+        Function that displays a whole pixmap (e.g. the loading screen) instead of the tiles
+
+        Parameters
+        ----------
+        pixmap : QtGui.QPixmap
+            The displayed pixmap
+
+        Returns
+        -------
+        Nothing
+        """
+        self.image_layer.show_tiles(dict())
+        self.structures_layer.show_tiles(dict())
+        self.pixmap = pixmap
+        self.pixmap_item.setPixmap(self.pixmap)
+        self.pixmap_item.show()
+        self.displayed_shape = None
+        self.scene.setSceneRect(self.pixmap_item.boundingRect())
+        self.fit_view()
+
+    def layer_shape(self, number: int) -> tuple:
+        """
+        Function that returns the shape of the rendered slice
+
+        Parameters
+        ----------
+        number : int
+            The slice number of the ct scan
+
+        Returns
+        -------
+        tuple
+            The number of rows and columns of the slice in the scene
+        """
+        if self.plane == "axial":
+            return self.merged_images[number].shape[:2]
+        return utils.get_plane_shape(self.volume, self.plane)
+
+    def visible_tiles(self) -> list:
+        """
+        Function that returns the tiles of the displayed slice which are in the viewport
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list
+            The (level of detail, row, column) of every visible tile
+        """
+        step = utils.get_level_of_detail(self.graphics_view.transform().m11())
+        rect = self.graphics_view.mapToScene(
+            self.graphics_view.viewport().rect()
+        ).boundingRect()
+        return [
+            (step, row, column)
+            for row, column in utils.get_visible_tiles(
+                self.displayed_shape,
+                (rect.left(), rect.top(), rect.right(), rect.bottom()),
+                step,
+            )
+        ]
+
+    def fit_view(self) -> None:
+        """
+        Function that scales the displayed slice to the size of the graphics view by the transform
+        of the view, the zoom and the center of the view are kept
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        center = self.graphics_view.mapToScene(self.graphics_view.viewport().rect().center())
+        self.graphics_view.fitInView(self.scene.sceneRect(), QtCore.Qt.KeepAspectRatio)
+        if self.zoom != 1:
+            self.graphics_view.scale(self.zoom, self.zoom)
+            self.graphics_view.centerOn(center)
+
+    def zoom_view(self, factor: float) -> None:
+        """
+        Function that zooms the view around the mouse cursor, the slice is not rendered again, only
+        the tiles which become visible or change their level of detail are rendered
+
+        Parameters
+        ----------
+        factor : float
+            The change of the zoom, the zoom is limited from fitting the slice to MAX_ZOOM
+
+        Returns
+        -------
+        Nothing
+        """
+        zoom = min(max(self.zoom * factor, 1.0), MAX_ZOOM)
+        if zoom == self.zoom or self.displayed_shape is None:
+            return
+        self.graphics_view.setTransformationAnchor(QtWidgets.QGraphicsView.AnchorUnderMouse)
+        self.graphics_view.scale(zoom / self.zoom, zoom / self.zoom)
+        self.graphics_view.setTransformationAnchor(QtWidgets.QGraphicsView.AnchorViewCenter)
+        self.zoom = zoom
+        self.update_tiles()
+
+    def fit_to_window(self) -> None:
+        """
+        Function that resets the zoom, so the whole slice is displayed
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        self.zoom = 1.0
+        self.fit_view()
+        self.update_tiles()
+
+    def pan_view(self, dx: int, dy: int) -> None:
+        """
+        Function that moves the zoomed slice with the mouse
+
+        Parameters
+        ----------
+        dx : int
+            The horizontal movement of the mouse in pixels of the view
+        dy : int
+            The vertical movement of the mouse in pixels of the view
+
+        Returns
+        -------
+        Nothing
+        """
+        horizontal = self.graphics_view.horizontalScrollBar()
+        vertical = self.graphics_view.verticalScrollBar()
+        horizontal.setValue(horizontal.value() - dx)
+        vertical.setValue(vertical.value() - dy)
+        self.update_tiles()
+
+    def update_tiles(self) -> None:
+        """
+        Function that displays the tiles of the current slice after the view was zoomed, moved or
+        resized
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Nothing
+        """
+        if self.displayed_shape is not None and self.current_slice < self.number_of_slices():
+            self.load_image(self.current_slice)
+
+    def view_resize_event(self, event: QtGui.QResizeEvent) -> None:
+        """
+        Function that handles resize event of the graphics view and fits the displayed slice
+
+        Parameters
+        ----------
+        event : QtGui.QResizeEvent
+            The QResizeEvent class contains parameters that describes a resize event.
+
+        Returns
+        -------
+        Nothing
+        """
+        QtWidgets.QGraphicsView.resizeEvent(self.graphics_view, event)
+        self.fit_view()
+        self.update_tiles()
+
+    def render_key(
+        self, number: int, window_center: int = None, window_width: int = None
+    ) -> tuple:
+        """
+        Function that returns the key of the rendered slice in the render cache, the key of a tile
+        is followed by the tile returned by visible_tiles
+
+        Parameters
+        ----------
+        number : int
+            The slice number of the ct scan
+        window_center : int
+            The window center, None means the current window center
+        window_width : int
+            The window width, None means the current window width
+
+        Returns
+        -------
+        tuple
+            All parameters which change the look of the rendered slice
+        """
+        # a resliced plane changes while the slices of the volume are being decoded
+        decoded = 0 if self.plane == "axial" else int(self.volume.decoded.sum())
+        return (
+            "image",
+            self.plane,
+            number,
+            self.current_window_center if window_center is None else window_center,
+            self.current_window_width if window_width is None else window_width,
+            decoded,
+        )
+
+    def structures_key(self, number: int) -> tuple:
+        """
+        Function that returns the key of the layer of rt struct structures in the render cache, the
+        key of a tile is followed by the tile returned by visible_tiles
+
+        Parameters
+        ----------
+        number : int
+            The slice number of the ct scan
+
+        Returns
+        -------
+        tuple
+            All parameters which change the look of the layer of rt struct structures
+        """
+        return (
+            "structures",
+            self.plane,
+            number,
+            None if self.visible_rois is None else frozenset(self.visible_rois),
+        )
+
+    def layer_pixmap(self, key: tuple) -> QtGui.QPixmap:
+        """
+        Function that returns the pixmap of the tile from the render cache or renders it
+
+        Parameters
+        ----------
+        key : tuple
+            The key of the tile of the layer
+
+        Returns
+        -------
+        QtGui.QPixmap
+            The rendered tile, a null pixmap if the tile is empty
+        """
+        pixmap = self.render_cache.get(key)
+        if pixmap is None:
+            image = self.render_layer(key)
+            with self.timer.stage("QPixmap"):
+                pixmap = QtGui.QPixmap.fromImage(image)
+            self.render_cache.put(key, pixmap)
+        return pixmap
+
+    def render_layer(self, key: tuple) -> QtGui.QImage:
+        """
+        Function that renders the tile of the layer of the given key to QImage, it does not use any
+        widgets, so it can be called from worker threads. The image uses the tile buffer of the
+        thread, so it is valid only until the next tile of the layer is rendered on the thread.
+
+        Parameters
+        ----------
+        key : tuple
+            The key of the tile of the layer
+
+        Returns
+        -------
+        QtGui.QImage
+            The rendered tile
+        """
+        if key[0] == "image":
+            _, plane, number, window_center, window_width, decoded, *tile = key
+            return self.render_qimage(
+                number, window_center, window_width, plane, decoded, *tile
+            )
+        _, plane, number, visible_rois, *tile = key
+        return self.render_structures(number, visible_rois, plane, *tile)
+
+    def plane_source(self, plane: str, number: int, decoded: int = 0) -> np.ndarray:
+        """
+        Function that returns the slice of the plane in Hounsfield units, the resliced planes are
+        kept in a cache, so the tiles of one plane slice are resampled only once
+
+        Parameters
+        ----------
+        plane : str
+            The plane of the volume (axial, coronal or sagittal)
+        number : int
+            The slice number in the plane
+        decoded : int
+            The number of decoded slices of the volume, a part of the key of the resliced plane
+
+        Returns
+        -------
+        np.ndarray
+            The slice with square pixels
+        """
+        if plane == "axial":
+            return self.merged_images[number]
+        key = (plane, number, decoded)
+        image = self.plane_cache.get(key)
+        if image is None:
+            image = utils.resample_plane_image(self.volume, plane, number)
+            self.plane_cache.put(key, image)
+        return image
+
+    def render_qimage(
+        self,
+        number: int,
+        window_center: int,
+        window_width: int,
+        plane: str = "axial",
+        decoded: int = 0,
+        step: int = 1,
+        row: int = 0,
+        column: int = 0,
+    ) -> QtGui.QImage:
+        """
+        Function that renders the tile of the slice of ct scan to 8-bit grayscale QImage, only the
+        pixels of the tile at its level of detail are windowed into the reused tile buffer. The rt
+        struct structures are rendered to a separate layer by render_structures.
+
+        Parameters
+        ----------
+        number : int
+            The slice number of the ct scan
+        window_center : int
+            The window center used to render the slice
+        window_width : int
+            The window width used to render the slice
+        plane : str
+            The plane of the volume (axial, coronal or sagittal)
+        decoded : int
+            The number of decoded slices of the volume
+        step : int
+            The level of detail, every step-th pixel of the slice is rendered
+        row : int
+            The first row of the tile
+        column : int
+            The first column of the tile
+
+        Returns
+        -------
+        QtGui.QImage
+            The rendered tile
+        """
+        tile = utils.get_tile(self.plane_source(plane, number, decoded), row, column, step)
+        image = utils.window_image(
+            tile,
+            window_center,
+            window_width,
+            out=self.tile_buffer("image", tile.shape, np.uint8),
+        )
+        return self.array_to_qimage(image, QtGui.QImage.Format_Grayscale8)
+
+    def render_structures(
+        self,
+        number: int,
+        visible_rois: frozenset,
+        plane: str = "axial",
+        step: int = 1,
+        row: int = 0,
+        column: int = 0,
+    ) -> QtGui.QImage:
+        """
+        Function that renders the tile of the transparent layer of rt struct structures to QImage
+
+        Parameters
+        ----------
+        number : int
+            The slice number of the ct scan
+        visible_rois : frozenset
+            The indexes of displayed ROIs, None means all ROIs
+        plane : str
+            The plane of the volume (axial, coronal or sagittal)
+        step : int
+            The level of detail of the tile
+        row : int
+            The first row of the tile
+        column : int
+            The first column of the tile
+
+        Returns
+        -------
+        QtGui.QImage
+            The tile of the layer of rt struct structures, a null image if the tile is empty
+        """
+        if plane == "axial":
+            labels = self.structure_overlay.labels(
+                number, self.merged_images[number].shape, visible_rois
+            )
+            overlay = self.structure_overlay
+        else:
+            labels = self.plane_overlay.labels(
+                plane, number, utils.get_plane_shape(self.volume, plane), visible_rois
+            )
+            overlay = self.plane_overlay
+        span = utils.TILE_SIZE * step
+        labels = labels[row : row + span, column : column + span]
+        if not labels.any():
+            return QtGui.QImage()
+        labels = utils.downsample_labels(labels, step)
+        layer = utils.colorize_rt_structures(
+            labels,
+            overlay.rt_struct_colors,
+            overlay.alpha,
+            out=self.tile_buffer("structures", labels.shape, np.uint32),
+        )
+        return self.array_to_qimage(layer, QtGui.QImage.Format_RGBA8888)
+
+    def tile_buffer(self, layer: str, shape: tuple, dtype) -> np.ndarray:
+        """
+        Function that returns the buffer of the tile of the layer, every thread has its own buffer
+        of every layer, which is allocated once and reused by all tiles
+
+        Parameters
+        ----------
+        layer : str
+            The name of the layer
+        shape : tuple
+            The shape of the tile, at most TILE_SIZE x TILE_SIZE pixels
+        dtype : np.dtype
+            The type of the pixels
+
+        Returns
+        -------
+        np.ndarray
+            The contiguous array with the shape of the tile
+        """
+        buffers = vars(self.tile_buffers)
+        size = shape[0] * shape[1]
+        buffer = buffers.get(layer)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = np.empty(max(size, utils.TILE_SIZE**2), dtype=dtype)
+            buffers[layer] = buffer
+        return buffer[:size].reshape(shape)
+
+    def array_to_qimage(self, array: np.ndarray, image_format) -> QtGui.QImage:
+        """
+        Function that wraps the contiguous image array in QImage without copying it
+
+        Parameters
+        ----------
+        array : np.ndarray
+            The (H,W) grayscale or (H,W,4) RGBA image
+        image_format : QtGui.QImage.Format
+            The format of the image
+
+        Returns
+        -------
+        QtGui.QImage
+            The image which uses the buffer of the array, it is copied by QPixmap.fromImage
+        """
+        with self.timer.stage("QImage"):
+            return QtGui.QImage(
+                array.data, array.shape[1], array.shape[0], array.strides[0], image_format
+            )
+
+
+class TiledLayer:
+    """
+    A class of a layer of the scene which is displayed as square tiles. Every tile is a pixmap item
+    placed at the first pixel of the tile and scaled by its level of detail. The items of the tiles
+    which are not displayed anymore are hidden and reused for the next tiles.
+    """
+
+    def __init__(self, scene: QtWidgets.QGraphicsScene, z_value: float):
+        self.scene = scene
+        self.z_value = z_value
+        self.items = dict()  # displayed items by (level of detail, row, column)
+        self.free_items = list()
+
+    def show_tiles(self, tiles: dict) -> None:
+        """
+        Function that displays the given tiles and hides the other tiles of the layer
+
+        Parameters
+        ----------
+        tiles : dict
+            The pixmaps by (level of detail, row, column), null pixmaps are not displayed
+
+        Returns
+        -------
+        Nothing
+        """
+        for tile in list(self.items):
+            if tile not in tiles or tiles[tile].isNull():
+                item = self.items.pop(tile)
+                item.hide()
+                self.free_items.append(item)
+        for tile, pixmap in tiles.items():
+            if pixmap.isNull():
+                continue
+            item = self.items.get(tile)
+            if item is None:
+                item = self.free_items.pop() if self.free_items else self.create_item()
+                step, row, column = tile
+                item.setPos(column, row)
+                item.setScale(step)
+                item.show()
+                self.items[tile] = item
+            item.setPixmap(pixmap)
+
+    def create_item(self) -> QtWidgets.QGraphicsPixmapItem:
+        """
+        Function that adds a new item of a tile to the scene
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        QtWidgets.QGraphicsPixmapItem
+            The item of the tile
+        """
+        item = self.scene.addPixmap(QtGui.QPixmap())
+        item.setTransformationMode(QtCore.Qt.SmoothTransformation)
+        item.setZValue(self.z_value)
+        return item
@@ -0,0 +1,277 @@
+"""
+
+Instrumentation of the rendering of CT images with RTStruct structures
+
+This script measures how long the stages of displaying a slice take, e.g. decoding, windowing, drawing of the
+contours, conversion to QImage and updating of the scene. The measurements are kept in ring buffers of a fixed size,
+so the instrumentation can be left turned on for a long time. A frame groups the stages measured on one thread while
+one slice is displayed, the stages measured on other threads (loading and prefetching) are kept only as events.
+
+The functions of other modules (e.g. utils) are measured by replacing them with timed wrappers, which are removed when
+the instrumentation is turned off. The measured events can be saved as a JSON trace, which can be opened in
+chrome://tracing or Perfetto, and the whole program can be profiled with cProfile.
+
+The instrumentation uses only the Python standard library, it is turned off by default and costs nothing until it is
+turned on.
+
+"""
+
+import cProfile, functools, json, os, threading, time
+from collections import deque
+
+# Number of measured events and frames kept in the ring buffers
+EVENT_HISTORY_SIZE = 4096
+FRAME_HISTORY_SIZE = 256
+
+
+class StageTimer:
+    """
+    A class which measures the stages of displaying the slices. The events (name, thread, start and
+    duration of every stage) and the frames (duration of the frame and of its stages) are kept in
+    ring buffers, so the oldest measurements are removed.
+
+    Attributes:
+        enabled (bool): whether the stages are measured
+        events (deque): the latest (name, thread id, start, duration) events, times in seconds
+        frames (deque): the latest (duration, {stage: duration}) frames
+        profile (cProfile.Profile): the running profiler, None if the program is not profiled
+        wrapped (list): (owner, name, original function) of the timed functions
+    """
+
+    def __init__(
+        self,
+        event_history_size: int = EVENT_HISTORY_SIZE,
+        frame_history_size: int = FRAME_HISTORY_SIZE,
+    ):
+        self.enabled = False
+        self.events = deque(maxlen=event_history_size)
+        self.frames = deque(maxlen=frame_history_size)
+        self.profile = None
+        self.wrapped = list()
+        self.local = threading.local()  # the frame measured on the current thread
+        self.origin = time.perf_counter()
+
+    def record(self, name: str, start: float, duration: float) -> None:
+        """
+        Function which stores one measured stage
+
+        Args:
+            name (str): name of the stage
+            start (float): time.perf_counter() at the start of the stage
+            duration (float): duration of the stage in seconds
+        """
+        self.events.append((name, threading.get_ident(), start, duration))
+        stages = getattr(self.local, "stages", None)
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + duration
+
+    def stage(self, name: str) -> "StageContext":
+        """
+        Function which returns a context manager measuring the stage
+
+        Args:
+            name (str): name of the stage
+
+        Returns:
+            StageContext: context manager which records the stage when it exits
+        """
+        return StageContext(self, name)
+
+    def frame(self) -> "FrameContext":
+        """
+        Function which returns a context manager measuring a frame with its stages
+
+        Returns:
+            FrameContext: context manager which records the frame when it exits
+        """
+        return FrameContext(self)
+
+    def wrap(self, owner, name: str) -> None:
+        """
+        Function which replaces the function (or method) of the module (or class) with a timed one
+
+        Args:
+            owner (module or class): owner of the function
+            name (str): name of the function, it is also the name of the stage
+        """
+        function = getattr(owner, name)
+        stage = name if isinstance(owner, type(os)) else owner.__name__ + "." + name
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(stage, start, time.perf_counter() - start)
+
+        setattr(owner, name, timed)
+        self.wrapped.append((owner, name, function))
+
+    def unwrap(self) -> None:
+        """
+        Function which restores all functions replaced by wrap
+        """
+        while self.wrapped:
+            owner, name, function = self.wrapped.pop()
+            setattr(owner, name, function)
+
+    def clear(self) -> None:
+        """
+        Function which removes all measured events and frames
+        """
+        self.events.clear()
+        self.frames.clear()
+
+    def summary(self) -> dict:
+        """
+        Function which summarizes the measured stages
+
+        Returns:
+            dict: (last duration, mean duration, number of events) of every stage in seconds, the
+            frames are summarized as the 'frame' stage
+        """
+        durations = dict()
+        for name, _, _, duration in list(self.events):
+            durations.setdefault(name, list()).append(duration)
+        frames = [duration for duration, _ in list(self.frames)]
+        if frames:
+            durations["frame"] = frames
+        return {
+            name: (values[-1], sum(values) / len(values), len(values))
+            for name, values in durations.items()
+        }
+
+    def last_frame(self) -> tuple:
+        """
+        Function which returns the latest frame
+
+        Returns:
+            tuple: duration of the frame and durations of its stages, None if there is no frame
+        """
+        return self.frames[-1] if self.frames else None
+
+    def save_trace(self, file_path: str) -> None:
+        """
+        Function which saves the measured events in the Trace Event Format
+
+        Args:
+            file_path (str): path of the JSON file
+        """
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "pid": os.getpid(),
+                "tid": thread,
+                "ts": (start - self.origin) * 1e6,
+                "dur": duration * 1e6,
+            }
+            for name, thread, start, duration in list(self.events)
+        ]
+        with open(file_path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def start_profile(self) -> None:
+        """
+        Function which starts profiling of the program with cProfile
+        """
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop_profile(self, file_path: str = None) -> cProfile.Profile:
+        """
+        Function which stops profiling and saves the statistics
+
+        Args:
+            file_path (str, optional): path of the statistics file, which can be read by the pstats
+            module or snakeviz. Defaults to None (not saved).
+
+        Returns:
+            cProfile.Profile: the stopped profiler, None if the program was not profiled
+        """
+        profile, self.profile = self.profile, None
+        if profile is not None:
+            profile.disable()
+            if file_path:
+                profile.dump_stats(file_path)
+        return profile
+
+
+class StageContext:
+    """
+    A context manager which measures one stage, it does nothing when the timer is not enabled
+    """
+
+    def __init__(self, timer: StageTimer, name: str):
+        self.timer = timer
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if self.timer.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        if self.start is not None:
+            self.timer.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class FrameContext:
+    """
+    A context manager which measures a frame, the stages measured on the same thread until it exits
+    are added to the frame
+    """
+
+    def __init__(self, timer: StageTimer):
+        self.timer = timer
+        self.start = None
+
+    def __enter__(self):
+        if self.timer.enabled:
+            self.start = time.perf_counter()
+            self.timer.local.stages = dict()
+        return self
+
+    def __exit__(self, *exception):
+        if self.start is not None:
+            stages, self.timer.local.stages = self.timer.local.stages, None
+            self.timer.frames.append((time.perf_counter() - self.start, stages))
+        return False
+
+
+def format_summary(timer: StageTimer) -> str:
+    """
+    Function which describes the latest frame and the mean durations of the stages
+
+    Args:
+        timer (StageTimer): the timer with the measurements
+
+    Returns:
+        str: one line for the frame and one line for every stage sorted by the mean duration,
+        durations in ms
+    """
+    summary = timer.summary()
+    if "frame" not in summary:
+        return "No frames measured"
+    last, mean, count = summary.pop("frame")
+    lines = [
+        "frame: %.1f ms (mean %.1f ms, %.0f fps, %d frames)"
+        % (last * 1e3, mean * 1e3, 1 / mean if mean else 0.0, count)
+    ]
+    # the stages which are not a part of any frame are measured on the background threads
+    frame_stages = set()
+    for _, stages in list(timer.frames):
+        frame_stages.update(stages)
+    for name in sorted(summary, key=lambda name: -summary[name][1]):
+        last, mean, count = summary[name]
+        lines.append(
+            "%s%s: %.2f ms (mean %.2f ms)"
+            % (name, "" if name in frame_stages else " [background]", last * 1e3, mean * 1e3)
+        )
+    return "\n".join(lines)
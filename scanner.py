@@ -0,0 +1,400 @@
+"""
+
+Scanner of DICOM studies which pairs the RTStruct structure files with their CT series
+
+This script walks a directory tree with DICOM studies and reads only the headers of the files, the contours and the
+pixel data are never parsed. The files are grouped by SeriesInstanceUID and every RTStruct file is paired with the
+CT series it references in its ReferencedFrameOfReferenceSequence (by the referenced SeriesInstanceUID, or by the
+FrameOfReferenceUID when the referenced series is not found). When several CT series are candidates, the series with
+the most images referenced in the ContourImageSequence is chosen, then the series with the most images, and the pair
+is marked as ambiguous when the contour images do not decide it. The headers are read on a pool of workers.
+
+The result is saved as a JSON index in the scanned directory. When the directory is scanned again, the headers of the
+files which have not changed since the previous scan are taken from the index, so only new or modified files are read.
+
+The scanner can be used from the command line (python scanner.py <directory>) or from the graphical user interface.
+
+This script requires following libraries to be installed:
+ • pydicom - pure Python package for working with DICOM files, which allows user to read complex files into pythonic
+    structures for manipulation, save the modified datasets as DICOM format files
+ • numpy - library for scientific computing with Python programming language, including support for multi-dimensional
+    arrays and matrices and functions to operate on them
+
+"""
+
+import argparse, json, os
+from collections import namedtuple
+from utils import (
+    CACHE_DIRECTORY,
+    PROGRESS_FILES_READ,
+    RT_STRUCTURE_SET_STORAGE,
+    get_patient_position,
+    iterate_with_workers,
+    read_dicom_header,
+)
+
+# Last tag read from the headers, the ReferencedFrameOfReferenceSequence of the rt struct files
+REFERENCED_FRAME_OF_REFERENCE_TAG = 0x30060010
+
+# Name and version of the index file saved in the scanned directory
+INDEX_FILE_NAME = "dicom_index.json"
+INDEX_VERSION = 2
+
+# Modalities of the series which can be displayed with the rt struct structures
+IMAGE_MODALITIES = ("CT",)
+
+# Summary of the header of one dicom file
+DicomFileHeader = namedtuple(
+    "DicomFileHeader",
+    [
+        "path",
+        "size",
+        "mtime",
+        "modality",
+        "patient_id",
+        "study_uid",
+        "series_uid",
+        "frame_of_reference_uid",
+        "z",
+        "referenced_series_uids",
+        "referenced_frame_of_reference_uids",
+        "sop_instance_uid",
+        "referenced_sop_instance_uids",
+    ],
+)
+
+# Rt struct file paired with the ct series it references, ambiguous when other ct series could
+# be referenced as well
+StructurePair = namedtuple(
+    "StructurePair", ["patient_id", "rtstruct_path", "series_uid", "ct_paths", "ambiguous"]
+)
+
+
+def read_file_header(file_path: str) -> DicomFileHeader:
+    """
+    Function which reads the header of the dicom file, up to the ReferencedFrameOfReferenceSequence
+
+    Args:
+        file_path (str): path to the dicom file
+
+    Returns:
+        DicomFileHeader: summary of the header or None if the file is not a dicom file of a series
+    """
+    try:
+        stat = os.stat(file_path)
+        header = read_dicom_header(file_path, REFERENCED_FRAME_OF_REFERENCE_TAG)
+        series_uid = header.get("SeriesInstanceUID")
+    except Exception:
+        return None  # not a dicom file (or a damaged one)
+    if series_uid is None:
+        return None
+
+    modality = str(header.get("Modality", ""))
+    sop_class_uid = header.get("SOPClassUID")
+    if sop_class_uid is None:
+        sop_class_uid = header.file_meta.get("MediaStorageSOPClassUID")
+    if sop_class_uid == RT_STRUCTURE_SET_STORAGE:
+        modality = "RTSTRUCT"
+
+    z = None
+    if "ImagePositionPatient" in header:
+        z = float(get_patient_position(header)[2])
+
+    referenced_series_uids = list()
+    referenced_frame_of_reference_uids = list()
+    referenced_sop_instance_uids = list()
+    for frame_of_reference in header.get("ReferencedFrameOfReferenceSequence", []):
+        if "FrameOfReferenceUID" in frame_of_reference:
+            referenced_frame_of_reference_uids.append(
+                str(frame_of_reference.FrameOfReferenceUID)
+            )
+        for study in frame_of_reference.get("RTReferencedStudySequence", []):
+            for series in study.get("RTReferencedSeriesSequence", []):
+                if "SeriesInstanceUID" in series:
+                    referenced_series_uids.append(str(series.SeriesInstanceUID))
+                for image in series.get("ContourImageSequence", []):
+                    if "ReferencedSOPInstanceUID" in image:
+                        referenced_sop_instance_uids.append(str(image.ReferencedSOPInstanceUID))
+
+    return DicomFileHeader(
+        file_path,
+        stat.st_size,
+        stat.st_mtime_ns,
+        modality,
+        str(header.get("PatientID", "")),
+        str(header.get("StudyInstanceUID", "")),
+        str(series_uid),
+        str(header.get("FrameOfReferenceUID", "")),
+        z,
+        referenced_series_uids,
+        referenced_frame_of_reference_uids,
+        str(header.get("SOPInstanceUID", "")),
+        referenced_sop_instance_uids,
+    )
+
+
+def find_dicom_files(directory: str) -> list:
+    """
+    Function which finds all files of the directory tree, except the caches and the index
+
+    Args:
+        directory (str): root of the scanned directory tree
+
+    Returns:
+        list: sorted paths of the files
+    """
+    file_paths = list()
+    for root, directories, file_names in os.walk(directory):
+        if CACHE_DIRECTORY in directories:
+            directories.remove(CACHE_DIRECTORY)
+        for file_name in file_names:
+            if file_name != INDEX_FILE_NAME:
+                file_paths.append(os.path.join(root, file_name))
+    return sorted(file_paths)
+
+
+def group_series(headers: list) -> dict:
+    """
+    Function which groups the headers of the files by SeriesInstanceUID
+
+    Args:
+        headers (list): headers of the scanned files
+
+    Returns:
+        dict: headers of the files of every series, the image files are sorted by Z axis
+    """
+    series = dict()
+    for header in headers:
+        series.setdefault(header.series_uid, list()).append(header)
+    for files in series.values():
+        files.sort(key=lambda header: (header.z is None, header.z or 0.0, header.path))
+    return series
+
+
+def pair_structures(series: dict) -> list:
+    """
+    Function which pairs every rt struct file with the ct series it references
+
+    The series referenced in the RTReferencedSeriesSequence is used first. When it was not scanned,
+    the ct series with the referenced FrameOfReferenceUID are the candidates. Of several candidates
+    the series with the most images of the ContourImageSequence is chosen, then the series with the
+    most images. The pair is ambiguous when the contour images do not decide between the candidates.
+
+    Args:
+        series (dict): headers of the files of every series, returned by group_series
+
+    Returns:
+        list: StructurePair of every rt struct file with a found ct series
+    """
+    image_series = {
+        series_uid: files
+        for series_uid, files in series.items()
+        if files[0].modality in IMAGE_MODALITIES
+    }
+    frames_of_reference = dict()
+    for series_uid, files in image_series.items():
+        frames_of_reference.setdefault(files[0].frame_of_reference_uid, list()).append(series_uid)
+
+    pairs = list()
+    for files in series.values():
+        for header in files:
+            if header.modality != "RTSTRUCT":
+                continue
+            candidates = [
+                series_uid
+                for series_uid in dict.fromkeys(header.referenced_series_uids)
+                if series_uid in image_series
+            ]
+            if not candidates:
+                candidates = [
+                    series_uid
+                    for frame_of_reference_uid in dict.fromkeys(
+                        header.referenced_frame_of_reference_uids
+                    )
+                    for series_uid in frames_of_reference.get(frame_of_reference_uid, [])
+                ]
+            if not candidates:
+                continue
+            contour_images = set(header.referenced_sop_instance_uids)
+            scores = {
+                series_uid: (
+                    sum(
+                        ct_file.sop_instance_uid in contour_images
+                        for ct_file in image_series[series_uid]
+                    ),
+                    len(image_series[series_uid]),
+                )
+                for series_uid in candidates
+            }
+            ranking = sorted(candidates, key=lambda series_uid: scores[series_uid], reverse=True)
+            ambiguous = len(ranking) > 1 and scores[ranking[0]][0] == scores[ranking[1]][0]
+            pairs.append(
+                StructurePair(
+                    header.patient_id,
+                    header.path,
+                    ranking[0],
+                    [ct_file.path for ct_file in image_series[ranking[0]]],
+                    ambiguous,
+                )
+            )
+    return sorted(pairs, key=lambda pair: (pair.patient_id, pair.rtstruct_path))
+
+
+def load_index(index_path: str) -> dict:
+    """
+    Function which loads the saved index of the scanned directory
+
+    Args:
+        index_path (str): path to the index file
+
+    Returns:
+        dict: the index or None if there is no valid index
+    """
+    try:
+        with open(index_path) as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION:
+        return None
+    return index
+
+
+def save_index(index: dict, index_path: str) -> None:
+    """
+    Function which saves the index of the scanned directory
+
+    Args:
+        index (dict): the saved index
+        index_path (str): path to the index file
+    """
+    temporary_path = index_path + ".tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(index, file)
+    os.replace(temporary_path, index_path)
+
+
+def scan_directory(
+    directory: str,
+    workers: int = 1,
+    use_processes: bool = False,
+    use_index: bool = True,
+    progress=None,
+    should_cancel=None,
+) -> dict:
+    """
+    Function which scans the directory tree and pairs the rt struct files with the ct series
+
+    Args:
+        directory (str): root of the scanned directory tree
+        workers (int, optional): number of workers used to read the headers. Defaults to 1 (serial).
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to False.
+        use_index (bool, optional): reuse and save the index in the directory. Defaults to True.
+        progress (callable, optional): function called with the stage name, number of read files
+        and number of all files. Defaults to None.
+        should_cancel (callable, optional): function which returns True when the scanning should
+        be stopped. Defaults to None.
+
+    Returns:
+        dict: index with the headers of the files ('files'), the files of every series ('series')
+        and the rt struct files paired with the ct series ('pairs'), None if cancelled
+    """
+    directory = os.path.abspath(directory)
+    index_path = os.path.join(directory, INDEX_FILE_NAME)
+    previous_index = load_index(index_path) if use_index else None
+    previous_headers = dict()
+    if previous_index is not None:
+        for values in previous_index["files"]:
+            header = DicomFileHeader(*values)
+            previous_headers[header.path] = header
+
+    headers = list()
+    unread_paths = list()
+    for file_path in find_dicom_files(directory):
+        header = previous_headers.get(file_path)
+        if header is not None:
+            stat = os.stat(file_path)
+            if (header.size, header.mtime) == (stat.st_size, stat.st_mtime_ns):
+                headers.append(header)
+                continue
+        unread_paths.append(file_path)
+
+    for number, header in enumerate(
+        iterate_with_workers(
+            read_file_header, unread_paths, workers, use_processes, should_cancel
+        ),
+        1,
+    ):
+        if header is not None:
+            headers.append(header)
+        if progress is not None:
+            progress(PROGRESS_FILES_READ, number, len(unread_paths))
+    if should_cancel is not None and should_cancel():
+        return None
+
+    series = group_series(headers)
+    index = {
+        "version": INDEX_VERSION,
+        "directory": directory,
+        "files": [list(header) for header in sorted(headers)],
+        "series": {
+            series_uid: [header.path for header in files]
+            for series_uid, files in series.items()
+        },
+        "pairs": [list(pair) for pair in pair_structures(series)],
+    }
+    if use_index:
+        try:
+            save_index(index, index_path)
+        except OSError:
+            pass  # the directory is read-only
+    return index
+
+
+def get_structure_pairs(index: dict) -> list:
+    """
+    Function which returns the rt struct files paired with the ct series from the index
+
+    Args:
+        index (dict): index returned by scan_directory or load_index
+
+    Returns:
+        list: StructurePair of every rt struct file with a found ct series
+    """
+    return [StructurePair(*values) for values in index["pairs"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="root of the scanned directory tree")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--processes", action="store_true", help="read the headers in processes"
+    )
+    parser.add_argument(
+        "--no-index", action="store_true", help="do not reuse and save the index"
+    )
+    arguments = parser.parse_args()
+
+    index = scan_directory(
+        arguments.directory,
+        arguments.workers,
+        arguments.processes,
+        not arguments.no_index,
+    )
+    pairs = get_structure_pairs(index)
+    print(
+        "%d files, %d series, %d rt struct files paired with ct series"
+        % (len(index["files"]), len(index["series"]), len(pairs))
+    )
+    for pair in pairs:
+        print(
+            "%s: %s -> %d ct files of %s%s"
+            % (
+                pair.patient_id,
+                pair.rtstruct_path,
+                len(pair.ct_paths),
+                pair.series_uid,
+                " (ambiguous)" if pair.ambiguous else "",
+            )
+        )
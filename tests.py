@@ -1,7 +1,25 @@
-import unittest
+import glob, importlib.util, json, os, shutil, subprocess, sys, tempfile, unittest
+import numpy as np
 import pydicom as dicom
 
 from utils import *
+from scanner import (
+    INDEX_FILE_NAME,
+    DicomFileHeader,
+    get_structure_pairs,
+    group_series,
+    pair_structures,
+    scan_directory,
+)
+from export import WINDOW_PRESETS, export_structures
+from instrumentation import StageTimer, format_summary
+from benchmarks import generate_ct_series, generate_rtstruct
+
+# Synthetic study generated for the tests, the contours are on the slices in the middle of the series
+TEST_NUMBER_OF_SLICES = 12
+TEST_MATRIX_SIZE = 128
+TEST_NUMBER_OF_ROIS = 3
+TEST_CONTOURED_SLICES = slice(2, 10)
 
 
 class RtSrtuctTests(unittest.TestCase):
@@ -14,7 +32,11 @@ class RtSrtuctTests(unittest.TestCase):
         unittest (type): The base class for all test cases. Inherits farom `unittest.TestCase`.
 
     Attributes:
-        None
+        study_directory (tempfile.TemporaryDirectory): directory of the synthetic study
+        ct_images_files_path (str): glob pattern of the synthetic ct files
+        rtstruct_data_file_path (str): path of the synthetic RT-STRUCT file
+        loaded_images (tuple): ct slices with structures and the structure set of the study
+        data_dicom (dicom.FileDataset): the first ct file of the study
 
     Methods:
         test_if_images(self): Test if the RtStruct contains valid images.
@@ -25,25 +47,70 @@ class RtSrtuctTests(unittest.TestCase):
         test_if_rt_struct_structure_file(self): Test if a specific structure exists in the provided RT-STRUCT file.
         test_if_parse_rt_struct(self): Test if the provided RT-STRUCT file can be successfully parsed.
         test_if_loaded_rt_struct(self): Test if an RT-STRUCT file has been successfully loaded.
+        test_if_parallel_loading(self): Test if parallel loading returns the same images as serial loading.
+        test_if_series_index(self): Test if the series index is sorted by Z axis.
+        test_if_find_rt_struct_key(self): Test if slices are matched with structures within the Z tolerance.
+        test_if_patient_to_pixel(self): Test if contour points are converted to the pixel coordinates.
+        test_if_parse_structure_set(self): Test if all ROIs and contours of the RT-STRUCT file are parsed.
+        test_if_rasterize_rt_structures(self): Test if structures are rasterized and blended with their colors.
+        test_if_colorize_rt_structures(self): Test if the transparent layer of structures looks like the blended image.
+        test_if_lru_cache(self): Test if the cache removes the least recently used items.
+        test_if_window_lut(self): Test if windowing with the lookup table matches the arithmetic windowing.
+        test_if_window_image_buffers(self): Test if the gray tiles and the structure layers are written to reused buffers.
+        test_if_ct_volume(self): Test if the volume contains the whole series and its cache can be reopened.
+        test_if_ct_volume_mixed_series(self): Test if slices with other rescales and directories are cached exactly.
+        test_if_structure_set_cache(self): Test if the cached structure set is reused until the file changes.
+        test_if_read_rtstruct_header(self): Test if rt struct files are detected from their headers only.
+        test_if_scan_directory(self): Test if the scanner pairs the RT-STRUCT file with its CT series.
+        test_if_pair_structures(self): Test if the CT series of a frame of reference is chosen by its contour images.
+        test_if_export_structures(self): Test if every CT slice with structures is exported without PyQt5.
+        test_if_gui_imports_lazily(self): Test if the gui module does not import the imaging modules.
+        test_if_decode_pixel_data(self): Test if compressed pixel data is decoded by the selected handler.
+        test_if_register_pixel_decoder(self): Test if a registered pixel data handler is selected for its transfer syntax.
+        test_if_rescale_to_hounsfield(self): Test if the stored values are converted to Hounsfield units.
+        test_if_plane_structures(self): Test if coronal and sagittal planes are resliced with their structures.
+        test_if_tiles(self): Test if only the visible tiles are rendered at the level of detail of the zoom.
+        test_if_stage_timer(self): Test if the stages of the frames are measured in bounded ring buffers.
 
     """
 
-    # loading ct data
-    ct_images_files_path = (
-        "data/Pediatric-CT-SEG-02AC04B6/09-21-2005-NA-CT-35474/4.000000-CT-08387/*.dcm"
-    )
-    rtstruct_data_file_path = "data/Pediatric-CT-SEG-02AC04B6/09-21-2005-NA-CT-35474/2.000000-RTSTRUCT-86390/1-1.dcm"
+    @classmethod
+    def setUpClass(cls):
+        """Generate the synthetic study used by the tests.
 
-    # loading ct and rt struct data
-    loaded_images = load_ct_and_rtstruct_images(
-        ct_images_files_path, rtstruct_data_file_path, 1000, 1000
-    )
+        This method writes a ct series and an RT-STRUCT file referencing it
+        to a temporary directory, so the tests do not need any patient data.
+        """
+        cls.study_directory = tempfile.TemporaryDirectory()
+        ct_directory = os.path.join(cls.study_directory.name, "CT")
+        rtstruct_directory = os.path.join(cls.study_directory.name, "RTSTRUCT")
+        os.makedirs(rtstruct_directory)
+
+        # generating ct data
+        positions = generate_ct_series(ct_directory, TEST_NUMBER_OF_SLICES, TEST_MATRIX_SIZE)
+        cls.ct_images_files_path = os.path.join(ct_directory, "*.dcm")
+        cls.rtstruct_data_file_path = os.path.join(rtstruct_directory, "1-1.dcm")
+        generate_rtstruct(
+            cls.rtstruct_data_file_path,
+            positions[TEST_CONTOURED_SLICES],
+            TEST_MATRIX_SIZE,
+            number_of_rois=TEST_NUMBER_OF_ROIS,
+            ct_directory=ct_directory,
+        )
+
+        # loading ct and rt struct data
+        cls.loaded_images = load_ct_and_rtstruct_images(
+            cls.ct_images_files_path, cls.rtstruct_data_file_path, 1000, 1000
+        )
+
+        # loading data dicom
+        cls.data_dicom = dicom.dcmread(
+            sorted(glob.glob(cls.ct_images_files_path))[0], force=True
+        )
 
-    # loading data dicom
-    data_dicom = dicom.dcmread(
-        "data/Pediatric-CT-SEG-02AC04B6/09-21-2005-NA-CT-35474/4.000000-CT-08387/1-001.dcm",
-        force=True,
-    )
+    @classmethod
+    def tearDownClass(cls):
+        cls.study_directory.cleanup()
 
     def test_if_images(self):
         """Test if the RtStruct contains valid images.
@@ -138,15 +205,28 @@ class RtSrtuctTests(unittest.TestCase):
 
         This function takes an RT-STRUCT file as input and checks if it can be
         parsed correctly. It attempts to parse the RT-STRUCT file using a DICOM
-        parsing library and verifies if the parsing is successful.
+        parsing library and verifies if the parsing is successful and that no
+        contour is lost when several contours lie on the same Z position. The
+        contours have to be (N,3) arrays, and a file without ROIs has to give
+        no contours and no color.
         """
-        parsed_structures = parse_rtstruct(
-            dicom.dcmread(
-                self.rtstruct_data_file_path,
-                force=True,
-            )
-        )
+        rtstruct = dicom.dcmread(self.rtstruct_data_file_path, force=True)
+        parsed_structures, color = parse_rtstruct(rtstruct)
         self.assertIsNotNone(parsed_structures)
+        structure_set = parse_structure_set(rtstruct)
+        self.assertEqual(color, structure_set.roi_colors[0])
+        self.assertEqual(
+            sum(len(contours) for contours in parsed_structures.values()),
+            len(structure_set.contour_rois),
+        )
+        for contours in parsed_structures.values():
+            for points in contours:
+                self.assertEqual(points.shape[1], 3)
+
+        empty = dicom.Dataset()
+        empty.StructureSetROISequence = dicom.Sequence()
+        empty.ROIContourSequence = dicom.Sequence()
+        self.assertEqual(parse_rtstruct(empty), ({}, None))
 
     def test_if_loaded_rt_struct(self):
         """Test if an RT-STRUCT file has been successfully loaded.
@@ -159,6 +239,702 @@ class RtSrtuctTests(unittest.TestCase):
         self.assertIsNotNone(rt_struct_structures)
         self.assertIsInstance(rt_struct_structures, dicom.FileDataset)
 
+    def test_if_parallel_loading(self):
+        """Test if parallel loading returns the same images as serial loading.
+
+        This method loads the ct images and rt struct structures with a thread pool
+        and checks if the result has the same order and content as the images
+        loaded serially by the class.
+        """
+        loaded_images, structure_set = load_ct_and_rtstruct_images(
+            self.ct_images_files_path, self.rtstruct_data_file_path, 1000, 1000, workers=4
+        )
+        self.assertEqual(len(loaded_images), len(self.loaded_images[0]))
+        self.assertEqual(structure_set.roi_colors, self.loaded_images[1].roi_colors)
+        for (image, structure), (expected_image, expected_structure) in zip(
+            loaded_images, self.loaded_images[0]
+        ):
+            self.assertTrue((image == expected_image).all())
+            self.assertEqual(len(structure), len(expected_structure))
+            for (roi, points), (expected_roi, expected_points) in zip(
+                structure, expected_structure
+            ):
+                self.assertEqual(roi, expected_roi)
+                self.assertTrue((points == expected_points).all())
+
+    def test_if_series_index(self):
+        """Test if the series index is sorted by Z axis.
+
+        This method builds the index of the ct series from the file headers and
+        checks if every file is indexed and the slices are sorted by Z axis.
+        """
+        series_index = build_series_index(self.ct_images_files_path)
+        self.assertEqual(len(series_index), len(glob.glob(self.ct_images_files_path)))
+        z_positions = [header.z for header in series_index]
+        self.assertEqual(z_positions, sorted(z_positions))
+
+    def test_if_find_rt_struct_key(self):
+        """Test if slices are matched with structures within the Z tolerance.
+
+        This method checks if the nearest Z key is found for slice positions
+        which differ from the keys by a floating point error, and if slices
+        outside of the tolerance are not matched.
+        """
+        z_keys = [-12.5, -10.0, 0.0, 2.5]
+        self.assertEqual(find_rt_struct_key(z_keys, -10.0), -10.0)
+        self.assertEqual(find_rt_struct_key(z_keys, 2.5049), 2.5)
+        self.assertEqual(find_rt_struct_key(z_keys, -12.495), -12.5)
+        self.assertIsNone(find_rt_struct_key(z_keys, 1.25))
+        self.assertIsNone(find_rt_struct_key(z_keys, 100.0))
+        self.assertIsNone(find_rt_struct_key([], 0.0))
+
+    def test_if_patient_to_pixel(self):
+        """Test if contour points are converted to the pixel coordinates.
+
+        This method converts points with the vectorized affine transform and
+        compares them with the conversion of the single points, for the default
+        orientation and for an image with swapped rows and columns.
+        """
+        points = np.array([[10.0, 20.0, 5.0], [-3.5, 7.25, 5.0], [0.0, 0.0, 5.0]])
+        position = (-100.0, -50.0, 5.0)
+        pixels = patient_to_pixel(points, position, 0.5, 0.25)
+        expected = [
+            (int((x - position[0]) / 0.5), int((y - position[1]) / 0.25))
+            for x, y, _ in points
+        ]
+        self.assertEqual(pixels.tolist(), [list(point) for point in expected])
+
+        pixels = patient_to_pixel(points, position, 0.5, 0.25, (0, 1, 0, 1, 0, 0))
+        expected = [
+            (int((y - position[1]) / 0.5), int((x - position[0]) / 0.25))
+            for x, y, _ in points
+        ]
+        self.assertEqual(pixels.tolist(), [list(point) for point in expected])
+
+    def test_if_parse_structure_set(self):
+        """Test if all ROIs and contours of the RT-STRUCT file are parsed.
+
+        This method parses the RT-STRUCT file into the structure set and checks
+        if it contains every ROI with its color and every contour, also when
+        several contours lie on the same slice.
+        """
+        rtstruct = load_rtstruct(self.rtstruct_data_file_path)
+        structure_set = parse_structure_set(rtstruct)
+        self.assertEqual(len(structure_set), len(rtstruct.ROIContourSequence))
+        self.assertEqual(len(structure_set.roi_colors), len(structure_set))
+
+        contours = [
+            contour
+            for structure in rtstruct.ROIContourSequence
+            for contour in structure.get("ContourSequence", [])
+        ]
+        self.assertEqual(len(structure_set.contour_offsets), len(contours) + 1)
+        self.assertEqual(
+            len(structure_set.points),
+            sum(len(contour.ContourData) // 3 for contour in contours),
+        )
+        parsed_contours = sum(
+            len(structure_set.contours(slice_index))
+            for slice_index in range(len(structure_set.slice_z))
+        )
+        self.assertEqual(parsed_contours, len(contours))
+
+    def test_if_rasterize_rt_structures(self):
+        """Test if structures are rasterized and blended with their colors.
+
+        This method rasterizes contours of two ROIs into the label layer, checks
+        that only the requested ROIs are drawn, and that the blended image has
+        the colors of the ROIs on the contours.
+        """
+        image = np.zeros((64, 64, 3), dtype=np.uint8)
+        structures = [
+            (0, np.array([[10, 10], [50, 10], [50, 50]])),
+            (1, np.array([[5, 40], [20, 40], [20, 60]])),
+        ]
+        labels = rasterize_rt_structures(image.shape, structures)
+        self.assertEqual(np.unique(labels).tolist(), [0, 1, 2])
+        labels_of_first_roi = rasterize_rt_structures(image.shape, structures, {0})
+        self.assertEqual(np.unique(labels_of_first_roi).tolist(), [0, 1])
+
+        colors = [(255, 0, 0), (0, 255, 0)]
+        blended = blend_rt_structures(image, labels, colors)
+        self.assertEqual(tuple(blended[labels == 1][0]), colors[0])
+        self.assertEqual(tuple(blended[labels == 2][0]), colors[1])
+        self.assertFalse(blended[labels == 0].any())
+
+    def test_if_colorize_rt_structures(self):
+        """Test if the transparent layer of structures looks like the blended image.
+
+        This method converts the label layer of two ROIs to the RGBA layer which
+        is displayed over the ct image. It checks that the layer is transparent
+        outside the structures and that composing it over the image gives the
+        image blended with the same opacity.
+        """
+        image = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        structures = [
+            (0, np.array([[10, 10], [50, 10], [50, 50]])),
+            (1, np.array([[5, 40], [20, 40], [20, 60]])),
+        ]
+        labels = rasterize_rt_structures(image.shape, structures)
+        colors = [(255, 0, 0), (0, 255, 0)]
+        layer = colorize_rt_structures(labels, colors, 0.5)
+        self.assertEqual(layer.shape, (64, 64, 4))
+        self.assertFalse(layer[labels == 0].any())
+
+        alpha = layer[..., 3:] / 255
+        composed = image * (1 - alpha) + layer[..., :3] * alpha
+        blended = blend_rt_structures(image.copy(), labels, colors, 0.5)
+        self.assertLessEqual(np.abs(composed - blended).max(), 2)
+
+    def test_if_lru_cache(self):
+        """Test if the cache removes the least recently used items.
+
+        This method fills the cache over its limits of items and bytes and
+        checks that the least recently used items are removed first.
+        """
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.get("c"), 3)
+
+        cache = LRUCache(10, max_bytes=100)
+        for key in range(3):
+            cache.put(key, np.zeros(40, dtype=np.uint8))
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(0, cache)
+        self.assertEqual(cache.current_bytes, 80)
+
+    def test_if_window_lut(self):
+        """Test if windowing with the lookup table matches the arithmetic windowing.
+
+        This method windows all signed and unsigned 16-bit values with and
+        without an integer intercept arithmetically, as the slices are
+        displayed, and compares them with the lookup table of the same window
+        for several window centers and widths. The 8-bit images are windowed
+        by the lookup table.
+        """
+        for dtype in (np.uint16, np.int16):
+            values = np.arange(65536, dtype=np.uint16).view(dtype).reshape(256, 256)
+            for window_center, window_width in ((1000, 1000), (40, 400), (-1024, 1)):
+                for intercept in (0.0, -1024.0):
+                    lut = get_window_lut(
+                        window_center, window_width, dtype == np.int16, 1.0, intercept
+                    )
+                    windowed = contrast_enhancement(
+                        values, window_center, window_width, 1.0, intercept
+                    )
+                    expected = np.take(lut, values.view(np.uint16))
+                    self.assertTrue((windowed[:, :, 0] == expected).all())
+
+        image = np.arange(256, dtype=np.uint8).reshape(16, 16)
+        self.assertTrue(
+            (window_image(image, 40, 400) == apply_window(image, 40, 400)).all()
+        )
+
+    def test_if_window_image_buffers(self):
+        """Test if the gray tiles and the structure layers are written to reused buffers.
+
+        This method windows strided tiles of 16-bit and 32-bit images to 8-bit
+        gray values in a given buffer and checks that the buffer is returned
+        with the gray channel of the RGB windowing. It also colorizes labels
+        into a 32-bit buffer and compares the layer with the allocated one.
+        """
+        generator = np.random.default_rng(0)
+        for dtype in (np.int16, np.int32):
+            image = generator.integers(-1024, 3000, (128, 128)).astype(dtype)
+            tile = image[1::2, ::2]
+            buffer = np.empty(tile.shape, dtype=np.uint8)
+            windowed = window_image(tile, 40, 400, out=buffer)
+            self.assertIs(windowed, buffer)
+            expected = contrast_enhancement(tile, 40, 400)[:, :, 0]
+            self.assertTrue((windowed == expected).all())
+
+        labels = generator.integers(0, 3, (16, 16)).astype(np.uint16)
+        colors = [(255, 0, 0), (0, 255, 0)]
+        buffer = np.empty(labels.shape, dtype=np.uint32)
+        layer = colorize_rt_structures(labels, colors, 0.5, out=buffer)
+        self.assertTrue(np.shares_memory(layer, buffer))
+        self.assertTrue((layer == colorize_rt_structures(labels, colors, 0.5)).all())
+
+    def test_if_ct_volume(self):
+        """Test if the volume contains the whole series and its cache can be reopened.
+
+        This method copies the ct series to a temporary directory, loads it into
+        the volume, and checks that the slices are sorted by Z axis, that the
+        slices with structures are the loaded images and that the second load
+        opens the memory-mapped cache with the same data.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            for image_path in glob.glob(self.ct_images_files_path):
+                shutil.copy(image_path, directory)
+            ct_images_files_path = os.path.join(directory, "*.dcm")
+
+            volume = load_ct_volume(ct_images_files_path)
+            self.assertEqual(len(volume), len(glob.glob(ct_images_files_path)))
+            self.assertTrue((np.diff(volume.z_positions) >= 0).all())
+
+            structures = match_volume_structures(volume, self.loaded_images[1])
+            self.assertEqual(len(structures), len(self.loaded_images[0]))
+            for index, (image, _) in zip(sorted(structures), self.loaded_images[0]):
+                self.assertTrue((volume.array[index] == image).all())
+
+            cached_volume = load_ct_volume(ct_images_files_path)
+            self.assertIsInstance(cached_volume.array, np.memmap)
+            self.assertTrue((cached_volume.array == volume.array).all())
+
+    def test_if_ct_volume_mixed_series(self):
+        """Test if slices with other rescales and directories are cached exactly.
+
+        This method splits the ct series between two directories and changes
+        the RescaleSlope of one file. It checks that the volume uses a data
+        type storing every slice exactly, that the cached volume points to the
+        existing files, and that a cancelled or failed decoding removes its
+        unfinished cache file.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            image_paths = list()
+            for number, image_path in enumerate(sorted(glob.glob(self.ct_images_files_path))):
+                series_directory = os.path.join(directory, "part%d" % (number % 2))
+                os.makedirs(series_directory, exist_ok=True)
+                image_paths.append(shutil.copy(image_path, series_directory))
+            data_dicom = dicom.dcmread(image_paths[0], force=True)
+            data_dicom.RescaleSlope = 0.5
+            data_dicom.save_as(image_paths[0])
+            data_dicom = dicom.dcmread(image_paths[0], force=True)
+            expected = data_dicom.pixel_array * np.float32(0.5) + np.float32(
+                data_dicom.RescaleIntercept
+            )
+
+            volume = open_ct_volume(image_paths)
+            self.assertFalse(decode_ct_volume(volume, should_cancel=lambda: True))
+            self.assertEqual(glob.glob(os.path.join(directory, "*", CACHE_DIRECTORY, "*")), [])
+
+            def fail_decoding(index):
+                raise RuntimeError("the decoding of the slice %d failed" % index)
+
+            volume = open_ct_volume(image_paths)
+            with self.assertRaises(RuntimeError):
+                decode_ct_volume(volume, on_slice=fail_decoding)
+            self.assertEqual(glob.glob(os.path.join(directory, "*", CACHE_DIRECTORY, "*")), [])
+
+            volume = load_ct_volume(image_paths)
+            self.assertEqual(volume.array.dtype, np.float32)
+            index = volume.paths.index(image_paths[0])
+            self.assertTrue((volume.array[index] == expected).all())
+
+            cached_volume = load_ct_volume(image_paths)
+            self.assertIsInstance(cached_volume.array, np.memmap)
+            self.assertEqual(sorted(cached_volume.paths), sorted(image_paths))
+            self.assertTrue((cached_volume.array == volume.array).all())
+
+    def test_if_structure_set_cache(self):
+        """Test if the cached structure set is reused until the file changes.
+
+        This method copies the RT-STRUCT file to a temporary directory, loads
+        it twice and compares the cached structure set with the parsed one.
+        Then it changes the modification time of the file and checks that the
+        cache is not used anymore.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            rtstruct_path = shutil.copy(self.rtstruct_data_file_path, directory)
+            structure_set = load_structure_set(rtstruct_path)
+            cache_path = get_structure_set_cache_path(rtstruct_path)
+            self.assertTrue(os.path.exists(cache_path))
+
+            stat = os.stat(rtstruct_path)
+            source = (stat.st_size, stat.st_mtime_ns)
+            cached_structure_set = load_cached_structure_set(cache_path, source)
+            self.assertEqual(cached_structure_set.roi_names, structure_set.roi_names)
+            self.assertEqual(cached_structure_set.roi_colors, structure_set.roi_colors)
+            self.assertTrue((cached_structure_set.points == structure_set.points).all())
+            self.assertTrue(
+                (cached_structure_set.slice_offsets == structure_set.slice_offsets).all()
+            )
+
+            os.utime(rtstruct_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            stat = os.stat(rtstruct_path)
+            source = (stat.st_size, stat.st_mtime_ns)
+            self.assertIsNone(load_cached_structure_set(cache_path, source))
+
+    def test_if_read_rtstruct_header(self):
+        """Test if rt struct files are detected from their headers only.
+
+        This method reads the header of the RT-STRUCT file and of one CT file.
+        The header of the RT-STRUCT file has to contain its SOPInstanceUID but
+        not the contours, while the CT file is not detected as an RT-STRUCT
+        file. The header is then used to find the cache of the structure set.
+        """
+        header = read_rtstruct_header(self.rtstruct_data_file_path)
+        self.assertIsNotNone(header)
+        self.assertIn("SOPInstanceUID", header)
+        self.assertNotIn("ROIContourSequence", header)
+        self.assertIsNone(read_rtstruct_header(glob.glob(self.ct_images_files_path)[0]))
+        self.assertEqual(
+            get_structure_set_cache_path(self.rtstruct_data_file_path, header),
+            get_structure_set_cache_path(self.rtstruct_data_file_path),
+        )
+
+    def test_if_scan_directory(self):
+        """Test if the scanner pairs the RT-STRUCT file with its CT series.
+
+        This method copies the RT-STRUCT file and the CT files to a temporary
+        directory tree and scans it. The RT-STRUCT file has to be paired with
+        all CT files sorted by Z axis. The directory is then scanned again and
+        the saved index has to give the same pairs.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            shutil.copy(self.rtstruct_data_file_path, directory)
+            os.mkdir(os.path.join(directory, "ct"))
+            for image_path in glob.glob(self.ct_images_files_path):
+                shutil.copy(image_path, os.path.join(directory, "ct"))
+
+            pairs = get_structure_pairs(scan_directory(directory))
+            self.assertEqual(len(pairs), 1)
+            self.assertEqual(
+                os.path.basename(pairs[0].rtstruct_path),
+                os.path.basename(self.rtstruct_data_file_path),
+            )
+            series_index = build_series_index(os.path.join(directory, "ct", "*.dcm"))
+            self.assertEqual(pairs[0].ct_paths, [header.path for header in series_index])
+
+            self.assertTrue(os.path.exists(os.path.join(directory, INDEX_FILE_NAME)))
+            self.assertEqual(get_structure_pairs(scan_directory(directory)), pairs)
+
+    def test_if_pair_structures(self):
+        """Test if the CT series of a frame of reference is chosen by its contour images.
+
+        This method pairs RT-STRUCT headers which reference only the frame of
+        reference of three CT series: a localizer, a planning CT and a CT
+        with contrast. The series with the referenced contour images has to be
+        chosen even when it is not the largest one, and without contour images
+        the largest series is chosen and the pair is marked as ambiguous.
+        """
+
+        header = DicomFileHeader(
+            "", 0, 0, "CT", "patient", "study", "", "frame", None, [], [], "", []
+        )
+
+        def ct_header(series_uid: str, number: int) -> DicomFileHeader:
+            return header._replace(
+                path="%s-%d.dcm" % (series_uid, number),
+                series_uid=series_uid,
+                z=float(number),
+                sop_instance_uid="%s.%d" % (series_uid, number),
+            )
+
+        def rtstruct_header(path: str, contour_images: list) -> DicomFileHeader:
+            return header._replace(
+                path=path,
+                modality="RTSTRUCT",
+                series_uid=path,
+                frame_of_reference_uid="",
+                referenced_frame_of_reference_uids=["frame"],
+                referenced_sop_instance_uids=contour_images,
+            )
+
+        headers = (
+            [ct_header("localizer", number) for number in range(2)]
+            + [ct_header("planning", number) for number in range(4)]
+            + [ct_header("contrast", number) for number in range(6)]
+            + [
+                rtstruct_header("matched.dcm", ["planning.1", "planning.2"]),
+                rtstruct_header("unmatched.dcm", []),
+            ]
+        )
+        pairs = {pair.rtstruct_path: pair for pair in pair_structures(group_series(headers))}
+        self.assertEqual(pairs["matched.dcm"].series_uid, "planning")
+        self.assertFalse(pairs["matched.dcm"].ambiguous)
+        self.assertEqual(len(pairs["matched.dcm"].ct_paths), 4)
+        self.assertEqual(pairs["unmatched.dcm"].series_uid, "contrast")
+        self.assertTrue(pairs["unmatched.dcm"].ambiguous)
+
+    def test_if_export_structures(self):
+        """Test if every CT slice with structures is exported without PyQt5.
+
+        This method exports the CT slices with the RT-STRUCT structures to a
+        temporary directory. One image has to be written for every slice with
+        contours and the structures have to be drawn with the colors of their
+        ROIs. The export module is then imported in a new interpreter, which
+        must not import PyQt5.
+        """
+        structure_set = load_structure_set(self.rtstruct_data_file_path)
+        series_index = build_series_index(self.ct_images_files_path)
+        contoured_slices = [
+            header for header in series_index if structure_set.find_slice(header.z) is not None
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            output_paths = export_structures(
+                self.ct_images_files_path,
+                self.rtstruct_data_file_path,
+                directory,
+                *WINDOW_PRESETS["soft-tissue"],
+                workers=1,
+            )
+            self.assertEqual(len(output_paths), len(contoured_slices))
+            image = cv2.imread(output_paths[0])
+            roi_color = structure_set.roi_colors[0][::-1]  # the image is read as BGR
+            self.assertTrue((image.reshape(-1, 3) == roi_color).all(axis=1).any())
+
+        result = subprocess.run(
+            [sys.executable, "-c", "import export, sys; print('PyQt5' in sys.modules)"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.stdout.strip(), "False")
+
+    @unittest.skipUnless(importlib.util.find_spec("PyQt5"), "PyQt5 is not installed")
+    def test_if_gui_imports_lazily(self):
+        """Test if the gui module does not import the imaging modules.
+
+        This method imports the gui module in a new interpreter and checks
+        that numpy, cv2, pydicom and utils are not imported with it, so the
+        main window can be shown before them. Then it imports them with
+        import_imaging_modules and checks that they are available.
+        """
+        script = (
+            "import sys, gui\n"
+            "print(sorted({'numpy', 'cv2', 'pydicom', 'utils'} & set(sys.modules)))\n"
+            "gui.import_imaging_modules()\n"
+            "print(gui.utils.contrast_enhancement is not None)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.stdout.splitlines(), ["[]", "True"])
+
+    def test_if_decode_pixel_data(self):
+        """Test if compressed pixel data is decoded by the selected handler.
+
+        This method decodes the CT file with the handler selected for its
+        transfer syntax and compares the pixels with the pixel_array of
+        pydicom. Then it compresses the CT file with RLE Lossless, decodes it
+        again and checks that the pixels are the same. A file without the
+        TransferSyntaxUID has to be decoded by the handler of its detected
+        encoding without adding the TransferSyntaxUID to the dataset, and an
+        unknown transfer syntax has to raise RuntimeError.
+        """
+        data_dicom = dicom.dcmread(self.data_dicom.filename, force=True)
+        transfer_syntax_uid = data_dicom.file_meta.TransferSyntaxUID
+        pixels, decoder = decode_pixel_data(data_dicom)
+        self.assertEqual(decoder, get_pixel_decoder(transfer_syntax_uid))
+        self.assertIn(decoder, get_available_pixel_decoders())
+        self.assertTrue((pixels == self.data_dicom.pixel_array).all())
+
+        compressed = dicom.dcmread(self.data_dicom.filename, force=True)
+        compressed.compress(dicom.uid.RLELossless)
+        pixels, decoder = decode_pixel_data(compressed)
+        self.assertEqual(decoder, get_pixel_decoder(dicom.uid.RLELossless))
+        self.assertTrue((pixels == self.data_dicom.pixel_array).all())
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "without_transfer_syntax.dcm")
+            del data_dicom.file_meta.TransferSyntaxUID
+            data_dicom.save_as(file_path, write_like_original=True)
+            data_dicom = dicom.dcmread(file_path, force=True)
+            self.assertNotIn("TransferSyntaxUID", data_dicom.file_meta)
+            file_meta = data_dicom.file_meta
+            pixels, decoder = decode_pixel_data(data_dicom)
+            self.assertEqual(decoder, get_pixel_decoder(transfer_syntax_uid))
+            self.assertTrue((pixels == self.data_dicom.pixel_array).all())
+            self.assertIs(data_dicom.file_meta, file_meta)
+            self.assertNotIn("TransferSyntaxUID", data_dicom.file_meta)
+
+        data_dicom.file_meta.TransferSyntaxUID = "1.2.3.4"
+        with self.assertRaises(RuntimeError):
+            decode_pixel_data(data_dicom)
+
+    def test_if_register_pixel_decoder(self):
+        """Test if a registered pixel data handler is selected for its transfer syntax.
+
+        This method registers a handler of an unknown transfer syntax, which
+        returns the pixels of the CT file, and checks that it decodes a file
+        with this transfer syntax and that it is listed as available. After
+        the handler is removed, the transfer syntax has to raise RuntimeError
+        again and the handlers of pydicom have to be unchanged.
+        """
+        expected = self.data_dicom.pixel_array
+
+        class TestHandler:
+            @staticmethod
+            def supports_transfer_syntax(transfer_syntax_uid):
+                return transfer_syntax_uid == "1.2.3.4"
+
+            @staticmethod
+            def is_available():
+                return True
+
+            @staticmethod
+            def get_pixeldata(data_dicom):
+                return expected.ravel()
+
+        data_dicom = dicom.dcmread(self.data_dicom.filename, force=True)
+        data_dicom.file_meta.TransferSyntaxUID = "1.2.3.4"
+        decoders = list(PIXEL_DECODERS)
+        with self.assertRaises(RuntimeError):
+            decode_pixel_data(data_dicom)
+        register_pixel_decoder("test", TestHandler, 0)
+        try:
+            self.assertEqual(get_available_pixel_decoders()[0], "test")
+            pixels, decoder = decode_pixel_data(data_dicom)
+            self.assertEqual(decoder, "test")
+            self.assertTrue((pixels == expected).all())
+        finally:
+            unregister_pixel_decoder("test")
+        self.assertEqual(PIXEL_DECODERS, decoders)
+        with self.assertRaises(RuntimeError):
+            decode_pixel_data(data_dicom)
+
+    def test_if_rescale_to_hounsfield(self):
+        """Test if the stored values are converted to Hounsfield units.
+
+        This method converts the pixels of the CT file to Hounsfield units and
+        compares them with the values computed from RescaleSlope and
+        RescaleIntercept. The result has to be int16 when the slope is 1, and
+        windowing the stored values with the rescale has to give the same image
+        as windowing the Hounsfield units.
+        """
+        pixels = self.data_dicom.pixel_array
+        slope, intercept = get_rescale(self.data_dicom)
+        dtype = get_hounsfield_dtype(self.data_dicom)
+        hounsfield = rescale_to_hounsfield(pixels, slope, intercept, dtype)
+        if slope == 1:
+            self.assertEqual(hounsfield.dtype, np.int16)
+        self.assertTrue((hounsfield == pixels * slope + intercept).all())
+
+        for window_center, window_width in ((40, 400), (-600, 1500)):
+            self.assertTrue(
+                (
+                    contrast_enhancement(pixels, window_center, window_width, slope, intercept)
+                    == contrast_enhancement(hounsfield, window_center, window_width)
+                ).all()
+            )
+        rescaled = rescale_to_hounsfield(pixels, 0.5, -1024.5, np.dtype(np.float32))
+        self.assertEqual(rescaled.dtype, np.float32)
+        self.assertTrue(np.allclose(rescaled, pixels * 0.5 - 1024.5))
+        with self.assertRaises(ValueError):
+            rescale_to_hounsfield(pixels, 0.5, -1024.0, np.dtype(np.int16))
+
+    def test_if_plane_structures(self):
+        """Test if coronal and sagittal planes are resliced with their structures.
+
+        This method loads the ct series into the volume and checks that the
+        coronal and sagittal planes are views of the volume which do not copy
+        its data. Then it intersects the planes going through the center of a
+        contour with the contours of all slices and checks that the slice of
+        the contour is found and that its outline is drawn in the row of the
+        plane which corresponds to the slice.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            for image_path in glob.glob(self.ct_images_files_path):
+                shutil.copy(image_path, directory)
+            volume = load_ct_volume(os.path.join(directory, "*.dcm"))
+        depth, height, width = volume.array.shape
+        structures = match_volume_structures(volume, self.loaded_images[1])
+        overlay = PlaneStructureOverlay(
+            structures, depth, self.loaded_images[1].roi_colors
+        )
+
+        index = sorted(structures)[0]
+        roi, points = structures[index][0]
+        center_x, center_y = np.round(points.mean(axis=0)).astype(int)
+        for plane, position, size in (
+            (PLANE_CORONAL, center_y, width),
+            (PLANE_SAGITTAL, center_x, height),
+        ):
+            image = get_plane_image(volume.array, plane, position)
+            self.assertEqual(image.shape, (depth, size))
+            self.assertTrue(np.shares_memory(image, volume.array))
+            axis = 0 if plane == PLANE_CORONAL else 1
+            self.assertTrue(
+                (image[depth - 1 - index] == volume.array[index].take(position, axis)).all()
+            )
+
+            slice_indexes, rois, starts, ends = overlay.intersect(plane, position)
+            self.assertIn(index, slice_indexes)
+            self.assertTrue((starts <= ends).all())
+            labels = overlay.labels(plane, position, (depth, size))
+            self.assertIn(roi + 1, labels[depth - 1 - index])
+            self.assertIs(overlay.labels(plane, position, (depth, size)), labels)
+
+    def test_if_tiles(self):
+        """Test if only the visible tiles are rendered at the level of detail of the zoom.
+
+        This method checks the level of detail of several zooms, finds the tiles
+        of a 1024x1024 slice which intersect the visible rectangle and checks
+        that the tiles are strided views of the slice. The label layer reduced
+        to a coarser level has to keep the one pixel wide outlines.
+        """
+        self.assertEqual(get_level_of_detail(2.0), 1)
+        self.assertEqual(get_level_of_detail(0.6), 1)
+        self.assertEqual(get_level_of_detail(0.26), 2)
+        self.assertEqual(get_level_of_detail(0.01), MAX_LEVEL_OF_DETAIL_STEP)
+
+        image = np.arange(1024 * 1024, dtype=np.int32).reshape(1024, 1024)
+        tiles = get_visible_tiles(image.shape, (300, 0, 520, 100), 1)
+        self.assertEqual(tiles, [(0, 256), (0, 512)])
+        self.assertEqual(len(get_visible_tiles(image.shape, (-10, -10, 2000, 2000), 4)), 1)
+        tile = get_tile(image, 0, 256, 2)
+        self.assertEqual(tile.shape, (TILE_SIZE, TILE_SIZE))
+        self.assertTrue(np.shares_memory(tile, image))
+        self.assertEqual(tile[1, 1], image[2, 258])
+
+        labels = np.zeros((512, 512), dtype=np.uint16)
+        labels[100, :] = 3
+        downsampled = downsample_labels(labels, 4)
+        self.assertEqual(downsampled.shape, get_tile(labels, 0, 0, 4).shape)
+        self.assertTrue((downsampled[25] == 3).all())
+        self.assertEqual(np.count_nonzero(downsampled), 128)
+
+    def test_if_stage_timer(self):
+        """Test if the stages of the frames are measured in bounded ring buffers.
+
+        This method wraps the windowing function of the utils module with the
+        timer and measures more frames than the ring buffers keep. It checks
+        that only the latest frames are kept, that the stages measured inside a
+        frame are added to it, that the trace is saved in the Trace Event
+        Format and that the original function is restored by unwrap.
+        """
+        import utils
+
+        timer = StageTimer(event_history_size=8, frame_history_size=4)
+        original = utils.contrast_enhancement
+        timer.wrap(utils, "contrast_enhancement")
+        image = self.data_dicom.pixel_array
+        utils.contrast_enhancement(image, 40, 400)
+        self.assertEqual(len(timer.events), 0)  # nothing is measured until enabled
+
+        timer.enabled = True
+        for _ in range(6):
+            with timer.frame():
+                utils.contrast_enhancement(image, 40, 400)
+                with timer.stage("scene"):
+                    pass
+        self.assertEqual(len(timer.frames), 4)
+        self.assertEqual(len(timer.events), 8)
+        duration, stages = timer.last_frame()
+        self.assertEqual(set(stages), {"contrast_enhancement", "scene"})
+        self.assertGreaterEqual(duration, sum(stages.values()))
+        self.assertEqual(timer.summary()["frame"][2], 4)
+        self.assertIn("contrast_enhancement", format_summary(timer))
+
+        with tempfile.TemporaryDirectory() as directory:
+            trace_path = os.path.join(directory, "trace.json")
+            timer.save_trace(trace_path)
+            with open(trace_path) as file:
+                events = json.load(file)["traceEvents"]
+            self.assertEqual(len(events), 8)
+            self.assertTrue(all(event["ph"] == "X" for event in events))
+
+        timer.unwrap()
+        self.assertIs(utils.contrast_enhancement, original)
+
 
 if __name__ == "__main__":
     unittest.main()
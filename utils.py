@@ -1,10 +1,91 @@
-import cv2, glob
+import bisect, cv2, glob, hashlib, json, os, threading
 import pydicom as dicom
 import numpy as np
+from pydicom.filereader import read_partial
+from pydicom.pixel_data_handlers.util import convert_color_space, reshape_pixel_array
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import UID, ExplicitVRBigEndian, ExplicitVRLittleEndian, ImplicitVRLittleEndian
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 
-# Default windowing parameters
-WINDOW_WIDTH = 1000
-WINDOW_CENTER = 1000
+# Default windowing parameters in Hounsfield units (soft tissue window)
+WINDOW_WIDTH = 400
+WINDOW_CENTER = 40
+
+# Number of recently used windowing lookup tables kept in memory
+WINDOW_LUT_CACHE_SIZE = 32
+
+# Orientation of the image rows and columns used when the dataset does not define it
+DEFAULT_IMAGE_ORIENTATION = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+# Thickness (in pixels) and opacity of the drawn rt struct contours
+OVERLAY_THICKNESS = 2
+OVERLAY_ALPHA = 1.0
+
+# Maximal number of rasterized slices kept by the structure overlay
+OVERLAY_CACHE_SIZE = 256
+
+# Planes of the volume: axial slices are the ct files, coronal and sagittal planes are resliced
+PLANE_AXIAL = "axial"
+PLANE_CORONAL = "coronal"
+PLANE_SAGITTAL = "sagittal"
+
+# Size (in rendered pixels) of the tiles of the displayed slices and the coarsest level of detail,
+# a tile of the level covers (step * TILE_SIZE) pixels of the slice in both directions
+TILE_SIZE = 256
+MAX_LEVEL_OF_DETAIL_STEP = 16
+
+# Last tag read from the header of the rt struct file to find its SOPInstanceUID
+SOP_INSTANCE_UID_TAG = 0x00080018
+
+# Last tag read from the header of a dicom file to check whether it is an rt struct file
+MODALITY_TAG = 0x00080060
+
+# SOP Class UID of the RT Structure Set Storage
+RT_STRUCTURE_SET_STORAGE = "1.2.840.10008.5.1.4.1.1.481.3"
+
+# Maximal distance on the Z axis (in mm) between a ct slice and matched rt struct structures
+Z_TOLERANCE = 0.01
+
+# Tags read from the ct files while building the series index (pixels are not decoded)
+SERIES_INDEX_TAGS = [
+    "ImagePositionPatient",
+    "ImageOrientationPatient",
+    "PixelSpacing",
+    "RescaleSlope",
+    "RescaleIntercept",
+    "BitsStored",
+    "PixelRepresentation",
+]
+
+# Names of the loading stages reported to the progress callbacks
+PROGRESS_CONTOURS_PARSED = "contours parsed"
+PROGRESS_FILES_READ = "files read"
+PROGRESS_SLICES_DECODED = "slices decoded"
+
+# Entry of the series index, one per ct file
+SliceHeader = namedtuple(
+    "SliceHeader", ["z", "path", "position", "spacing", "orientation", "dtype"]
+)
+
+# Name of the directory created next to the dicom files for the cached volumes and structures
+CACHE_DIRECTORY = ".rtstruct_cache"
+
+# Version of the cached volumes, changed when the values stored in the volume change
+VOLUME_CACHE_VERSION = 3
+
+# Pixel data handlers as (name, handler) from the fastest, the first available handler supporting
+# the transfer syntax of a file decodes it. The handlers of pydicom are given by their attribute of
+# pydicom.config, other handlers are added by register_pixel_decoder
+PIXEL_DECODERS = [
+    ("numpy", "np_handler"),
+    ("pylibjpeg", "pylibjpeg_handler"),
+    ("gdcm", "gdcm_handler"),
+    ("jpeg_ls", "jpegls_handler"),
+    ("pillow", "pillow_handler"),
+    ("rle", "rle_handler"),
+]
 
 
 def load_rtstruct(file_path: str) -> dicom.FileDataset:
@@ -22,35 +103,320 @@ def load_rtstruct(file_path: str) -> dicom.FileDataset:
 
 def parse_rtstruct(rtstruct: dicom.FileDataset) -> tuple:
     """
-    Function which parse rt structures and sorts them by Z axis
+    Function which parse rt structures and sorts them by Z axis, it is kept for the older code and
+    uses parse_structure_set, which should be used instead
+
+    Its result has changed with parse_structure_set: every Z position has the list of (N,3) arrays
+    of all contours on it, not the list of points of the last contour, and the color is an (R,G,B)
+    tuple or None when the file has no ROIs, instead of an error.
+
+    Args:
+        rtstruct (dicom.FileDataset): rt struct structures dataset given by the user
+
+    Returns:
+        tuple: dictionary of the lists of (N,3) arrays of all contours on every Z position and the
+        color of the first ROI, None without ROIs
+    """
+    structure_set = parse_structure_set(rtstruct)
+    rt_struct_elements = {
+        z: [points for _, points in structure_set.contours(slice_index)]
+        for slice_index, z in enumerate(structure_set.slice_keys)
+    }
+    return rt_struct_elements, structure_set.roi_colors[0] if len(structure_set) else None
+
+
+def find_rt_struct_key(
+    z_keys: list, z: float, z_tolerance: float = Z_TOLERANCE
+) -> float:
+    """
+    Function which finds the Z key of rt struct structures nearest to the given slice position
+
+    Args:
+        z_keys (list): sorted Z keys of the rt struct elements
+        z (float): position of the ct slice on the Z axis
+        z_tolerance (float, optional): maximal distance between the slice and the structures.
+        Defaults to Z_TOLERANCE.
+
+    Returns:
+        float: matching Z key or None if there are no structures on the slice
+    """
+    index = bisect.bisect_left(z_keys, z)
+    candidates = z_keys[max(index - 1, 0) : index + 1]
+    if not candidates:
+        return None
+    key = min(candidates, key=lambda candidate: abs(candidate - z))
+    return key if abs(key - z) <= z_tolerance else None
+
+
+class StructureSet:
+    """
+    A class which stores all regions of interest (ROI) of an rt struct file. Points of all
+    contours are kept in one contiguous (M,3) array. The contours are sorted by their position
+    on the Z axis and described by offsets into the points array, the slices are described
+    by offsets into the contours, so the contours of a slice are found without any loops.
+
+    Attributes:
+        roi_numbers (list): ROI numbers given in the rt struct file
+        roi_names (list): names of the ROIs
+        roi_colors (list): display colors of the ROIs as (R,G,B) tuples
+        points (np.ndarray): (M,3) array of X,Y,Z coordinates of all contour points
+        contour_offsets (np.ndarray): points of contour i are points[contour_offsets[i]:contour_offsets[i + 1]]
+        contour_rois (np.ndarray): index of the ROI of every contour
+        slice_z (np.ndarray): sorted Z positions of the slices with contours
+        slice_offsets (np.ndarray): contours of slice s are the contours slice_offsets[s]:slice_offsets[s + 1]
+    """
+
+    def __init__(
+        self,
+        roi_numbers: list,
+        roi_names: list,
+        roi_colors: list,
+        points: np.ndarray,
+        contour_offsets: np.ndarray,
+        contour_rois: np.ndarray,
+        slice_z: np.ndarray,
+        slice_offsets: np.ndarray,
+    ):
+        self.roi_numbers = roi_numbers
+        self.roi_names = roi_names
+        self.roi_colors = roi_colors
+        self.points = points
+        self.contour_offsets = contour_offsets
+        self.contour_rois = contour_rois
+        self.slice_z = slice_z
+        self.slice_offsets = slice_offsets
+        # Z positions as a list for the bisect lookup and the index of every position
+        self.slice_keys = slice_z.tolist()
+        self.slice_indexes = {z: index for index, z in enumerate(self.slice_keys)}
+
+    def __len__(self) -> int:
+        return len(self.roi_numbers)
+
+    def find_slice(self, z: float, z_tolerance: float = Z_TOLERANCE) -> int:
+        """
+        Function which finds the slice with contours nearest to the given position on the Z axis
+
+        Args:
+            z (float): position of the ct slice on the Z axis
+            z_tolerance (float, optional): maximal distance between the slice and the contours.
+            Defaults to Z_TOLERANCE.
+
+        Returns:
+            int: index of the slice or None if there are no contours on the given position
+        """
+        key = find_rt_struct_key(self.slice_keys, z, z_tolerance)
+        return None if key is None else self.slice_indexes[key]
+
+    def contours(self, slice_index: int, rois: set = None) -> list:
+        """
+        Function which returns contours of the given slice
+
+        Args:
+            slice_index (int): index of the slice with contours
+            rois (set, optional): indexes of the returned ROIs. Defaults to None (all ROIs).
+
+        Returns:
+            list: list of (ROI index, (N,3) array of points) pairs, the arrays are views of the points buffer
+        """
+        contours = list()
+        for contour in range(
+            self.slice_offsets[slice_index], self.slice_offsets[slice_index + 1]
+        ):
+            roi = int(self.contour_rois[contour])
+            if rois is None or roi in rois:
+                start, end = self.contour_offsets[contour : contour + 2]
+                contours.append((roi, self.points[start:end]))
+        return contours
+
+
+def parse_structure_set(rtstruct: dicom.FileDataset) -> StructureSet:
+    """
+    Function which parse all regions of interest of the rt struct file with all their contours
 
     Args:
         rtstruct (dicom.FileDataset): rt struct structures dataset given by the user
 
     Returns:
-        tuple: tuple of rt struct structures and their color
+        StructureSet: ROIs with their names, numbers, colors and contours sorted by Z axis
+    """
+    roi_names_by_number = dict()
+    for roi in rtstruct.get("StructureSetROISequence", []):
+        roi_names_by_number[int(roi.ROINumber)] = str(roi.get("ROIName", ""))
+
+    roi_numbers, roi_names, roi_colors = list(), list(), list()
+    contour_points, contour_z, contour_rois = list(), list(), list()
+
+    for roi_index, structure in enumerate(rtstruct.ROIContourSequence):
+        roi_number = int(structure.get("ReferencedROINumber", roi_index + 1))
+        roi_numbers.append(roi_number)
+        roi_names.append(roi_names_by_number.get(roi_number, "ROI %d" % roi_number))
+        roi_colors.append(
+            tuple(int(value) for value in structure.get("ROIDisplayColor", (255, 0, 0)))
+        )
+        for sequence in structure.get("ContourSequence", []):
+            # contour points as (N,3) array of X,Y,Z coordinates
+            array = np.asarray(sequence.ContourData, dtype=np.float64).reshape(-1, 3)
+            contour_points.append(array)
+            contour_z.append(round(float(array[0, 2]), 2))  # rounding of the z element
+            contour_rois.append(roi_index)
+
+    # sorting the contours by Z axis and ROI, the order of contours of the same ROI is kept
+    order = np.lexsort((np.asarray(contour_rois), np.asarray(contour_z)))
+    contour_lengths = np.asarray([len(contour_points[i]) for i in order], dtype=np.int64)
+    contour_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(contour_lengths, out=contour_offsets[1:])
+    points = (
+        np.concatenate([contour_points[i] for i in order])
+        if len(order)
+        else np.zeros((0, 3), dtype=np.float64)
+    )
+    sorted_z = np.asarray(contour_z, dtype=np.float64)[order]
+    slice_z, slice_starts = np.unique(sorted_z, return_index=True)
+    slice_offsets = np.append(slice_starts, len(order)).astype(np.int64)
+
+    return StructureSet(
+        roi_numbers,
+        roi_names,
+        roi_colors,
+        points,
+        contour_offsets,
+        np.asarray(contour_rois, dtype=np.int32)[order],
+        slice_z,
+        slice_offsets,
+    )
+
+
+def read_dicom_header(file_path: str, last_tag: int) -> dicom.FileDataset:
+    """
+    Function which reads only the beginning of the dicom file, up to the given tag
+
+    Args:
+        file_path (str): path to the dicom file
+        last_tag (int): the last read tag, the elements after it are not read
+
+    Returns:
+        dicom.FileDataset: dataset with the file meta information and the elements up to the tag
+    """
+    with open(file_path, "rb") as file:
+        return read_partial(
+            file, stop_when=lambda tag, VR, length: tag > last_tag, force=True
+        )
+
+
+def get_structure_set_cache_path(file_path: str, header: dicom.Dataset = None) -> str:
+    """
+    Function which returns the path of the cached structure set of the rt struct file
+
+    Args:
+        file_path (str): path to the rt struct file
+        header (dicom.Dataset, optional): already read header of the file with its SOPInstanceUID.
+        Defaults to None (the header is read).
+
+    Returns:
+        str: path of the cache file
+    """
+    if header is None or "SOPInstanceUID" not in header:
+        header = read_dicom_header(file_path, SOP_INSTANCE_UID_TAG)
+    directory = os.path.dirname(os.path.abspath(file_path))
+    return os.path.join(directory, CACHE_DIRECTORY, str(header.SOPInstanceUID) + ".npz")
+
+
+def save_structure_set(structure_set: StructureSet, cache_path: str, source: tuple) -> None:
+    """
+    Function which saves the structure set as NumPy arrays in an uncompressed .npz file
+
+    Args:
+        structure_set (StructureSet): the saved structure set
+        cache_path (str): path of the cache file
+        source (tuple): size and modification time of the rt struct file
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temporary_path = cache_path + ".tmp.npz"
+    np.savez(
+        temporary_path,
+        source=np.asarray(source, dtype=np.int64),
+        roi_numbers=np.asarray(structure_set.roi_numbers, dtype=np.int64),
+        roi_names=np.asarray(structure_set.roi_names, dtype=np.str_),
+        roi_colors=np.asarray(structure_set.roi_colors, dtype=np.int64).reshape(-1, 3),
+        points=structure_set.points,
+        contour_offsets=structure_set.contour_offsets,
+        contour_rois=structure_set.contour_rois,
+        slice_z=structure_set.slice_z,
+        slice_offsets=structure_set.slice_offsets,
+    )
+    os.replace(temporary_path, cache_path)
+
+
+def load_cached_structure_set(cache_path: str, source: tuple) -> StructureSet:
+    """
+    Function which loads the cached structure set if it was created from the same file
+
+    Args:
+        cache_path (str): path of the cache file
+        source (tuple): size and modification time of the rt struct file
+
+    Returns:
+        StructureSet: the cached structure set or None if there is no valid cache
+    """
+    if not os.path.exists(cache_path):
+        return None
+    with np.load(cache_path, allow_pickle=False) as cache:
+        if cache["source"].tolist() != list(source):
+            return None  # the file has changed since the cache was created
+        return StructureSet(
+            cache["roi_numbers"].tolist(),
+            cache["roi_names"].tolist(),
+            [tuple(color) for color in cache["roi_colors"].tolist()],
+            cache["points"],
+            cache["contour_offsets"],
+            cache["contour_rois"],
+            cache["slice_z"],
+            cache["slice_offsets"],
+        )
+
+
+def load_structure_set(
+    file_path: str, use_cache: bool = True, header: dicom.Dataset = None
+) -> StructureSet:
     """
-    rt_struct_elements = dict()
+    Function which loads all ROIs of the rt struct file, from the cache if possible
+
+    The cache is stored next to the file and keyed by its SOPInstanceUID, size and modification
+    time, so it is created again when the file changes.
+
+    Args:
+        file_path (str): path to the rt struct file
+        use_cache (bool, optional): use and create the cache file. Defaults to True.
+        header (dicom.Dataset, optional): already read header of the file. Defaults to None.
 
-    for structure in rtstruct.ROIContourSequence:
-        if "ContourSequence" in structure:
-            for sequence in structure.ContourSequence:
-                array = [
-                    sequence.ContourData[i : i + 3]
-                    for i in range(0, len(sequence.ContourData), 3)
-                ]
-                z = round(array[0][2], 2)  # rounding of the z element
-                if z not in rt_struct_elements:
-                    rt_struct_elements[z] = []
-                rt_struct_elements[z] = array
+    Returns:
+        StructureSet: ROIs with their names, numbers, colors and contours sorted by Z axis
+    """
+    if not use_cache:
+        return parse_structure_set(load_rtstruct(file_path))
 
-    return rt_struct_elements, rtstruct.ROIContourSequence[0].ROIDisplayColor
+    stat = os.stat(file_path)
+    source = (stat.st_size, stat.st_mtime_ns)
+    cache_path = get_structure_set_cache_path(file_path, header)
+    try:
+        structure_set = load_cached_structure_set(cache_path, source)
+    except (OSError, ValueError, KeyError):
+        structure_set = None  # a damaged cache is created again
+    if structure_set is None:
+        structure_set = parse_structure_set(load_rtstruct(file_path))
+        try:
+            save_structure_set(structure_set, cache_path, source)
+        except OSError:
+            pass  # the directory of the file is read-only
+    return structure_set
 
 
 def contrast_enhancement(
     image: np.ndarray,
     window_center: int = WINDOW_CENTER,
     window_width: int = WINDOW_WIDTH,
+    slope: float = 1.0,
+    intercept: float = 0.0,
 ) -> np.ndarray:
     """
     Function that changes window center and window width of currently displayed image.
@@ -63,25 +429,213 @@ def contrast_enhancement(
 
     source: https://radiopaedia.org/articles/windowing-ct
 
+    The images are windowed by window_image, in float32 or with a lookup table.
+
     Args:
         image (np.ndarray): ct image without rt struct structures in gray scale
         window_center (int, optional): window center represents the gray value at the center of the window.
         Defaults to WINDOW_CENTER.
         window_width (int, optional): window width defines the range of gray values that will be displayed.
         Defaults to WINDOW_WIDTH.
+        slope (float, optional): RescaleSlope of stored values, 1 for images in Hounsfield units.
+        Defaults to 1.0.
+        intercept (float, optional): RescaleIntercept of stored values, 0 for images in Hounsfield
+        units. Defaults to 0.0.
 
     Returns:
         np.ndarray: converted image to a given contrast in RGB
     """
-    image = (
-        np.clip(image - (window_center - window_width / 2), 0, window_width - 1)
-        * 256
-        / window_width
-    )
-    image = cv2.cvtColor(image.astype(np.uint8), cv2.COLOR_GRAY2BGR)
+    image = window_image(image, window_center, window_width, slope, intercept)
+    image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
     return image
 
 
+def window_image(
+    image: np.ndarray,
+    window_center: int = WINDOW_CENTER,
+    window_width: int = WINDOW_WIDTH,
+    slope: float = 1.0,
+    intercept: float = 0.0,
+    out: np.ndarray = None,
+) -> np.ndarray:
+    """
+    Function which windows the ct image to 8-bit gray values, without converting it to RGB
+
+    The image can be written to a given buffer, so the displayed slices can reuse the same memory
+    instead of allocating a new image for every frame.
+
+    Images with integer Hounsfield units (slope 1 and an integer intercept) are windowed
+    arithmetically in float32, the intercept only shifts the window, which is faster than the
+    lookup of 16-bit values in a table of 65536 values (see benchmarks.benchmark_windowing). The
+    lookup table is used for 8-bit images and for 16-bit stored values with another slope, where it
+    converts them to Hounsfield units in the same pass as the windowing.
+
+    Args:
+        image (np.ndarray): ct image in gray scale, it can be a strided view
+        window_center (int, optional): window center of the gray values. Defaults to WINDOW_CENTER.
+        window_width (int, optional): window width of the gray values. Defaults to WINDOW_WIDTH.
+        slope (float, optional): RescaleSlope of stored values. Defaults to 1.0.
+        intercept (float, optional): RescaleIntercept of stored values. Defaults to 0.0.
+        out (np.ndarray, optional): contiguous uint8 array with the shape of the image, which
+        receives the windowed image. Defaults to None (a new array).
+
+    Returns:
+        np.ndarray: windowed image as uint8, the out array if it is given
+    """
+    integer_hounsfield = slope == 1 and float(intercept).is_integer()
+    if image.dtype == np.uint8 or (
+        image.dtype in (np.uint16, np.int16) and not integer_hounsfield
+    ):
+        lut = get_window_lut(
+            window_center, window_width, image.dtype == np.int16, slope, intercept
+        )
+        # the values are reinterpreted as unsigned indexes of the lookup table
+        indexes = image if image.dtype == np.uint8 else image.view(np.uint16)
+        return np.take(lut, indexes, out=out)
+    if np.issubdtype(image.dtype, np.integer) and integer_hounsfield:
+        return apply_window(image, window_center - intercept, window_width, out)
+    if slope != 1 or intercept != 0:
+        image = rescale_to_hounsfield(image, slope, intercept, np.dtype(np.float32))
+    return apply_window(image, window_center, window_width, out)
+
+
+def apply_window(
+    image: np.ndarray, window_center: float, window_width: float, out: np.ndarray = None
+) -> np.ndarray:
+    """
+    Function which maps gray values of the image into 8-bit values of the given window
+
+    The values are windowed in float32, so a 16-bit image needs only twice its memory.
+
+    Args:
+        image (np.ndarray): ct image or array of gray values
+        window_center (float): window center represents the gray value at the center of the window.
+        window_width (float): window width defines the range of gray values that will be displayed.
+        out (np.ndarray, optional): uint8 array with the shape of the image, which receives the
+        windowed values. Defaults to None (a new array).
+
+    Returns:
+        np.ndarray: windowed values as uint8, the out array if it is given
+    """
+    image = np.subtract(
+        image, window_center - window_width / 2, dtype=np.float32, casting="unsafe"
+    )
+    np.clip(image, 0, window_width - 1, out=image)
+    image *= 256 / window_width
+    if out is None:
+        return image.astype(np.uint8)
+    np.copyto(out, image, casting="unsafe")
+    return out
+
+
+@lru_cache(maxsize=WINDOW_LUT_CACHE_SIZE)
+def get_window_lut(
+    window_center: float,
+    window_width: float,
+    signed: bool,
+    slope: float = 1.0,
+    intercept: float = 0.0,
+) -> np.ndarray:
+    """
+    Function which builds the windowing lookup table for all 16-bit values, the table of 8-bit
+    values is its beginning
+
+    The tables are cached, so changing the window back and forth (e.g. while dragging the mouse)
+    does not build them again.
+
+    Args:
+        window_center (float): window center represents the gray value at the center of the window.
+        window_width (float): window width defines the range of gray values that will be displayed.
+        signed (bool): whether the table is indexed by int16 values reinterpreted as uint16
+        slope (float, optional): RescaleSlope applied to the values before windowing. Defaults to 1.0.
+        intercept (float, optional): RescaleIntercept applied to the values before windowing.
+        Defaults to 0.0.
+
+    Returns:
+        np.ndarray: read-only table of 65536 uint8 values
+    """
+    values = np.arange(65536, dtype=np.uint16)
+    if signed:
+        values = values.view(np.int16)
+    if slope != 1 or intercept != 0:
+        values = values * np.float64(slope) + intercept
+    lut = apply_window(values, window_center, window_width)
+    lut.flags.writeable = False
+    return lut
+
+
+def get_rescale(data_dicom: dicom.FileDataset) -> tuple:
+    """
+    Function that returns the parameters converting stored values of the dataset to Hounsfield units
+
+    Args:
+        data_dicom (dicom.FileDataset): ct images from the dataset given by the user
+
+    Returns:
+        tuple: RescaleSlope and RescaleIntercept, (1.0, 0.0) if the dataset does not define them
+    """
+    return (
+        float(data_dicom.get("RescaleSlope", 1) or 1),
+        float(data_dicom.get("RescaleIntercept", 0) or 0),
+    )
+
+
+def get_hounsfield_dtype(data_dicom: dicom.FileDataset) -> np.dtype:
+    """
+    Function which returns the narrowest data type storing the Hounsfield units of the dataset exactly
+
+    Args:
+        data_dicom (dicom.FileDataset): header of a ct file
+
+    Returns:
+        np.dtype: int16 (or int32) when the slope is 1 and the intercept is an integer, float32 otherwise
+    """
+    slope, intercept = get_rescale(data_dicom)
+    if slope != 1 or not float(intercept).is_integer():
+        return np.dtype(np.float32)
+    bits_stored = int(data_dicom.get("BitsStored", 16))
+    if int(data_dicom.get("PixelRepresentation", 0)) == 0:
+        lowest, highest = 0, 2**bits_stored - 1
+    else:
+        lowest, highest = -(2 ** (bits_stored - 1)), 2 ** (bits_stored - 1) - 1
+    info = np.iinfo(np.int16)
+    if info.min <= lowest + intercept and highest + intercept <= info.max:
+        return np.dtype(np.int16)
+    return np.dtype(np.int32)
+
+
+def rescale_to_hounsfield(
+    pixels: np.ndarray, slope: float, intercept: float, dtype: np.dtype
+) -> np.ndarray:
+    """
+    Function which converts stored values of a ct slice to Hounsfield units
+
+    Integer data is converted in one pass without a floating point copy of the slice, an integer
+    data type can be used only when the slope is 1 and the intercept is an integer.
+
+    Args:
+        pixels (np.ndarray): decoded stored values of the ct slice
+        slope (float): RescaleSlope of the ct file
+        intercept (float): RescaleIntercept of the ct file
+        dtype (np.dtype): data type of the result, returned by get_hounsfield_dtype
+
+    Returns:
+        np.ndarray: the slice in Hounsfield units
+    """
+    if np.issubdtype(dtype, np.integer) and (slope != 1 or not float(intercept).is_integer()):
+        raise ValueError(
+            "the rescale (slope %g, intercept %g) does not give integer Hounsfield units"
+            % (slope, intercept)
+        )
+    hounsfield = np.empty(pixels.shape, dtype=dtype)
+    if np.issubdtype(dtype, np.integer):
+        np.add(pixels, np.int32(intercept), out=hounsfield, casting="unsafe")
+    else:
+        np.multiply(pixels, np.float32(slope), out=hounsfield, casting="unsafe")
+        hounsfield += np.float32(intercept)
+    return hounsfield
+
+
 def get_number_of_slices_data_dicom(data_dicom: dicom.FileDataset) -> int:
     """
     Function that returns number of slices that given dataset has
@@ -122,6 +676,77 @@ def get_patient_position(data_dicom: dicom.FileDataset) -> tuple:
     return tuple(data_dicom.ImagePositionPatient)
 
 
+def get_image_orientation(data_dicom: dicom.FileDataset) -> tuple:
+    """
+    Function that returns direction cosines of the image rows and columns used in the dataset
+
+    Args:
+        data_dicom (dicom.FileDataset): ct images from the dataset given by the user
+
+    Returns:
+        tuple: direction cosines of the first row and the first column (6 values)
+    """
+    if "ImageOrientationPatient" in data_dicom:
+        return tuple(float(value) for value in data_dicom.ImageOrientationPatient)
+    return DEFAULT_IMAGE_ORIENTATION
+
+
+def patient_to_pixel(
+    points: np.ndarray,
+    patient_center_position: tuple,
+    x_spacing: float,
+    y_spacing: float,
+    orientation: tuple = DEFAULT_IMAGE_ORIENTATION,
+) -> np.ndarray:
+    """
+    Function which converts contour points from patient coordinates to pixel coordinates
+
+    All points are converted at once with the affine transform defined by the image position,
+    orientation and pixel spacing.
+
+    Args:
+        points (np.ndarray): contour points as (N,3) array of X,Y,Z coordinates in mm
+        patient_center_position (tuple): patient center position (X,Y,Z)
+        x_spacing (float): pixel spacing for X axis (distance between columns)
+        y_spacing (float): pixel spacing for Y axis (distance between rows)
+        orientation (tuple, optional): direction cosines of the image rows and columns.
+        Defaults to DEFAULT_IMAGE_ORIENTATION.
+
+    Returns:
+        np.ndarray: (N,2) array of (X,Y) pixel coordinates
+    """
+    orientation = np.asarray(orientation, dtype=np.float64)
+    affine = np.stack([orientation[:3] / x_spacing, orientation[3:] / y_spacing])
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    pixels = (points - np.asarray(patient_center_position, dtype=np.float64)) @ affine.T
+    return pixels.astype(np.int32)  # truncation like int() of the single points
+
+
+def read_rtstruct_header(rtstructpath: str) -> dicom.FileDataset:
+    """
+    Function which reads the header of the dicom file if it is an rt struct file
+
+    Only the file meta information and the elements up to the Modality tag are read, so the
+    contours and the pixel data of the file are never parsed.
+
+    Args:
+        rtstructpath (str): path to the dicom file
+
+    Returns:
+        dicom.FileDataset: header of the rt struct file or None if it is not an rt struct file
+    """
+    try:
+        header = read_dicom_header(rtstructpath, MODALITY_TAG)
+    except (OSError, ValueError, EOFError, dicom.errors.InvalidDicomError):
+        return None
+    sop_class_uid = header.get("SOPClassUID")
+    if sop_class_uid is None:
+        sop_class_uid = header.file_meta.get("MediaStorageSOPClassUID")
+    if sop_class_uid == RT_STRUCTURE_SET_STORAGE or header.get("Modality") == "RTSTRUCT":
+        return header
+    return None
+
+
 def check_if_file_is_rt_struct_file(rtstructpath: str) -> bool:
     """
     Function which checks if given file is rt struct structure file
@@ -133,114 +758,1513 @@ def check_if_file_is_rt_struct_file(rtstructpath: str) -> bool:
         bool: flag which indicates whether file is an rt struct file
     """
     if ".dcm" in rtstructpath:  # checking if the file has the 'dcm' extension
-        rtstruct = dicom.dcmread(
-            rtstructpath, force=True
-        )  # reading RTStruct structures from dicom file
-        if "ROIContourSequence" in rtstruct:
-            return True
-        else:
-            return False
+        return read_rtstruct_header(rtstructpath) is not None
     else:
         return False
 
 
 def load_images_and_rtstruct_structures(
-    rt_struct_elements: dict,
+    structure_set: StructureSet,
     data_dicom: dicom.FileDataset,
     patient_center_position: tuple,
     x_spacing: float,
     y_spacing: float,
+    z_tolerance: float = Z_TOLERANCE,
+    orientation: tuple = DEFAULT_IMAGE_ORIENTATION,
 ) -> list:
     """
     Function which load images and rt struct structures
 
     Args:
-        rt_struct_elements (dict): dictionary of rt struct elements sorted by Z axis
+        structure_set (StructureSet): ROIs of the rt struct file with contours sorted by Z axis
         data_dicom (dicom.FileDataset): ct images from the dataset given by the user
         patient_center_position (tuple): patient center position (X,Y,Z)
         x_spacing (float): pixel spacing for X axis
         y_spacing (float): pixel spacing for Y axis
+        z_tolerance (float, optional): maximal distance between the slice and the structures.
+        Defaults to Z_TOLERANCE.
+        orientation (tuple, optional): direction cosines of the image rows and columns.
+        Defaults to DEFAULT_IMAGE_ORIENTATION.
 
     Returns:
-        list: list of converted ct images with rt struct structures
+        list: list of converted ct images with rt struct structures as (ROI index, (N,2) points) pairs
     """
-    images_and_structures = list()
-    for scan in rt_struct_elements:
-        if patient_center_position[2] == scan:
-            # information about image as numpy.ndarray
-            image = data_dicom.pixel_array
-            structure = list()
+    slice_index = structure_set.find_slice(
+        float(patient_center_position[2]), z_tolerance
+    )
+    if slice_index is None:
+        return list()
 
-            for scan in rt_struct_elements:
-                if patient_center_position[2] == scan:
-                    for scan in rt_struct_elements:
-                        if patient_center_position[2] == scan:
-                            for x, y, _ in rt_struct_elements[scan]:
-                                x = int((x - patient_center_position[0]) / x_spacing)
-                                y = int((y - patient_center_position[1]) / y_spacing)
-                                structure.append((x, y))
-            images_and_structures.append((image, structure))
+    # information about image as numpy.ndarray in Hounsfield units
+    image, _ = decode_pixel_data(data_dicom)
+    image = rescale_to_hounsfield(
+        image, *get_rescale(data_dicom), get_hounsfield_dtype(data_dicom)
+    )
+    structure = [
+        (
+            roi,
+            patient_to_pixel(
+                points, patient_center_position, x_spacing, y_spacing, orientation
+            ),
+        )
+        for roi, points in structure_set.contours(slice_index)
+    ]
 
-    return images_and_structures
+    return [(image, structure)]
 
 
-def add_rt_struct_to_image(
-    image: cv2.Mat, rtstructures: list, rt_struct_color: tuple
-) -> cv2.Mat:
+def rasterize_rt_structures(
+    image_shape: tuple,
+    rtstructures: list,
+    rois: set = None,
+    filled: bool = False,
+    thickness: int = OVERLAY_THICKNESS,
+) -> np.ndarray:
     """
-    Add rt struct structures to the image with given color
+    Function which rasterizes rt struct structures of a slice into a label layer
+
+    All contours of a ROI are drawn with a single cv2.polylines (or cv2.fillPoly) call. Every
+    pixel of the layer holds the ROI index + 1 of the structure drawn on it, 0 means no structure.
 
     Args:
-        image (cv2.Mat): raw ct image slice
-        rtstructures (list): rt struct structures as list of (X,Y) points
-        rt_struct_color (tuple): given color of rt struct structures
+        image_shape (tuple): shape of the ct image slice
+        rtstructures (list): rt struct structures as list of (ROI index, (N,2) array of (X,Y) points) pairs
+        rois (set, optional): indexes of the drawn ROIs. Defaults to None (all ROIs).
+        filled (bool, optional): fill the contours instead of drawing their outlines. Defaults to False.
+        thickness (int, optional): thickness of the outlines. Defaults to OVERLAY_THICKNESS.
 
     Returns:
-        cv2.Mat: converted ct image with rt struct structures
+        np.ndarray: label layer of the slice with the shape of the image
     """
-    for x, y in rtstructures:
-        image = cv2.circle(
-            image,
-            (x, y),
-            radius=0,
-            color=rt_struct_color,
-            thickness=4,
-        )
+    labels = np.zeros(image_shape[:2], dtype=np.uint16)
+    polygons = dict()
+    for roi, points in rtstructures:
+        if rois is None or roi in rois:
+            polygons.setdefault(roi, []).append(
+                np.asarray(points, dtype=np.int32).reshape(-1, 1, 2)
+            )
+
+    for roi, roi_polygons in polygons.items():
+        if filled:
+            cv2.fillPoly(labels, roi_polygons, roi + 1)
+        else:
+            cv2.polylines(labels, roi_polygons, True, roi + 1, thickness)
+
+    return labels
+
+
+def blend_rt_structures(
+    image: np.ndarray,
+    labels: np.ndarray,
+    rt_struct_colors: list,
+    alpha: float = OVERLAY_ALPHA,
+) -> np.ndarray:
+    """
+    Function which blends the label layer of rt struct structures into the image in one pass
+
+    Args:
+        image (np.ndarray): ct image slice in BGR, modified in place
+        labels (np.ndarray): label layer of the slice returned by rasterize_rt_structures
+        rt_struct_colors (list): colors of rt struct structures indexed by ROI
+        alpha (float, optional): opacity of the structures. Defaults to OVERLAY_ALPHA.
 
+    Returns:
+        np.ndarray: ct image with rt struct structures
+    """
+    palette = np.zeros((len(rt_struct_colors) + 1, 3), dtype=np.uint8)
+    if len(rt_struct_colors):
+        palette[1:] = rt_struct_colors
+    mask = labels > 0
+    colors = palette[labels[mask]]
+    if alpha >= 1:
+        image[mask] = colors
+    else:
+        image[mask] = (image[mask] * (1 - alpha) + colors * alpha).astype(np.uint8)
     return image
 
 
-def load_ct_and_rtstruct_images(
-    folder_path_ct: str, folder_path_rt: str, window_width: int, window_center: int
-) -> tuple:
+def colorize_rt_structures(
+    labels: np.ndarray,
+    rt_struct_colors: list,
+    alpha: float = OVERLAY_ALPHA,
+    out: np.ndarray = None,
+) -> np.ndarray:
     """
-    Function which load images and rt struct structures
+    Function which converts the label layer of rt struct structures to a transparent RGBA layer
+
+    The layer is displayed over the ct image, so the structures are not blended into the image and
+    the image can be windowed again without drawing the structures.
 
     Args:
-        folder_path_ct (str): path to the ct images directory, given by the user
-        folder_path_rt (str): path to the rt struct structure file, given by the user
-        window_center (int): window center represents the gray value at the center of the window.
-        window_width (int): window width defines the range of gray values that will be displayed.
+        labels (np.ndarray): label layer of the slice returned by rasterize_rt_structures
+        rt_struct_colors (list): colors of rt struct structures indexed by ROI
+        alpha (float, optional): opacity of the structures. Defaults to OVERLAY_ALPHA.
+        out (np.ndarray, optional): contiguous uint32 array with the shape of the labels, which
+        receives the RGBA colors. Defaults to None (a new array).
 
     Returns:
-        tuple: of converted ct images with rt struct structures and color of rt struct structure
+        np.ndarray: (H,W,4) RGBA layer, transparent outside the structures, a view of the out
+        array if it is given
     """
-    rtstruct = load_rtstruct(folder_path_rt)
-    rt_struct_elements, rt_struct_color = parse_rtstruct(rtstruct)
+    palette = np.zeros((len(rt_struct_colors) + 1, 4), dtype=np.uint8)
+    if len(rt_struct_colors):
+        palette[1:, :3] = rt_struct_colors
+        palette[1:, 3] = int(round(255 * min(max(alpha, 0.0), 1.0)))
+    # the RGBA colors are looked up as one 32-bit value per pixel
+    layer = np.take(palette.view(np.uint32)[:, 0], labels, out=out)
+    return layer.view(np.uint8).reshape(labels.shape + (4,))
 
-    image_and_structures_list = list()
 
-    for image_path in glob.glob(folder_path_ct):
-        data_dicom = dicom.dcmread(image_path, force=True)  # reading dicom file
-        patient_center_position = get_patient_position(data_dicom)
-        x_spacing, y_spacing = get_pixel_spacing(data_dicom)
+def add_rt_struct_to_image(
+    image: cv2.Mat, rtstructures: list, rt_struct_colors: list
+) -> cv2.Mat:
+    """
+    Add rt struct structures to the image with colors of their ROIs
 
-        image_and_structures_list += load_images_and_rtstruct_structures(
-            rt_struct_elements,
-            data_dicom,
-            patient_center_position,
-            x_spacing,
-            y_spacing,
-        )
+    Args:
+        image (cv2.Mat): raw ct image slice
+        rtstructures (list): rt struct structures as list of (ROI index, (N,2) array of (X,Y) points) pairs
+        rt_struct_colors (list): colors of rt struct structures indexed by ROI
+
+    Returns:
+        cv2.Mat: converted ct image with rt struct structures
+    """
+    labels = rasterize_rt_structures(image.shape, rtstructures)
+    return blend_rt_structures(image, labels, rt_struct_colors)
+
+
+class LRUCache:
+    """
+    A class of a bounded cache which removes the least recently used items. The cache is limited
+    by the number of items and, optionally, by the size of the items in bytes. The cache can be
+    used from several threads.
+
+    Attributes:
+        max_items (int): maximal number of items in the cache
+        max_bytes (int): maximal size of the items in bytes, None means no limit
+        size_of (callable): function which returns the size of an item in bytes
+        current_bytes (int): current size of the items in bytes
+    """
+
+    def __init__(self, max_items: int, max_bytes: int = None, size_of=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.size_of = size_of or (lambda item: getattr(item, "nbytes", 0))
+        self.current_bytes = 0
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, key) -> bool:
+        return key in self.items
+
+    def get(self, key, default=None):
+        """
+        Function which returns the cached item and marks it as recently used
+
+        Args:
+            key: key of the item
+            default (optional): value returned when the item is not cached. Defaults to None.
 
-    return image_and_structures_list, rt_struct_color
+        Returns:
+            cached item or the default value
+        """
+        with self.lock:
+            if key not in self.items:
+                return default
+            self.items.move_to_end(key)
+            return self.items[key][0]
+
+    def put(self, key, item) -> None:
+        """
+        Function which adds the item to the cache and removes the least recently used items
+
+        Args:
+            key: key of the item
+            item: cached item
+        """
+        size = self.size_of(item)
+        with self.lock:
+            if key in self.items:
+                self.current_bytes -= self.items.pop(key)[1]
+            self.items[key] = (item, size)
+            self.current_bytes += size
+            while len(self.items) > self.max_items or (
+                self.max_bytes is not None
+                and self.current_bytes > self.max_bytes
+                and len(self.items) > 1
+            ):
+                self.current_bytes -= self.items.popitem(last=False)[1][1]
+
+    def clear(self) -> None:
+        """
+        Function which removes all items from the cache
+        """
+        with self.lock:
+            self.items.clear()
+            self.current_bytes = 0
+
+
+class StructureOverlay:
+    """
+    A class which draws rt struct structures on the ct image slices. The structures of a slice are
+    rasterized once into a label layer, which is cached and blended into the windowed image.
+
+    Attributes:
+        rt_structures (list): rt struct structures of every slice
+        rt_struct_colors (list): colors of rt struct structures indexed by ROI
+        alpha (float): opacity of the structures
+        cache (LRUCache): cached label layers keyed by the slice and the drawn ROIs
+    """
+
+    def __init__(
+        self,
+        rt_structures: list,
+        rt_struct_colors: list,
+        alpha: float = OVERLAY_ALPHA,
+        cache_size: int = OVERLAY_CACHE_SIZE,
+    ):
+        self.rt_structures = rt_structures
+        self.rt_struct_colors = rt_struct_colors
+        self.alpha = alpha
+        self.cache = LRUCache(cache_size)
+
+    def labels(self, slice_index: int, image_shape: tuple, rois: set = None) -> np.ndarray:
+        """
+        Function which returns the label layer of the slice, rasterizing it only once
+
+        Args:
+            slice_index (int): index of the slice
+            image_shape (tuple): shape of the ct image slice
+            rois (set, optional): indexes of the drawn ROIs. Defaults to None (all ROIs).
+
+        Returns:
+            np.ndarray: label layer of the slice
+        """
+        key = (slice_index, image_shape[:2], None if rois is None else frozenset(rois))
+        labels = self.cache.get(key)
+        if labels is None:
+            labels = rasterize_rt_structures(
+                image_shape, self.rt_structures[slice_index], rois
+            )
+            self.cache.put(key, labels)
+        return labels
+
+    def draw(self, image: np.ndarray, slice_index: int, rois: set = None) -> np.ndarray:
+        """
+        Function which draws rt struct structures of the slice on the image
+
+        Args:
+            image (np.ndarray): windowed ct image slice in BGR, modified in place
+            slice_index (int): index of the slice
+            rois (set, optional): indexes of the drawn ROIs. Defaults to None (all ROIs).
+
+        Returns:
+            np.ndarray: ct image with rt struct structures
+        """
+        labels = self.labels(slice_index, image.shape, rois)
+        return blend_rt_structures(image, labels, self.rt_struct_colors, self.alpha)
+
+    def layer(self, slice_index: int, image_shape: tuple, rois: set = None) -> np.ndarray:
+        """
+        Function which returns the transparent RGBA layer of rt struct structures of the slice
+
+        Args:
+            slice_index (int): index of the slice
+            image_shape (tuple): shape of the ct image slice
+            rois (set, optional): indexes of the drawn ROIs. Defaults to None (all ROIs).
+
+        Returns:
+            np.ndarray: (H,W,4) RGBA layer of the structures
+        """
+        labels = self.labels(slice_index, image_shape, rois)
+        return colorize_rt_structures(labels, self.rt_struct_colors, self.alpha)
+
+
+def get_number_of_plane_slices(volume_shape: tuple, plane: str) -> int:
+    """
+    Function which returns the number of slices of the volume in the given plane
+
+    Args:
+        volume_shape (tuple): (Z,H,W) shape of the volume
+        plane (str): PLANE_AXIAL, PLANE_CORONAL or PLANE_SAGITTAL
+
+    Returns:
+        int: number of slices in the plane
+    """
+    return volume_shape[{PLANE_AXIAL: 0, PLANE_CORONAL: 1, PLANE_SAGITTAL: 2}[plane]]
+
+
+def get_plane_image(array: np.ndarray, plane: str, index: int) -> np.ndarray:
+    """
+    Function which reslices the volume in the given plane without copying its data
+
+    The coronal and sagittal planes are strided views of the volume, their rows are the slices of
+    the volume from the highest position on the Z axis, so the head of the patient is at the top.
+
+    Args:
+        array (np.ndarray): (Z,H,W) array of the volume
+        plane (str): PLANE_AXIAL, PLANE_CORONAL or PLANE_SAGITTAL
+        index (int): index of the slice in the plane
+
+    Returns:
+        np.ndarray: view of the slice, (H,W) for axial, (Z,W) for coronal and (Z,H) for sagittal planes
+    """
+    if plane == PLANE_AXIAL:
+        return array[index]
+    if plane == PLANE_CORONAL:
+        return array[::-1, index, :]
+    return array[::-1, :, index]
+
+
+def get_plane_spacing(volume: "CtVolume", plane: str) -> tuple:
+    """
+    Function which returns the distance between the rows and between the columns of the plane
+
+    Args:
+        volume (CtVolume): volume of the ct series
+        plane (str): PLANE_AXIAL, PLANE_CORONAL or PLANE_SAGITTAL
+
+    Returns:
+        tuple: row and column spacing in mm
+    """
+    z_spacing, y_spacing, x_spacing = volume.spacing
+    if plane == PLANE_AXIAL:
+        return y_spacing, x_spacing
+    if plane == PLANE_CORONAL:
+        return abs(z_spacing), x_spacing
+    return abs(z_spacing), y_spacing
+
+
+def get_plane_shape(volume: "CtVolume", plane: str) -> tuple:
+    """
+    Function which returns the shape of the slices of the plane rendered by render_plane
+
+    Args:
+        volume (CtVolume): volume of the ct series
+        plane (str): PLANE_AXIAL, PLANE_CORONAL or PLANE_SAGITTAL
+
+    Returns:
+        tuple: number of rows and columns, the rows are scaled to square pixels
+    """
+    rows, columns = get_plane_image(volume.array, plane, 0).shape
+    row_spacing, column_spacing = get_plane_spacing(volume, plane)
+    return max(1, int(round(rows * row_spacing / column_spacing))), columns
+
+
+def render_plane(
+    volume: "CtVolume",
+    plane: str,
+    index: int,
+    window_center: int = WINDOW_CENTER,
+    window_width: int = WINDOW_WIDTH,
+) -> np.ndarray:
+    """
+    Function which windows the slice of the volume in the given plane and scales it to square pixels
+
+    Args:
+        volume (CtVolume): volume of the ct series
+        plane (str): PLANE_AXIAL, PLANE_CORONAL or PLANE_SAGITTAL
+        index (int): index of the slice in the plane
+        window_center (int, optional): window center in Hounsfield units. Defaults to WINDOW_CENTER.
+        window_width (int, optional): window width in Hounsfield units. Defaults to WINDOW_WIDTH.
+
+    Returns:
+        np.ndarray: windowed slice in RGB, the rows are scaled by the ratio of the row and column spacing
+    """
+    return contrast_enhancement(
+        resample_plane_image(volume, plane, index), window_center, window_width
+    )
+
+
+def resample_plane_image(volume: "CtVolume", plane: str, index: int) -> np.ndarray:
+    """
+    Function which scales the slice of the volume in the given plane to square pixels
+
+    Args:
+        volume (CtVolume): volume of the ct series
+        plane (str): PLANE_AXIAL, PLANE_CORONAL or PLANE_SAGITTAL
+        index (int): index of the slice in the plane
+
+    Returns:
+        np.ndarray: slice in Hounsfield units with the shape returned by get_plane_shape, a view of
+        the volume if the pixels are already square
+    """
+    image = get_plane_image(volume.array, plane, index)
+    height, _ = get_plane_shape(volume, plane)
+    if height == image.shape[0]:
+        return image
+    if image.dtype == np.int32:
+        image = image.astype(np.float32)  # OpenCV does not interpolate int32 images
+    return cv2.resize(image, (image.shape[1], height), interpolation=cv2.INTER_LINEAR)
+
+
+def get_level_of_detail(scale: float, max_step: int = MAX_LEVEL_OF_DETAIL_STEP) -> int:
+    """
+    Function which returns the level of detail of the slice displayed with the given scale
+
+    Args:
+        scale (float): number of displayed pixels per pixel of the slice
+        max_step (int, optional): the coarsest level. Defaults to MAX_LEVEL_OF_DETAIL_STEP.
+
+    Returns:
+        int: step between the rendered pixels of the slice, a power of two, 1 is the full resolution
+    """
+    step = 1
+    while step * 2 * scale <= 1 and step < max_step:
+        step *= 2
+    return step
+
+
+def get_visible_tiles(
+    image_shape: tuple, rect: tuple, step: int, tile_size: int = TILE_SIZE
+) -> list:
+    """
+    Function which finds the tiles of the slice which intersect the visible rectangle
+
+    Args:
+        image_shape (tuple): shape of the slice
+        rect (tuple): visible (left, top, right, bottom) rectangle in pixels of the slice
+        step (int): level of detail returned by get_level_of_detail
+        tile_size (int, optional): size of the tiles in rendered pixels. Defaults to TILE_SIZE.
+
+    Returns:
+        list: (row, column) of the first pixels of the visible tiles
+    """
+    height, width = image_shape[:2]
+    span = tile_size * step
+    left, top = max(0, int(rect[0])), max(0, int(rect[1]))
+    right, bottom = min(width, int(np.ceil(rect[2]))), min(height, int(np.ceil(rect[3])))
+    return [
+        (row, column)
+        for row in range(top - top % span, bottom, span)
+        for column in range(left - left % span, right, span)
+    ]
+
+
+def get_tile(
+    image: np.ndarray, row: int, column: int, step: int, tile_size: int = TILE_SIZE
+) -> np.ndarray:
+    """
+    Function which returns the tile of the slice at the given level of detail without copying it
+
+    Args:
+        image (np.ndarray): the slice
+        row (int): first row of the tile
+        column (int): first column of the tile
+        step (int): level of detail returned by get_level_of_detail
+        tile_size (int, optional): size of the tiles in rendered pixels. Defaults to TILE_SIZE.
+
+    Returns:
+        np.ndarray: strided view of every step-th pixel of the tile
+    """
+    span = tile_size * step
+    return image[row : row + span : step, column : column + span : step]
+
+
+def downsample_labels(labels: np.ndarray, step: int) -> np.ndarray:
+    """
+    Function which reduces the label layer to the level of detail, so the thin outlines of the
+    structures are not lost like by taking every step-th pixel
+
+    Args:
+        labels (np.ndarray): label layer of the tile in the full resolution
+        step (int): level of detail returned by get_level_of_detail
+
+    Returns:
+        np.ndarray: the largest label of every (step x step) block, shaped like the tile of get_tile
+    """
+    if step == 1:
+        return labels
+    # the dilation anchored at the first pixel of the block is the maximum of the block
+    kernel = np.ones((step, step), dtype=np.uint8)
+    return cv2.dilate(labels, kernel, anchor=(0, 0))[::step, ::step]
+
+
+class PlaneStructureOverlay:
+    """
+    A class which draws rt struct structures on the coronal and sagittal planes of the volume. The
+    edges of all contours are kept in flat arrays, so a plane is intersected with the contours of
+    all slices at once. The intervals inside the structures are filled into a mask of every ROI and
+    the outlines of the masks are cached as label layers, like in StructureOverlay.
+
+    Attributes:
+        number_of_slices (int): number of the axial slices of the volume
+        slice_indexes (np.ndarray): index of the axial slice of every contour edge
+        rois (np.ndarray): ROI index of every contour edge
+        starts (np.ndarray): (E,2) X,Y pixel coordinates of the first points of the edges
+        ends (np.ndarray): (E,2) X,Y pixel coordinates of the second points of the edges
+        rt_struct_colors (list): colors of rt struct structures indexed by ROI
+        alpha (float): opacity of the structures
+        thickness (int): thickness of the outlines
+        cache (LRUCache): cached label layers keyed by the plane, the slice and the drawn ROIs
+    """
+
+    def __init__(
+        self,
+        structures: dict,
+        number_of_slices: int,
+        rt_struct_colors: list,
+        alpha: float = OVERLAY_ALPHA,
+        thickness: int = OVERLAY_THICKNESS,
+        cache_size: int = OVERLAY_CACHE_SIZE,
+    ):
+        self.number_of_slices = number_of_slices
+        self.rt_struct_colors = rt_struct_colors
+        self.alpha = alpha
+        self.thickness = thickness
+        self.cache = LRUCache(cache_size)
+
+        polygons = [
+            (index, roi, np.asarray(points, dtype=np.float64).reshape(-1, 2))
+            for index, slice_structures in structures.items()
+            for roi, points in slice_structures
+            if len(points) > 1
+        ]
+        lengths = np.array([len(points) for _, _, points in polygons], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.slice_indexes = np.repeat(
+            np.array([index for index, _, _ in polygons], dtype=np.int64), lengths
+        )
+        self.rois = np.repeat(np.array([roi for _, roi, _ in polygons], dtype=np.int64), lengths)
+        self.starts = (
+            np.concatenate([points for _, _, points in polygons])
+            if polygons
+            else np.zeros((0, 2))
+        )
+        # the last point of every polygon is connected with its first point
+        following = np.arange(1, offsets[-1] + 1)
+        following[offsets[1:] - 1] = offsets[:-1]
+        self.ends = self.starts[following] if polygons else np.zeros((0, 2))
+
+    def intersect(self, plane: str, index: int) -> tuple:
+        """
+        Function which finds the intervals of the plane line inside the structures of every slice
+
+        The coronal plane is the line Y = index and the sagittal plane is the line X = index of the
+        axial slices. A point is inside the structures of a ROI when the line crosses their edges an
+        odd number of times before it, so the sorted crossings are the bounds of the intervals.
+
+        Args:
+            plane (str): PLANE_CORONAL or PLANE_SAGITTAL
+            index (int): index of the slice in the plane
+
+        Returns:
+            tuple: axial slice indexes, ROI indexes, starts and ends of the intervals along the line
+        """
+        across, along = (1, 0) if plane == PLANE_CORONAL else (0, 1)
+        first = self.starts[:, across]
+        second = self.ends[:, across]
+        crossed = (first > index) != (second > index)
+        first, second = first[crossed], second[crossed]
+        coordinates = self.starts[crossed, along] + (index - first) * (
+            self.ends[crossed, along] - self.starts[crossed, along]
+        ) / (second - first)
+        slice_indexes = self.slice_indexes[crossed]
+        rois = self.rois[crossed]
+
+        # every polygon is crossed an even number of times, so the sorted crossings form pairs
+        order = np.lexsort((coordinates, rois, slice_indexes))
+        coordinates = coordinates[order]
+        return (
+            slice_indexes[order][0::2],
+            rois[order][0::2],
+            coordinates[0::2],
+            coordinates[1::2],
+        )
+
+    def labels(self, plane: str, index: int, image_shape: tuple, rois: set = None) -> np.ndarray:
+        """
+        Function which returns the label layer of the plane slice, rasterizing it only once
+
+        Args:
+            plane (str): PLANE_CORONAL or PLANE_SAGITTAL
+            index (int): index of the slice in the plane
+            image_shape (tuple): shape of the rendered slice returned by render_plane
+            rois (set, optional): indexes of the drawn ROIs. Defaults to None (all ROIs).
+
+        Returns:
+            np.ndarray: label layer of the slice
+        """
+        key = (plane, index, image_shape[:2], None if rois is None else frozenset(rois))
+        labels = self.cache.get(key)
+        if labels is not None:
+            return labels
+
+        height, width = image_shape[:2]
+        labels = np.zeros((height, width), dtype=np.uint16)
+        slice_indexes, interval_rois, starts, ends = self.intersect(plane, index)
+        # the rows of the plane start with the last axial slice
+        rows = self.number_of_slices - 1 - slice_indexes
+        starts = np.clip(np.ceil(starts), 0, width).astype(np.int64)
+        ends = np.clip(np.floor(ends) + 1, 0, width).astype(np.int64)
+        kernel = np.ones((2 * self.thickness - 1,) * 2, dtype=np.uint8)
+        for roi in np.unique(interval_rois):
+            if rois is not None and roi not in rois:
+                continue
+            selected = interval_rois == roi
+            # the intervals are filled by a cumulative sum of their bounds along the rows
+            bounds = np.zeros((self.number_of_slices, width + 1), dtype=np.int32)
+            np.add.at(bounds, (rows[selected], starts[selected]), 1)
+            np.add.at(bounds, (rows[selected], ends[selected]), -1)
+            mask = (np.cumsum(bounds[:, :width], axis=1) > 0).astype(np.uint8)
+            mask = cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+            outline = mask > cv2.erode(mask, kernel, borderType=cv2.BORDER_CONSTANT)
+            labels[outline] = roi + 1
+        self.cache.put(key, labels)
+        return labels
+
+    def draw(
+        self, image: np.ndarray, plane: str, index: int, rois: set = None
+    ) -> np.ndarray:
+        """
+        Function which draws rt struct structures of the plane slice on the image
+
+        Args:
+            image (np.ndarray): slice rendered by render_plane, modified in place
+            plane (str): PLANE_CORONAL or PLANE_SAGITTAL
+            index (int): index of the slice in the plane
+            rois (set, optional): indexes of the drawn ROIs. Defaults to None (all ROIs).
+
+        Returns:
+            np.ndarray: ct image with rt struct structures
+        """
+        labels = self.labels(plane, index, image.shape, rois)
+        return blend_rt_structures(image, labels, self.rt_struct_colors, self.alpha)
+
+    def layer(self, plane: str, index: int, image_shape: tuple, rois: set = None) -> np.ndarray:
+        """
+        Function which returns the transparent RGBA layer of rt struct structures of the plane slice
+
+        Args:
+            plane (str): PLANE_CORONAL or PLANE_SAGITTAL
+            index (int): index of the slice in the plane
+            image_shape (tuple): shape of the rendered slice returned by get_plane_shape
+            rois (set, optional): indexes of the drawn ROIs. Defaults to None (all ROIs).
+
+        Returns:
+            np.ndarray: (H,W,4) RGBA layer of the structures
+        """
+        labels = self.labels(plane, index, image_shape, rois)
+        return colorize_rt_structures(labels, self.rt_struct_colors, self.alpha)
+
+
+def apply_to_items(function, items: list) -> list:
+    """
+    Function which applies the given function to every item of a chunk processed by one worker
+
+    Args:
+        function (callable): function applied to every item
+        items (list): items passed to the function
+
+    Returns:
+        list: results of the function in the order of the items
+    """
+    return [function(item) for item in items]
+
+
+def iterate_with_workers(
+    function,
+    items: list,
+    workers: int = 1,
+    use_processes: bool = False,
+    should_cancel=None,
+):
+    """
+    Function which applies the given function to every item and yields the results as soon as they
+    are ready, in the order of the items
+
+    Args:
+        function (callable): function applied to every item
+        items (list): items passed to the function
+        workers (int, optional): number of workers, 1 means serial execution. Defaults to 1.
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to False.
+        should_cancel (callable, optional): function which returns True when the remaining items
+        should not be processed. Defaults to None.
+
+    Yields:
+        results of the function in the order of the items
+    """
+    if workers <= 1:
+        for item in items:
+            if should_cancel is not None and should_cancel():
+                return
+            yield function(item)
+        return
+
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    # chunks reduce the overhead of sending the function and the items to the processes
+    chunk_size = max(1, len(items) // (workers * 4)) if use_processes else 1
+    with executor_class(max_workers=workers) as executor:
+        futures = [
+            executor.submit(apply_to_items, function, items[start : start + chunk_size])
+            for start in range(0, len(items), chunk_size)
+        ]
+        try:
+            for future in futures:
+                if should_cancel is not None and should_cancel():
+                    return
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()  # the items which have not been started are skipped
+
+
+def map_with_workers(
+    function, items: list, workers: int = 1, use_processes: bool = False
+) -> list:
+    """
+    Function which applies the given function to every item, serially or in a worker pool
+
+    Args:
+        function (callable): function applied to every item
+        items (list): items passed to the function
+        workers (int, optional): number of workers, 1 means serial execution. Defaults to 1.
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to False.
+
+    Returns:
+        list: results of the function in the order of the items
+    """
+    return list(iterate_with_workers(function, items, workers, use_processes))
+
+
+def get_ct_file_paths(folder_path_ct) -> list:
+    """
+    Function which returns the paths of the ct files given by the user
+
+    Args:
+        folder_path_ct (str or list): glob pattern of the ct files (for example 'directory/*.dcm')
+        or the list of their paths, for example a series found by the study scanner
+
+    Returns:
+        list: paths of the ct files
+    """
+    if isinstance(folder_path_ct, str):
+        return glob.glob(folder_path_ct)
+    return list(folder_path_ct)
+
+
+def read_ct_header(image_path: str) -> SliceHeader:
+    """
+    Function which reads only the header of a ct file, without decoding its pixels
+
+    Args:
+        image_path (str): path to the ct image file
+
+    Returns:
+        SliceHeader: Z position, path, patient position, pixel spacing, orientation and data type of
+        the Hounsfield units of the slice
+    """
+    data_dicom = dicom.dcmread(
+        image_path, force=True, stop_before_pixels=True, specific_tags=SERIES_INDEX_TAGS
+    )
+    patient_center_position = get_patient_position(data_dicom)
+    return SliceHeader(
+        float(patient_center_position[2]),
+        image_path,
+        patient_center_position,
+        get_pixel_spacing(data_dicom),
+        get_image_orientation(data_dicom),
+        get_hounsfield_dtype(data_dicom),
+    )
+
+
+def build_series_index(
+    folder_path_ct: str,
+    workers: int = 1,
+    use_processes: bool = False,
+    progress=None,
+    should_cancel=None,
+) -> list:
+    """
+    Function which builds an index of the ct series sorted by Z axis from the file headers
+
+    Args:
+        folder_path_ct (str or list): glob pattern of the ct images, given by the user, or the
+        list of their paths
+        workers (int, optional): number of workers used to read the headers. Defaults to 1 (serial).
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to False.
+        progress (callable, optional): function called with the stage name, number of read files
+        and number of all files. Defaults to None.
+        should_cancel (callable, optional): function which returns True when the reading should
+        be stopped. Defaults to None.
+
+    Returns:
+        list: headers of the ct files sorted by Z axis
+    """
+    image_paths = get_ct_file_paths(folder_path_ct)
+    headers = list()
+    for header in iterate_with_workers(
+        read_ct_header, image_paths, workers, use_processes, should_cancel
+    ):
+        headers.append(header)
+        if progress is not None:
+            progress(PROGRESS_FILES_READ, len(headers), len(image_paths))
+    return sorted(headers, key=lambda header: header.z)
+
+
+def load_ct_file(
+    image_path: str,
+    structure_set: StructureSet,
+    z_tolerance: float = Z_TOLERANCE,
+) -> list:
+    """
+    Function which reads a single ct file and matches it with rt struct structures
+
+    Args:
+        image_path (str): path to the ct image file
+        structure_set (StructureSet): ROIs of the rt struct file with contours sorted by Z axis
+        z_tolerance (float, optional): maximal distance between the slice and the structures.
+        Defaults to Z_TOLERANCE.
+
+    Returns:
+        list: list of converted ct images with rt struct structures found in the file
+    """
+    data_dicom = dicom.dcmread(image_path, force=True)  # reading dicom file
+    patient_center_position = get_patient_position(data_dicom)
+    # pixel spacing is given as the distance between rows and then between columns
+    y_spacing, x_spacing = get_pixel_spacing(data_dicom)
+
+    return load_images_and_rtstruct_structures(
+        structure_set,
+        data_dicom,
+        patient_center_position,
+        x_spacing,
+        y_spacing,
+        z_tolerance,
+        get_image_orientation(data_dicom),
+    )
+
+
+def iterate_ct_and_rtstruct_images(
+    folder_path_ct: str,
+    structure_set: StructureSet,
+    workers: int = 1,
+    use_processes: bool = False,
+    z_tolerance: float = Z_TOLERANCE,
+    progress=None,
+    should_cancel=None,
+):
+    """
+    Function which yields ct images with rt struct structures as soon as they are decoded
+
+    The headers of the ct files are read first and only the slices with rt struct structures
+    are decoded. The images are yielded in order of their position on the Z axis.
+
+    Args:
+        folder_path_ct (str or list): glob pattern of the ct images, given by the user, or the
+        list of their paths
+        structure_set (StructureSet): ROIs of the rt struct file with contours sorted by Z axis
+        workers (int, optional): number of workers used to read the ct files. Defaults to 1 (serial).
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to False.
+        z_tolerance (float, optional): maximal distance between a slice and matched structures.
+        Defaults to Z_TOLERANCE.
+        progress (callable, optional): function called with the stage name, number of processed
+        items and number of all items. Defaults to None.
+        should_cancel (callable, optional): function which returns True when the loading should
+        be stopped. Defaults to None.
+
+    Yields:
+        tuple: ct image and its rt struct structures
+    """
+    # decoding only the slices which have rt struct structures
+    image_paths = [
+        header.path
+        for header in build_series_index(
+            folder_path_ct, workers, use_processes, progress, should_cancel
+        )
+        if structure_set.find_slice(header.z, z_tolerance) is not None
+    ]
+
+    load_file = partial(
+        load_ct_file, structure_set=structure_set, z_tolerance=z_tolerance
+    )
+    for number, images_and_structures in enumerate(
+        iterate_with_workers(load_file, image_paths, workers, use_processes, should_cancel)
+    ):
+        yield from images_and_structures
+        if progress is not None:
+            progress(PROGRESS_SLICES_DECODED, number + 1, len(image_paths))
+
+
+def load_ct_and_rtstruct_images(
+    folder_path_ct: str,
+    folder_path_rt: str,
+    window_width: int,
+    window_center: int,
+    workers: int = 1,
+    use_processes: bool = False,
+    z_tolerance: float = Z_TOLERANCE,
+    progress=None,
+) -> tuple:
+    """
+    Function which load images and rt struct structures
+
+    The headers of the ct files are read first and only the slices with rt struct structures
+    are decoded. With more than one worker the ct files are read and decoded concurrently,
+    either in a thread pool or in a process pool. The images are returned in order of their
+    position on the Z axis.
+
+    Args:
+        folder_path_ct (str or list): glob pattern of the ct images, given by the user, or the
+        list of their paths
+        folder_path_rt (str): path to the rt struct structure file, given by the user
+        window_center (int): window center represents the gray value at the center of the window.
+        window_width (int): window width defines the range of gray values that will be displayed.
+        workers (int, optional): number of workers used to read the ct files. Defaults to 1 (serial).
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to False.
+        z_tolerance (float, optional): maximal distance between a slice and matched structures.
+        Defaults to Z_TOLERANCE.
+        progress (callable, optional): function called with the stage name, number of processed
+        items and number of all items. Defaults to None.
+
+    Returns:
+        tuple: of converted ct images with rt struct structures and the structure set with all ROIs
+    """
+    structure_set = load_structure_set(folder_path_rt)
+    if progress is not None:
+        number_of_contours = len(structure_set.contour_rois)
+        progress(PROGRESS_CONTOURS_PARSED, number_of_contours, number_of_contours)
+
+    image_and_structures_list = list(
+        iterate_ct_and_rtstruct_images(
+            folder_path_ct,
+            structure_set,
+            workers,
+            use_processes,
+            z_tolerance,
+            progress,
+        )
+    )
+    return image_and_structures_list, structure_set
+
+
+class CtVolume:
+    """
+    A class which stores the whole ct series in one contiguous (Z,H,W) array sorted by Z axis, with
+    the position of every slice, pixel spacing and orientation. The array can be a memory-mapped
+    cache file, so a series which has already been loaded is opened without reading dicom files.
+
+    Attributes:
+        array (np.ndarray): (Z,H,W) array of the ct slices in Hounsfield units, int16 unless the
+        rescale of any slice of the series needs a wider type
+        positions (np.ndarray): (Z,3) patient positions of the slices
+        pixel_spacing (tuple): distance between the rows and between the columns in mm
+        orientation (tuple): direction cosines of the image rows and columns
+        paths (list): paths of the ct files sorted by Z axis
+        decoded (np.ndarray): flags of the slices which are already decoded
+        cache_path (str): path of the cache file without extension, None if the volume is not cached
+        decoders (dict): number of slices decoded by every pixel data handler
+    """
+
+    def __init__(
+        self,
+        array: np.ndarray,
+        positions: np.ndarray,
+        pixel_spacing: tuple,
+        orientation: tuple,
+        paths: list,
+        decoded: np.ndarray = None,
+        cache_path: str = None,
+    ):
+        self.array = array
+        self.positions = positions
+        self.pixel_spacing = pixel_spacing
+        self.orientation = orientation
+        self.paths = paths
+        self.decoded = (
+            np.ones(len(array), dtype=bool) if decoded is None else decoded
+        )
+        self.cache_path = cache_path
+        self.decoders = dict()
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    @property
+    def z_positions(self) -> np.ndarray:
+        return self.positions[:, 2]
+
+    @property
+    def origin(self) -> tuple:
+        return tuple(self.positions[0]) if len(self.positions) else (0.0, 0.0, 0.0)
+
+    @property
+    def spacing(self) -> tuple:
+        """
+        Function which returns the spacing of the volume as (Z,Y,X) distances in mm
+        """
+        z_spacing = (
+            float(np.median(np.diff(self.z_positions))) if len(self.positions) > 1 else 1.0
+        )
+        return z_spacing, float(self.pixel_spacing[0]), float(self.pixel_spacing[1])
+
+    def save_metadata(self, cache_path: str) -> None:
+        """
+        Function which saves the description of the volume next to the cached array
+
+        Args:
+            cache_path (str): path of the cache file without extension
+        """
+        metadata = {
+            "shape": list(self.array.shape),
+            "dtype": self.array.dtype.str,
+            "positions": self.positions.tolist(),
+            "pixel_spacing": list(self.pixel_spacing),
+            "orientation": list(self.orientation),
+            "paths": [get_cache_relative_path(path, cache_path) for path in self.paths],
+        }
+        with open(cache_path + ".json.tmp", "w") as file:
+            json.dump(metadata, file)
+        os.replace(cache_path + ".json.tmp", cache_path + ".json")
+
+    def discard_cache(self) -> None:
+        """
+        Function which removes the unfinished cache file of the volume, e.g. when the decoding was
+        cancelled, the volume is kept in memory only
+        """
+        if self.cache_path is None or os.path.exists(self.cache_path + ".npy"):
+            return
+        try:
+            os.remove(self.cache_path + ".npy.tmp")
+        except OSError:
+            pass  # the mapped file cannot be removed on Windows, it is overwritten next time
+        self.cache_path = None
+
+    @staticmethod
+    def load_cache(cache_path: str) -> "CtVolume":
+        """
+        Function which opens the cached volume as a read-only memory-mapped array
+
+        Args:
+            cache_path (str): path of the cache file without extension
+
+        Returns:
+            CtVolume: the cached volume
+        """
+        with open(cache_path + ".json") as file:
+            metadata = json.load(file)
+        array = np.load(cache_path + ".npy", mmap_mode="r")
+        if list(array.shape) != metadata["shape"]:
+            raise ValueError("cached volume does not match its description")
+        return CtVolume(
+            array,
+            np.asarray(metadata["positions"], dtype=np.float64).reshape(-1, 3),
+            tuple(metadata["pixel_spacing"]),
+            tuple(metadata["orientation"]),
+            [
+                os.path.normpath(os.path.join(os.path.dirname(cache_path), path))
+                for path in metadata["paths"]
+            ],
+            cache_path=cache_path,
+        )
+
+
+def get_cache_relative_path(file_path: str, cache_path: str) -> str:
+    """
+    Function which returns the path of the file relative to the cache directory, so the cache
+    stays valid when the whole study is moved
+
+    Args:
+        file_path (str): path of the file
+        cache_path (str): path of the cache file without extension
+
+    Returns:
+        str: relative path of the file, absolute if it is on another drive than the cache
+    """
+    file_path = os.path.abspath(file_path)
+    try:
+        return os.path.relpath(file_path, os.path.dirname(os.path.abspath(cache_path)))
+    except ValueError:
+        return file_path
+
+
+def get_volume_cache_path(image_paths: list) -> str:
+    """
+    Function which returns the path of the cached volume of the given ct files
+
+    The name of the cache is a hash of the names, sizes and modification times of the files and
+    of VOLUME_CACHE_VERSION, so any change of the series creates a new cache.
+
+    Args:
+        image_paths (list): paths of the ct files
+
+    Returns:
+        str: path of the cache file without extension
+    """
+    series_hash = hashlib.sha1(b"%d;" % VOLUME_CACHE_VERSION)
+    for image_path in sorted(image_paths):
+        stat = os.stat(image_path)
+        series_hash.update(
+            ("%s:%d:%d;" % (os.path.basename(image_path), stat.st_size, stat.st_mtime_ns)).encode()
+        )
+    directory = os.path.dirname(os.path.abspath(image_paths[0]))
+    return os.path.join(directory, CACHE_DIRECTORY, series_hash.hexdigest())
+
+
+def get_pixel_decoder_handler(name: str):
+    """
+    Function which returns the pixel data handler of the given name
+
+    Args:
+        name (str): name of the handler (one of PIXEL_DECODERS)
+
+    Returns:
+        handler module or object, None if there is no such handler in this pydicom version
+    """
+    for decoder_name, handler in PIXEL_DECODERS:
+        if decoder_name == name:
+            return getattr(dicom.config, handler, None) if isinstance(handler, str) else handler
+    return None
+
+
+def register_pixel_decoder(name: str, handler, index: int = None) -> None:
+    """
+    Function which adds a pixel data handler to PIXEL_DECODERS or replaces the handler of the name
+
+    The handler has the interface of the pixel data handlers of pydicom (supports_transfer_syntax,
+    is_available and get_pixeldata) or it is the name of a handler attribute of pydicom.config. The
+    handlers selected for the transfer syntaxes are forgotten, so the next files are decoded by the
+    fastest handler again. Worker processes know only the handlers registered before their start.
+
+    Args:
+        name (str): name of the handler
+        handler: handler module or object, or the name of its attribute of pydicom.config
+        index (int, optional): position of the handler from the fastest, the end by default
+    """
+    decoders = [decoder for decoder in PIXEL_DECODERS if decoder[0] != name]
+    decoders.insert(len(decoders) if index is None else index, (name, handler))
+    PIXEL_DECODERS[:] = decoders
+    get_pixel_decoder.cache_clear()
+
+
+def unregister_pixel_decoder(name: str) -> None:
+    """
+    Function which removes the pixel data handler of the given name from PIXEL_DECODERS
+
+    Args:
+        name (str): name of the handler
+    """
+    PIXEL_DECODERS[:] = [decoder for decoder in PIXEL_DECODERS if decoder[0] != name]
+    get_pixel_decoder.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_pixel_decoder(transfer_syntax_uid: str) -> str:
+    """
+    Function which selects the fastest available pixel data handler for the transfer syntax
+
+    The selection is cached until the handlers are changed by register_pixel_decoder.
+
+    Args:
+        transfer_syntax_uid (str): transfer syntax of the dicom file
+
+    Returns:
+        str: name of the handler (one of PIXEL_DECODERS) or None if no handler is available
+    """
+    for name, _ in list(PIXEL_DECODERS):
+        handler = get_pixel_decoder_handler(name)
+        if (
+            handler is not None
+            and handler.supports_transfer_syntax(UID(transfer_syntax_uid))
+            and handler.is_available()
+        ):
+            return name
+    return None
+
+
+def get_available_pixel_decoders() -> list:
+    """
+    Function which returns the names of the pixel data handlers which are installed
+
+    Returns:
+        list: names of the available handlers, from the fastest
+    """
+    return [
+        name
+        for name, _ in list(PIXEL_DECODERS)
+        if get_pixel_decoder_handler(name) is not None
+        and get_pixel_decoder_handler(name).is_available()
+    ]
+
+
+def decode_pixel_data(data_dicom: dicom.FileDataset) -> tuple:
+    """
+    Function which decodes the pixel data of the dicom file with the selected handler
+
+    A file without the TransferSyntaxUID (e.g. without the meta information) is not compressed,
+    its transfer syntax is given by the encoding of the dataset which was detected by pydicom. The
+    dataset is not changed, its pixel_array is not set by the decoding.
+
+    Args:
+        data_dicom (dicom.FileDataset): dicom file with pixel data
+
+    Returns:
+        tuple: decoded pixels as np.ndarray and the name of the used handler
+
+    Raises:
+        ValueError: the transfer syntax of the file is unknown
+        RuntimeError: no installed handler supports the transfer syntax
+    """
+    has_file_meta = hasattr(data_dicom, "file_meta")
+    file_meta = getattr(data_dicom, "file_meta", None)
+    transfer_syntax_uid = None if file_meta is None else file_meta.get("TransferSyntaxUID")
+    if transfer_syntax_uid is None:
+        is_little_endian = getattr(data_dicom, "is_little_endian", None)
+        is_implicit_VR = getattr(data_dicom, "is_implicit_VR", None)
+        if is_little_endian is None or is_implicit_VR is None:
+            raise ValueError("the transfer syntax of the dicom file is unknown")
+        if not is_little_endian:
+            transfer_syntax_uid = ExplicitVRBigEndian
+        elif is_implicit_VR:
+            transfer_syntax_uid = ImplicitVRLittleEndian
+        else:
+            transfer_syntax_uid = ExplicitVRLittleEndian
+    transfer_syntax_uid = UID(transfer_syntax_uid)
+    decoder = get_pixel_decoder(str(transfer_syntax_uid))
+    handler = None if decoder is None else get_pixel_decoder_handler(decoder)
+    if handler is None:
+        raise RuntimeError(
+            "no pixel data handler is available for the transfer syntax %s (%s)"
+            % (transfer_syntax_uid.name, transfer_syntax_uid)
+        )
+
+    # the handlers read the transfer syntax from the meta information, the detected syntax is
+    # given to them by a copy of the meta information (a dataset created from another dataset
+    # shares its elements) which is removed after the decoding
+    if file_meta is None or "TransferSyntaxUID" not in file_meta:
+        data_dicom.file_meta = FileMetaDataset(dict(file_meta or {}))
+        data_dicom.file_meta.TransferSyntaxUID = transfer_syntax_uid
+    try:
+        pixels = reshape_pixel_array(data_dicom, handler.get_pixeldata(data_dicom))
+        if getattr(handler, "needs_to_convert_to_RGB", lambda _: False)(data_dicom):
+            pixels = convert_color_space(pixels, "YBR_FULL", "RGB")
+    finally:
+        if not has_file_meta:
+            del data_dicom.file_meta
+        elif data_dicom.file_meta is not file_meta:
+            data_dicom.file_meta = file_meta
+    return pixels, decoder
+
+
+def read_ct_pixels(image_path: str) -> tuple:
+    """
+    Function which reads and decodes pixels of a single ct file in Hounsfield units
+
+    Args:
+        image_path (str): path to the ct image file
+
+    Returns:
+        tuple: decoded ct image slice and the name of the used pixel data handler
+    """
+    data_dicom = dicom.dcmread(image_path, force=True)
+    pixels, decoder = decode_pixel_data(data_dicom)
+    hounsfield = rescale_to_hounsfield(
+        pixels, *get_rescale(data_dicom), get_hounsfield_dtype(data_dicom)
+    )
+    return hounsfield, decoder
+
+
+def open_ct_volume(
+    folder_path_ct: str,
+    workers: int = 1,
+    use_processes: bool = False,
+    use_cache: bool = True,
+    progress=None,
+    should_cancel=None,
+) -> CtVolume:
+    """
+    Function which opens the cached volume of the ct series or prepares a new volume for decoding
+
+    When the series has not been cached, the headers of the ct files are read and the volume is
+    allocated, as a memory-mapped cache file if possible. Its slices are filled by decode_ct_volume.
+
+    Args:
+        folder_path_ct (str or list): glob pattern of the ct images, given by the user, or the
+        list of their paths
+        workers (int, optional): number of workers used to read the headers. Defaults to 1 (serial).
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to False.
+        use_cache (bool, optional): use and create the cache file next to the series. Defaults to True.
+        progress (callable, optional): function called with the stage name, number of processed
+        items and number of all items. Defaults to None.
+        should_cancel (callable, optional): function which returns True when the reading should
+        be stopped. Defaults to None.
+
+    Returns:
+        CtVolume: volume of the ct series, cached slices are marked as decoded, None if cancelled
+    """
+    image_paths = get_ct_file_paths(folder_path_ct)
+    if not image_paths:
+        raise FileNotFoundError("no ct files found in " + str(folder_path_ct))
+
+    cache_path = get_volume_cache_path(image_paths) if use_cache else None
+    if cache_path is not None and os.path.exists(cache_path + ".json"):
+        try:
+            return CtVolume.load_cache(cache_path)
+        except (OSError, ValueError):
+            pass  # a damaged cache is created again
+
+    series_index = build_series_index(
+        folder_path_ct, workers, use_processes, progress, should_cancel
+    )
+    if should_cancel is not None and should_cancel():
+        return None
+    first_header = dicom.dcmread(series_index[0].path, force=True, stop_before_pixels=True)
+    shape = (len(series_index), int(first_header.Rows), int(first_header.Columns))
+    # the slices can have different rescales, the volume stores all of them exactly
+    dtype = np.result_type(*[header.dtype for header in series_index])
+
+    array = None
+    if cache_path is not None:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            array = np.lib.format.open_memmap(
+                cache_path + ".npy.tmp", mode="w+", dtype=dtype, shape=shape
+            )
+        except OSError:
+            cache_path = None  # the directory of the series is read-only
+    if array is None:
+        array = np.empty(shape, dtype=dtype)
+
+    return CtVolume(
+        array,
+        np.asarray([header.position for header in series_index], dtype=np.float64),
+        series_index[0].spacing,
+        series_index[0].orientation,
+        [header.path for header in series_index],
+        np.zeros(len(series_index), dtype=bool),
+        cache_path,
+    )
+
+
+def decode_ct_volume(
+    volume: CtVolume,
+    workers: int = 1,
+    use_processes: bool = False,
+    priority: list = None,
+    on_slice=None,
+    progress=None,
+    should_cancel=None,
+) -> bool:
+    """
+    Function which decodes the slices of the volume which are not decoded yet
+
+    When all slices are decoded, the cache file of the volume is completed, so the series opens
+    from the cache next time. The unfinished cache file of a cancelled or failed decoding is
+    removed.
+
+    Args:
+        volume (CtVolume): volume returned by open_ct_volume
+        workers (int, optional): number of workers used to decode the ct files. Defaults to 1 (serial).
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to False.
+        priority (list, optional): indexes of the slices decoded first. Defaults to None.
+        on_slice (callable, optional): function called with the index of every decoded slice.
+        Defaults to None.
+        progress (callable, optional): function called with the stage name, number of processed
+        items and number of all items. Defaults to None.
+        should_cancel (callable, optional): function which returns True when the decoding should
+        be stopped. Defaults to None.
+
+    Returns:
+        bool: True if all slices are decoded
+    """
+    priority = [index for index in (priority or []) if not volume.decoded[index]]
+    prioritized = set(priority)
+    order = priority + [
+        index
+        for index in range(len(volume))
+        if not volume.decoded[index] and index not in prioritized
+    ]
+
+    paths = [volume.paths[index] for index in order]
+    try:
+        for number, (index, (image, decoder)) in enumerate(
+            zip(
+                order,
+                iterate_with_workers(read_ct_pixels, paths, workers, use_processes, should_cancel),
+            )
+        ):
+            if not np.can_cast(image.dtype, volume.array.dtype):
+                raise ValueError(
+                    "the slice %s in %s does not fit the volume of %s"
+                    % (volume.paths[index], image.dtype, volume.array.dtype)
+                )
+            volume.array[index] = image
+            volume.decoded[index] = True
+            volume.decoders[decoder] = volume.decoders.get(decoder, 0) + 1
+            if on_slice is not None:
+                on_slice(index)
+            if progress is not None:
+                progress(PROGRESS_SLICES_DECODED, number + 1, len(order))
+    except BaseException:
+        volume.discard_cache()
+        raise
+
+    completed = bool(volume.decoded.all())
+    if not completed and should_cancel is not None and should_cancel():
+        volume.discard_cache()
+    if completed and volume.cache_path is not None and isinstance(volume.array, np.memmap):
+        if not os.path.exists(volume.cache_path + ".npy"):
+            volume.array.flush()
+            os.replace(volume.cache_path + ".npy.tmp", volume.cache_path + ".npy")
+            volume.save_metadata(volume.cache_path)
+    return completed
+
+
+def load_ct_volume(
+    folder_path_ct: str,
+    workers: int = 1,
+    use_processes: bool = False,
+    use_cache: bool = True,
+) -> CtVolume:
+    """
+    Function which loads the whole ct series into a volume, from the cache if possible
+
+    Args:
+        folder_path_ct (str or list): glob pattern of the ct images, given by the user, or the
+        list of their paths
+        workers (int, optional): number of workers used to read the ct files. Defaults to 1 (serial).
+        use_processes (bool, optional): use a process pool instead of a thread pool. Defaults to False.
+        use_cache (bool, optional): use and create the cache file next to the series. Defaults to True.
+
+    Returns:
+        CtVolume: volume of the ct series
+    """
+    volume = open_ct_volume(folder_path_ct, workers, use_processes, use_cache)
+    decode_ct_volume(volume, workers, use_processes)
+    return volume
+
+
+def match_volume_structures(
+    volume: CtVolume, structure_set: StructureSet, z_tolerance: float = Z_TOLERANCE
+) -> dict:
+    """
+    Function which finds rt struct structures of the volume slices and converts them to pixels
+
+    Args:
+        volume (CtVolume): volume of the ct series
+        structure_set (StructureSet): ROIs of the rt struct file with contours sorted by Z axis
+        z_tolerance (float, optional): maximal distance between a slice and matched structures.
+        Defaults to Z_TOLERANCE.
+
+    Returns:
+        dict: rt struct structures as (ROI index, (N,2) points) pairs keyed by the slice index
+    """
+    # pixel spacing is given as the distance between rows and then between columns
+    y_spacing, x_spacing = volume.pixel_spacing
+    structures = dict()
+    for index, position in enumerate(volume.positions):
+        slice_index = structure_set.find_slice(float(position[2]), z_tolerance)
+        if slice_index is not None:
+            structures[index] = [
+                (
+                    roi,
+                    patient_to_pixel(
+                        points, position, x_spacing, y_spacing, volume.orientation
+                    ),
+                )
+                for roi, points in structure_set.contours(slice_index)
+            ]
+    return structures